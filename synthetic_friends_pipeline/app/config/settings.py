@@ -6,6 +6,8 @@ class Settings(BaseSettings):
     # HubSpot
     HUBSPOT_PRIVATE_APP_TOKEN: str | None = None
     HUBSPOT_BASE_URL: str = "https://api.hubapi.com"
+    HUBSPOT_MIRROR_PATH: str | None = None  # e.g. data/hubspot_mirror.db; empty disables the local mirror
+    HUBSPOT_MIRROR_SYNC_INTERVAL_S: float = 300.0
 
     # Enrichment providers
     APOLLO_API_KEY: str | None = None
@@ -22,7 +24,31 @@ class Settings(BaseSettings):
 
     # Email tracking
     EMAIL_TRACKING_SECRET: str | None = None
-    EMAIL_EVENT_LOG_PATH: str = "data/email_events.jsonl"
+    EMAIL_EVENT_LOG_PATH: str = "data/email_events.jsonl"  # base name; each worker writes <stem>.<host>-<pid>.<ts>-<seq>.jsonl
+    EVENT_LOG_FSYNC: str = "interval"  # always | interval | never
+    EVENT_LOG_FSYNC_INTERVAL_S: float = 1.0
+    EVENT_LOG_LINGER_MS: int = 5  # group-commit window
+    EVENT_LOG_MAX_BUFFER: int = 100000
+    EVENT_LOG_ROTATE_BYTES: int = 64 * 1024 * 1024
+    EVENT_LOG_ROTATE_S: float = 3600.0
+    EVENT_LOG_COMPRESSION: str = "gzip"  # none | gzip | zstd (requires `zstandard`)
+    HUBSPOT_LOOKUP_BATCH_WINDOW_MS: int = 10  # coalesce contact lookups arriving within this window
+    EMAIL_ROLLUP_FLUSH_INTERVAL_S: float = 5.0  # write-behind window for contact rollups; 0 writes every event inline
+    EMAIL_ROLLUP_MAX_PENDING: int = 500  # flush early once this many contacts are waiting
+    EMAIL_ROLLUP_STATE_PATH: str = "data/email_rollups.db"
+    EMAIL_ROLLUP_RECOVER_INTERVAL_S: float = 60.0  # how often live workers look for crashed workers' checkpoints
+    TRACKING_QUEUE_WORKERS: int = 4  # 0 handles pixel/redirect events inline
+    TRACKING_QUEUE_MAXSIZE: int = 10000
+    TRACKING_QUEUE_OVERFLOW: str = "log_only"  # log_only (drop the HubSpot rollup, keep the log) | reject (503)
+    TRACKING_QUEUE_RETRY_AFTER_S: int = 5
+    TRACKING_QUEUE_DRAIN_TIMEOUT_S: float = 10.0
+    TRACKING_QUEUE_EVENT_API: bool = False  # also queue POST /email/event
+    EMAIL_DEDUP_WINDOW_S: float = 600.0  # repeat opens/clicks of the same (tid, recipient, url) inside this window are log-only; 0 disables
+    EMAIL_DEDUP_MAX_ENTRIES: int = 100000
+    EMAIL_DEDUP_STATE_PATH: str | None = None  # e.g. data/email_dedup.json to keep the window across restarts
+    EMAIL_EVENTS_BATCH_SIZE: int = 500  # POST /email/events: events per grouped log/HubSpot write
+    EMAIL_EVENTS_MAX_PER_REQUEST: int = 50000
+    EMAIL_STATS_PATH: str | None = "data/email_stats.db"  # hourly per-contact/thread/tid rollups behind /email/stats; empty disables
 
     # Runtime
     APP_ENV: str = "dev"
@@ -32,4 +58,95 @@ class Settings(BaseSettings):
     HTTP_TIMEOUT_S: int = 30
     MAX_RETRIES: int = 3
 
+    # Pooled HTTP clients (one per upstream host)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_S: float = 30.0
+    HTTP_HTTP2: bool = False  # requires the optional `h2` package
+
+    # Per-vendor token buckets (requests/second + burst); 0 disables a limiter
+    HUBSPOT_RATE_LIMIT_PER_S: float = 9.0  # private apps: ~100 requests / 10 s
+    HUBSPOT_RATE_LIMIT_BURST: int = 10  # burst + 10 s of refill must stay <= 100
+    HUBSPOT_SEARCH_RATE_LIMIT_PER_S: float = 4.0  # search endpoints: 5 requests / s per account
+    HUBSPOT_SEARCH_RATE_LIMIT_BURST: int = 4
+    APOLLO_RATE_LIMIT_PER_S: float = 1.0
+    APOLLO_RATE_LIMIT_BURST: int = 5
+    CLEARBIT_RATE_LIMIT_PER_S: float = 5.0
+    CLEARBIT_RATE_LIMIT_BURST: int = 10
+    ZEROBOUNCE_RATE_LIMIT_PER_S: float = 5.0
+    ZEROBOUNCE_RATE_LIMIT_BURST: int = 10
+    NEVERBOUNCE_RATE_LIMIT_PER_S: float = 5.0
+    NEVERBOUNCE_RATE_LIMIT_BURST: int = 10
+    HUNTER_RATE_LIMIT_PER_S: float = 10.0
+    HUNTER_RATE_LIMIT_BURST: int = 10
+    ZEROBOUNCE_BULK_RATE_LIMIT_PER_S: float = 0.08  # validatebatch: 5 calls / minute
+    ZEROBOUNCE_BULK_RATE_LIMIT_BURST: int = 1
+
+    # Retries: only retryable statuses, Retry-After honoured, capped by a global budget
+    RETRY_AFTER_MAX_S: float = 30.0
+    RETRY_BUDGET_RATIO: float = 0.2  # retries allowed per first attempt
+    RETRY_BUDGET_MIN_PER_S: float = 1.0
+    RETRY_BUDGET_WINDOW_S: float = 10.0
+
+    # Circuit breakers around enrichment/verification providers
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_S: float = 10.0
+    BREAKER_WINDOW: int = 20
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_PROBE_INTERVAL_S: float = 30.0
+
+    # Enrichment fan-out: providers run concurrently, each under its own timeout
+    ENRICHER_TIMEOUT_S: float = 20.0  # default; override per provider with <NAME>_TIMEOUT_S
+    APOLLO_TIMEOUT_S: float | None = None
+    CLEARBIT_TIMEOUT_S: float | None = None
+    ENRICHMENT_DEADLINE_S: float = 30.0  # return whatever has arrived by then
+    BULK_ENRICH_CONCURRENCY: int = 4  # companies in flight per /pipeline/enrich_companies request
+    BULK_ENRICH_MAX_CONCURRENCY: int = 16
+    BULK_ENRICH_MAX_ROWS: int = 100000
+    ENRICH_CACHE_PATH: str | None = "data/enrich_cache.db"  # raw provider results per (provider, domain, query); empty disables
+    ENRICH_CACHE_TTL_S: float = 7 * 86400  # served as-is while younger than this
+    ENRICH_CACHE_EMPTY_TTL_S: float = 86400  # empty results expire sooner
+    ENRICH_CACHE_STALE_S: float = 30 * 86400  # then served stale (with a background refresh) for this much longer
+
+    # Email verification: contacts verified concurrently, each verifier capped separately
+    VERIFY_CONCURRENCY: int = 8  # contacts in flight per enrichment
+    VERIFIER_CONCURRENCY: int = 4  # default in-flight calls per verifier (process-wide); override with <NAME>_VERIFY_CONCURRENCY
+    ZEROBOUNCE_VERIFY_CONCURRENCY: int | None = None
+    NEVERBOUNCE_VERIFY_CONCURRENCY: int | None = None
+    HUNTER_VERIFY_CONCURRENCY: int | None = None
+    VERIFY_CACHE_PATH: str | None = "data/verify_cache.db"  # shared verdict cache; empty disables
+    VERIFY_CACHE_TTL_DELIVERABLE_S: float = 90 * 86400
+    VERIFY_CACHE_TTL_UNDELIVERABLE_S: float = 30 * 86400
+    VERIFY_CACHE_TTL_RISKY_S: float = 14 * 86400
+    VERIFY_CACHE_TTL_UNKNOWN_S: float = 86400  # negative cache for addresses no verifier could judge
+    VERIFY_BATCH_THRESHOLD: int = 50  # this many unverified addresses switch to vendor bulk APIs (verify_many)
+    VERIFY_BATCH_LINGER_S: float = 2.0  # bulk requests pool rows' unverified addresses this long before sending
+    VERIFY_BULK_POLL_INTERVAL_S: float = 5.0
+    VERIFY_BULK_TIMEOUT_S: float = 1800.0
+    VERIFY_DOMAIN_CACHE_TTL_S: float = 30 * 86400  # catch-all/disposable/invalid domain verdicts; 0 disables
+
+    # Durable enrichment job queue (SQLite, shared by every process)
+    JOBS_DB_PATH: str = "data/jobs.db"
+    JOBS_RUN_IN_WEB: bool = True  # run the job runner inside each uvicorn worker
+    JOBS_CONCURRENCY: int = 4  # jobs in flight per runner
+    JOBS_LEASE_S: float = 120.0  # renewed every third of this while a job runs
+    JOBS_MAX_ATTEMPTS: int = 5  # then the job is dead-lettered
+    JOBS_RETRY_BASE_S: float = 15.0  # backoff doubles per attempt
+    JOBS_RETRY_MAX_S: float = 900.0
+    JOBS_POLL_INTERVAL_S: float = 1.0
+    JOBS_DRAIN_TIMEOUT_S: float = 30.0  # on shutdown; unfinished jobs are handed back to the queue
+    WORKER_PROCESSES: int = 2  # python -m app.worker
+    WORKER_CONCURRENCY: int | None = None  # jobs in flight per worker process; defaults to JOBS_CONCURRENCY
+    JOBS_WAIT_METRICS_WINDOW_S: float = 3600.0  # per-class queue wait stats on /metrics cover jobs claimed this recently
+
+    # Priority lanes: share of job claims and vendor tokens per class while several classes are waiting
+    PRIORITY_WEIGHT_INTERACTIVE: float = 8.0
+    PRIORITY_WEIGHT_API: float = 4.0
+    PRIORITY_WEIGHT_BULK: float = 1.0
+
+    # Idempotent /pipeline/* requests (Idempotency-Key header, else a hash of the body)
+    IDEMPOTENCY_DB_PATH: str | None = "data/idempotency.db"  # empty disables replays
+    IDEMPOTENCY_TTL_S: float = 86400.0  # replay window for an explicit Idempotency-Key
+    IDEMPOTENCY_DERIVED_TTL_S: float = 10.0  # without a key, an identical body is replayed this long; 0 disables
+
 settings = Settings()
@@ -1,6 +1,26 @@
 import orjson
 from app.config.settings import settings
-from app.utils.http import make_client, retryable
+from app.hubspot.mirror import get_mirror
+from app.utils.http import retryable, send
+from app.utils.log import get_logger
+
+logger = get_logger("sf-hubspot")
+
+BATCH_LIMIT = 100  # HubSpot's max inputs per batch request
+CONTACT_TO_COMPANY_TYPE_ID = 279  # HUBSPOT_DEFINED contact -> company (unlabeled)
+
+def _chunks(items: list, size: int = BATCH_LIMIT):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _result_email(result: dict) -> str:
+    return ((result.get("properties") or {}).get("email") or "").strip().lower()
+
+def _error_detail(exc: Exception) -> tuple[int | None, str]:
+    resp = getattr(exc, "response", None)
+    if resp is not None:
+        return resp.status_code, resp.text[:500]
+    return None, str(exc)[:500]
 
 class HubSpotClient:
     def __init__(self):
@@ -11,58 +31,188 @@ class HubSpotClient:
             "Authorization": f"Bearer {settings.HUBSPOT_PRIVATE_APP_TOKEN}",
             "Content-Type": "application/json",
         }
+        self.mirror = get_mirror()
 
-    async def _request(self, method: str, path: str, json_body=None, params=None):
+    async def _request(self, method: str, path: str, json_body=None, params=None, vendor: str = "hubspot"):
         url = f"{self.base_url}{path}"
-        async with make_client(headers=self.headers) as client:
 
-            @retryable()
-            async def do():
-                resp = await client.request(
-                    method, url,
-                    content=orjson.dumps(json_body) if json_body is not None else None,
-                    params=params
-                )
-                resp.raise_for_status()
-                return resp.json() if resp.content else None
+        @retryable()
+        async def do():
+            resp = await send(
+                vendor, method, url,
+                content=orjson.dumps(json_body) if json_body is not None else None,
+                params=params,
+                headers=self.headers,
+            )
+            resp.raise_for_status()
+            return resp.json() if resp.content else None
 
-            return await do()
+        return await do()
 
     async def get_company(self, company_id: str, properties: list[str] | None = None):
+        if self.mirror:
+            cached = self.mirror.get_company(company_id, properties)
+            if cached:
+                return cached
         params = {}
         if properties:
             params["properties"] = properties
-        return await self._request("GET", f"/crm/v3/objects/companies/{company_id}", params=params)
+        company = await self._request("GET", f"/crm/v3/objects/companies/{company_id}", params=params)
+        if self.mirror and company:
+            self.mirror.put_companies([company])
+        return company
+
+    async def list_objects(self, object_type: str, properties: list[str], after: str | None = None, limit: int = BATCH_LIMIT):
+        params = {"limit": limit, "properties": properties}
+        if after:
+            params["after"] = after
+        return await self._request("GET", f"/crm/v3/objects/{object_type}", params=params)
+
+    async def search_objects(self, object_type: str, body: dict):
+        return await self._request("POST", f"/crm/v3/objects/{object_type}/search", json_body=body, vendor="hubspot_search")
 
     async def search_contact_by_email(self, email: str, properties: list[str] | None = None):
+        if self.mirror:
+            cached = self.mirror.get_contact(email, properties)
+            if cached:
+                return cached
         body = {
             "filterGroups": [{"filters": [{"propertyName": "email", "operator": "EQ", "value": email}]}],
             "limit": 1,
         }
         if properties:
             body["properties"] = properties
-        search = await self._request("POST", "/crm/v3/objects/contacts/search", json_body=body)
+        if self.mirror:
+            body["properties"] = ["email", *(properties or [])]
+        search = await self._request("POST", "/crm/v3/objects/contacts/search", json_body=body, vendor="hubspot_search")
         results = (search or {}).get("results", [])
+        if self.mirror and results:
+            self.mirror.put_contacts(results[:1])
         return results[0] if results else None
 
+    async def search_contacts_by_emails(self, emails: list[str], properties: list[str] | None = None) -> dict[str, dict]:
+        """One search for up to 100 emails (IN filter); returns {lowercased email: contact}."""
+        found: dict[str, dict] = {}
+        if self.mirror:
+            for email in emails:
+                cached = self.mirror.get_contact(email, properties)
+                if cached:
+                    found[email.strip().lower()] = cached
+            emails = [e for e in emails if e.strip().lower() not in found]
+        for chunk in _chunks(emails):
+            body = {
+                "filterGroups": [{"filters": [{"propertyName": "email", "operator": "IN", "values": chunk}]}],
+                "properties": ["email", *(properties or [])],
+                "limit": BATCH_LIMIT,
+            }
+            search = await self._request("POST", "/crm/v3/objects/contacts/search", json_body=body, vendor="hubspot_search")
+            for contact in (search or {}).get("results", []):
+                email = ((contact.get("properties") or {}).get("email") or "").strip().lower()
+                if email:
+                    found[email] = contact
+            if self.mirror:
+                self.mirror.put_contacts((search or {}).get("results", []))
+        return found
+
     async def create_or_update_contact_by_email(self, email: str, properties: dict):
         contact = await self.search_contact_by_email(email)
         if contact:
-            contact_id = contact["id"]
-            return await self._request("PATCH", f"/crm/v3/objects/contacts/{contact_id}", json_body={"properties": properties})
-        return await self._request("POST", "/crm/v3/objects/contacts", json_body={"properties": {"email": email, **properties}})
+            return await self.update_contact(contact["id"], properties)
+        return await self.create_contact({"email": email, **properties})
 
     async def create_contact(self, properties: dict):
-        return await self._request("POST", "/crm/v3/objects/contacts", json_body={"properties": properties})
+        contact = await self._request("POST", "/crm/v3/objects/contacts", json_body={"properties": properties})
+        if self.mirror and contact:
+            self.mirror.put_contacts([{"id": contact.get("id"), "properties": {**properties, **(contact.get("properties") or {})}}])
+        return contact
 
     async def update_contact(self, contact_id: str, properties: dict):
-        return await self._request("PATCH", f"/crm/v3/objects/contacts/{contact_id}", json_body={"properties": properties})
+        contact = await self._request("PATCH", f"/crm/v3/objects/contacts/{contact_id}", json_body={"properties": properties})
+        if self.mirror:
+            self.mirror.merge_contact_properties(contact_id, properties)
+        return contact
 
     async def update_company(self, company_id: str, properties: dict):
-        return await self._request("PATCH", f"/crm/v3/objects/companies/{company_id}", json_body={"properties": properties})
+        company = await self._request("PATCH", f"/crm/v3/objects/companies/{company_id}", json_body={"properties": properties})
+        if self.mirror:
+            self.mirror.merge_company_properties(company_id, properties)
+        return company
 
     async def associate_contact_to_company(self, contact_id: str, company_id: str):
         return await self._request(
             "PUT",
             f"/crm/v4/objects/contacts/{contact_id}/associations/companies/{company_id}/contact_to_company",
         )
+
+    async def list_company_contact_ids(self, company_id: str) -> set[str]:
+        """Ids of every contact already associated with the company (one call per 500)."""
+        ids: set[str] = set()
+        after = None
+        while True:
+            params = {"limit": 500, **({"after": after} if after else {})}
+            page = await self._request("GET", f"/crm/v4/objects/companies/{company_id}/associations/contacts", params=params) or {}
+            ids.update(str(r["toObjectId"]) for r in page.get("results") or [] if r.get("toObjectId") is not None)
+            after = ((page.get("paging") or {}).get("next") or {}).get("after")
+            if not after:
+                return ids
+
+    async def _batch(self, path: str, inputs: list[dict], extra: dict | None = None) -> dict:
+        """POST inputs in chunks of BATCH_LIMIT; a failed chunk is reported per item, not raised."""
+        results: list[dict] = []
+        errors: list[dict] = []
+        for chunk in _chunks(inputs):
+            try:
+                data = await self._request("POST", path, json_body={**(extra or {}), "inputs": chunk}) or {}
+            except Exception as exc:
+                status, message = _error_detail(exc)
+                logger.warning("HubSpot batch %s failed for %d inputs: %s", path, len(chunk), message)
+                errors.extend({"input": item, "status": status, "message": message} for item in chunk)
+                continue
+            results.extend(data.get("results") or [])
+            errors.extend(data.get("errors") or [])
+        return {"results": results, "errors": errors}
+
+    async def batch_read_contacts(self, emails: list[str], properties: list[str] | None = None) -> dict:
+        cached: list[dict] = []
+        if self.mirror:
+            for email in emails:
+                hit = self.mirror.get_contact(email, properties)
+                if hit:
+                    cached.append(hit)
+            hit_emails = {c["properties"]["email"] for c in cached}
+            emails = [e for e in emails if e.strip().lower() not in hit_emails]
+        extra = {"idProperty": "email", "properties": ["email", *(properties or [])]}
+        read = await self._batch("/crm/v3/objects/contacts/batch/read", [{"id": e} for e in emails], extra) if emails else {"results": [], "errors": []}
+        if self.mirror:
+            self.mirror.put_contacts(read["results"])
+        return {"results": cached + read["results"], "errors": read["errors"]}
+
+    async def batch_upsert_contacts(self, items: list[tuple[str, dict]]) -> dict:
+        """Create or update contacts keyed by email in one call per 100 contacts."""
+        by_email: dict[str, dict] = {}
+        for email, properties in items:
+            key = (email or "").strip().lower()
+            if key:
+                by_email.setdefault(key, {}).update(properties)
+        inputs = [{"idProperty": "email", "id": email, "properties": props} for email, props in by_email.items()]
+        upserted = await self._batch("/crm/v3/objects/contacts/batch/upsert", inputs)
+        if self.mirror:
+            self.mirror.put_contacts([
+                {"id": r.get("id"), "properties": {**by_email.get(_result_email(r), {}), **(r.get("properties") or {})}}
+                for r in upserted["results"]
+            ])
+        return upserted
+
+    async def batch_associate_contacts_to_company(self, contact_ids: list[str], company_id: str) -> dict:
+        types = [{"associationCategory": "HUBSPOT_DEFINED", "associationTypeId": CONTACT_TO_COMPANY_TYPE_ID}]
+        inputs = [{"from": {"id": cid}, "to": {"id": company_id}, "types": types} for cid in contact_ids]
+        return await self._batch("/crm/v4/associations/contacts/companies/batch/create", inputs)
+
+
+_shared: HubSpotClient | None = None
+
+def get_hubspot_client() -> HubSpotClient:
+    global _shared
+    if _shared is None:
+        _shared = HubSpotClient()
+    return _shared
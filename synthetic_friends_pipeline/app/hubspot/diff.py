@@ -0,0 +1,57 @@
+import datetime
+
+
+def _norm(value) -> str:
+    # HubSpot echoes everything back as strings (numbers, bools, datetimes as ISO),
+    # while we write ints / epoch-ms; compare on a common textual form.
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    if "T" in text and text[:4].isdigit():
+        try:
+            dt = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+            return str(int(dt.timestamp() * 1000))
+        except ValueError:
+            return text
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+def diff_properties(current: dict | None, updates: dict) -> dict:
+    """Only the properties whose value differs from what HubSpot already has."""
+    current = current or {}
+    return {k: v for k, v in updates.items() if _norm(current.get(k)) != _norm(v)}
+
+
+class WriteStats:
+    def __init__(self):
+        self.writes_sent = 0
+        self.writes_skipped = 0
+        self.fields_sent = 0
+        self.fields_skipped = 0
+
+    def record(self, proposed: int, sent: int) -> None:
+        if sent:
+            self.writes_sent += 1
+        else:
+            self.writes_skipped += 1
+        self.fields_sent += sent
+        self.fields_skipped += proposed - sent
+
+    def snapshot(self) -> dict:
+        return {
+            "writes_sent": self.writes_sent,
+            "writes_skipped": self.writes_skipped,
+            "fields_sent": self.fields_sent,
+            "fields_skipped": self.fields_skipped,
+        }
+
+
+write_stats = WriteStats()
@@ -0,0 +1,68 @@
+import asyncio
+
+from app.config.settings import settings
+from app.hubspot.client import BATCH_LIMIT, get_hubspot_client
+from app.utils.log import get_logger
+
+logger = get_logger("sf-hubspot-loader")
+
+
+class ContactLookupLoader:
+    """Merge contact-by-email lookups arriving within a short window into one IN search."""
+
+    def __init__(self, window_ms: int | None = None, max_batch: int = BATCH_LIMIT):
+        self.window_s = (settings.HUBSPOT_LOOKUP_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch = max_batch
+        self._pending: dict[tuple[str, ...], dict[str, list[asyncio.Future]]] = {}
+        self._timers: dict[tuple[str, ...], asyncio.TimerHandle] = {}
+        self._inflight: set[asyncio.Task] = set()
+        self.lookups = 0
+        self.searches = 0
+
+    async def load(self, email: str, properties: list[str] | None = None) -> dict | None:
+        email = (email or "").strip().lower()
+        if not email:
+            return None
+        key = tuple(sorted(set(properties or [])))
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        group = self._pending.setdefault(key, {})
+        group.setdefault(email, []).append(fut)
+        self.lookups += 1
+        if len(group) >= self.max_batch:
+            self._dispatch(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window_s, self._dispatch, key)
+        return await fut
+
+    def _dispatch(self, key: tuple[str, ...]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        group = self._pending.pop(key, None)
+        if not group:
+            return
+        task = asyncio.ensure_future(self._run(key, group))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, key: tuple[str, ...], group: dict[str, list[asyncio.Future]]) -> None:
+        self.searches += 1
+        try:
+            found = await get_hubspot_client().search_contacts_by_emails(list(group), list(key))
+        except Exception as exc:
+            for futures in group.values():
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(exc)
+            return
+        for email, futures in group.items():
+            for fut in futures:
+                if not fut.done():
+                    fut.set_result(found.get(email))
+
+    def snapshot(self) -> dict:
+        return {"lookups": self.lookups, "searches": self.searches}
+
+
+contact_loader = ContactLookupLoader()
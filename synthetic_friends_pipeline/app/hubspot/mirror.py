@@ -0,0 +1,282 @@
+import asyncio
+import datetime
+import time
+
+import orjson
+
+from app.config.hubspot_properties import COMPANY_PROPS, CONTACT_PROPS
+from app.config.settings import settings
+from app.utils.log import get_logger
+from app.utils.runtime import worker_id
+from app.utils.sqlite import connect, transaction
+
+logger = get_logger("sf-hubspot-mirror")
+
+MIRROR_CONTACT_PROPERTIES = ["email", "firstname", "lastname", "jobtitle", "lastmodifieddate", *CONTACT_PROPS.values()]
+MIRROR_COMPANY_PROPERTIES = ["name", "domain", "city", "state", "hs_lastmodifieddate", *COMPANY_PROPS.values()]
+
+SEARCH_PAGE_CAP = 10_000  # HubSpot search stops paging after 10k results
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    email TEXT PRIMARY KEY,
+    contact_id TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    updated_at_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_by_id ON contacts (contact_id);
+CREATE TABLE IF NOT EXISTS companies (
+    company_id TEXT PRIMARY KEY,
+    domain TEXT,
+    properties TEXT NOT NULL,
+    updated_at_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS companies_by_domain ON companies (domain);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _stringify(properties: dict) -> dict:
+    # HubSpot returns every property as a string; store write-through values the same way.
+    return {k: (None if v is None else str(v)) for k, v in properties.items()}
+
+
+class HubSpotMirror:
+    """Local read-through/write-through copy of contact and company properties."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def _hit(self, row, object_id_col: str, properties: list[str] | None) -> dict | None:
+        if row is None:
+            self.misses += 1
+            return None
+        props = orjson.loads(row["properties"])
+        if properties and not set(properties) <= props.keys():
+            self.misses += 1
+            return None
+        self.hits += 1
+        wanted = props if not properties else {k: props.get(k) for k in {"email", *properties} if k in props}
+        return {"id": row[object_id_col], "properties": wanted}
+
+    def get_contact(self, email: str, properties: list[str] | None = None) -> dict | None:
+        row = self.conn.execute(
+            "SELECT contact_id, properties FROM contacts WHERE email = ?", ((email or "").strip().lower(),)
+        ).fetchone()
+        return self._hit(row, "contact_id", properties)
+
+    def get_company(self, company_id: str, properties: list[str] | None = None) -> dict | None:
+        row = self.conn.execute(
+            "SELECT company_id, properties FROM companies WHERE company_id = ?", (str(company_id),)
+        ).fetchone()
+        return self._hit(row, "company_id", properties)
+
+    def put_contacts(self, contacts: list[dict]) -> None:
+        rows = []
+        for contact in contacts:
+            props = _stringify(contact.get("properties") or {})
+            email = (props.get("email") or "").strip().lower()
+            if email and contact.get("id"):
+                rows.append((email, str(contact["id"]), orjson.dumps(props).decode(), _now_ms()))
+        if not rows:
+            return
+        with transaction(self.conn):
+            for email, contact_id, props, now in rows:
+                existing = self.conn.execute("SELECT properties FROM contacts WHERE email = ?", (email,)).fetchone()
+                if existing:
+                    props = orjson.dumps({**orjson.loads(existing["properties"]), **orjson.loads(props)}).decode()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO contacts (email, contact_id, properties, updated_at_ms) VALUES (?, ?, ?, ?)",
+                    (email, contact_id, props, now),
+                )
+
+    def merge_contact_properties(self, contact_id: str, properties: dict) -> None:
+        row = self.conn.execute("SELECT email, properties FROM contacts WHERE contact_id = ?", (str(contact_id),)).fetchone()
+        if row is None:
+            return
+        props = {**orjson.loads(row["properties"]), **_stringify(properties)}
+        self.conn.execute(
+            "UPDATE contacts SET properties = ?, updated_at_ms = ? WHERE email = ?",
+            (orjson.dumps(props).decode(), _now_ms(), row["email"]),
+        )
+
+    def put_companies(self, companies: list[dict]) -> None:
+        with transaction(self.conn):
+            for company in companies:
+                if not company.get("id"):
+                    continue
+                props = _stringify(company.get("properties") or {})
+                existing = self.conn.execute(
+                    "SELECT properties FROM companies WHERE company_id = ?", (str(company["id"]),)
+                ).fetchone()
+                if existing:
+                    props = {**orjson.loads(existing["properties"]), **props}
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO companies (company_id, domain, properties, updated_at_ms) VALUES (?, ?, ?, ?)",
+                    (str(company["id"]), (props.get("domain") or "").lower() or None, orjson.dumps(props).decode(), _now_ms()),
+                )
+
+    def merge_company_properties(self, company_id: str, properties: dict) -> None:
+        row = self.conn.execute("SELECT 1 FROM companies WHERE company_id = ?", (str(company_id),)).fetchone()
+        if row is not None:
+            self.put_companies([{"id": company_id, "properties": properties}])
+
+    def get_state(self, name: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, name: str, value: str | None) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, value))
+
+    def try_acquire_sync_lease(self, owner: str, ttl_s: float) -> bool:
+        """Only one uvicorn worker runs the sync loop at a time."""
+        now = _now_ms()
+        with transaction(self.conn):
+            raw = self.get_state("sync_lease")
+            holder, _, expires = (raw or "").partition("|")
+            if raw and holder != owner and int(expires or 0) > now:
+                return False
+            self.set_state("sync_lease", f"{owner}|{now + int(ttl_s * 1000)}")
+        return True
+
+    def snapshot(self) -> dict:
+        contacts = self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+        companies = self.conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+        return {
+            "contacts": contacts,
+            "companies": companies,
+            "hits": self.hits,
+            "misses": self.misses,
+            "contacts_synced_at_ms": self.get_state("contacts_synced_at_ms"),
+            "companies_synced_at_ms": self.get_state("companies_synced_at_ms"),
+        }
+
+
+_mirror: HubSpotMirror | None = None
+
+
+def get_mirror() -> HubSpotMirror | None:
+    global _mirror
+    if _mirror is None and settings.HUBSPOT_MIRROR_PATH:
+        _mirror = HubSpotMirror(settings.HUBSPOT_MIRROR_PATH)
+    return _mirror
+
+
+_OBJECTS = {
+    "contacts": ("lastmodifieddate", MIRROR_CONTACT_PROPERTIES),
+    "companies": ("hs_lastmodifieddate", MIRROR_COMPANY_PROPERTIES),
+}
+
+
+def _store(mirror: HubSpotMirror, object_type: str, results: list[dict]) -> None:
+    if object_type == "contacts":
+        mirror.put_contacts(results)
+    else:
+        mirror.put_companies(results)
+
+
+class SyncLeaseLost(Exception):
+    pass
+
+
+def _renew(mirror: HubSpotMirror, lease: tuple[str, float] | None) -> None:
+    """Push the sync lease out before every page, so a long export never outlives it."""
+    if lease is not None and not mirror.try_acquire_sync_lease(*lease):
+        raise SyncLeaseLost("another worker took over the HubSpot mirror sync")
+
+
+async def _bootstrap(hs, mirror: HubSpotMirror, object_type: str, lease: tuple[str, float] | None = None) -> None:
+    _, properties = _OBJECTS[object_type]
+    started_ms = _now_ms()
+    after = mirror.get_state(f"{object_type}_export_after")
+    pages = 0
+    while True:
+        _renew(mirror, lease)
+        page = await hs.list_objects(object_type, properties, after=after)
+        _store(mirror, object_type, (page or {}).get("results") or [])
+        after = (((page or {}).get("paging") or {}).get("next") or {}).get("after")
+        mirror.set_state(f"{object_type}_export_after", after)  # resumable after a restart
+        pages += 1
+        if not after:
+            break
+    mirror.set_state(f"{object_type}_synced_at_ms", str(started_ms))
+    logger.info("HubSpot mirror bootstrapped %s (%d pages)", object_type, pages)
+
+
+async def _incremental(hs, mirror: HubSpotMirror, object_type: str, lease: tuple[str, float] | None = None) -> int:
+    modified_prop, properties = _OBJECTS[object_type]
+    since = int(mirror.get_state(f"{object_type}_synced_at_ms") or 0)
+    started_ms = _now_ms()
+    synced = 0
+    after = None
+    while True:
+        body = {
+            "filterGroups": [{"filters": [{"propertyName": modified_prop, "operator": "GTE", "value": str(since)}]}],
+            "sorts": [{"propertyName": modified_prop, "direction": "ASCENDING"}],
+            "properties": properties,
+            "limit": 100,
+        }
+        if after:
+            body["after"] = after
+        _renew(mirror, lease)
+        page = await hs.search_objects(object_type, body)
+        results = (page or {}).get("results") or []
+        _store(mirror, object_type, results)
+        synced += len(results)
+        after = (((page or {}).get("paging") or {}).get("next") or {}).get("after")
+        if not after:
+            break
+        if int(after) >= SEARCH_PAGE_CAP - 100 and results:
+            # restart the window from the newest modification seen so far
+            last = (results[-1].get("properties") or {}).get(modified_prop)
+            since = _iso_to_ms(last) or since
+            after = None
+    mirror.set_state(f"{object_type}_synced_at_ms", str(started_ms))
+    return synced
+
+
+def _iso_to_ms(value: str | None) -> int | None:
+    if not value:
+        return None
+    try:
+        return int(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+async def sync_once(hs, mirror: HubSpotMirror, lease: tuple[str, float] | None = None) -> dict:
+    """`lease` is (owner, ttl_s): renewed before every page, and the sync stops if another worker holds it."""
+    counts = {}
+    for object_type in _OBJECTS:
+        if mirror.get_state(f"{object_type}_synced_at_ms") is None:
+            await _bootstrap(hs, mirror, object_type, lease)
+            counts[object_type] = "bootstrapped"
+        else:
+            counts[object_type] = await _incremental(hs, mirror, object_type, lease)
+    return counts
+
+
+async def run_sync_loop(hs, mirror: HubSpotMirror) -> None:
+    owner = worker_id()
+    interval = settings.HUBSPOT_MIRROR_SYNC_INTERVAL_S
+    lease = (owner, interval * 3)
+    while True:
+        try:
+            if mirror.try_acquire_sync_lease(*lease):
+                counts = await sync_once(hs, mirror, lease)
+                logger.info("HubSpot mirror sync: %s", counts)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("HubSpot mirror sync failed: %s", exc)
+        await asyncio.sleep(interval)
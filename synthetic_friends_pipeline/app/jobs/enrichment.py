@@ -0,0 +1,91 @@
+import asyncio
+from typing import Callable
+
+from app.config.hubspot_properties import COMPANY_PROPS
+from app.hubspot.client import get_hubspot_client
+from app.jobs.queue import DEAD, PermanentJobError, get_job_queue
+from app.pipeline.hubspot_company import enrich_hubspot_company_by_id
+from app.utils.log import get_logger
+from app.utils.priority import API, SOURCE_PRIORITY
+
+logger = get_logger("sf-jobs")
+
+KIND = "enrich_hubspot_company"
+
+# a new job waits this long for its "queued" write; if the enqueuing process dies first it runs anyway
+STATUS_HOLD_S = 60.0
+
+
+async def _set_status(company_id: str, status: str, notes: str) -> None:
+    try:
+        await get_hubspot_client().update_company(company_id, {
+            COMPANY_PROPS["sf_enrichment_status"]: status,
+            COMPANY_PROPS["sf_enrichment_notes"]: notes[:2500],
+        })
+    except Exception as exc:
+        logger.warning("could not mark company %s %s: %s", company_id, status, exc)
+
+
+_status_writes: set[asyncio.Task] = set()
+
+
+async def _mark_queued(company_id: str, job_id: str, on_ready: Callable[[], None] | None) -> None:
+    try:
+        # bounded well inside the hold, so the write is done (or abandoned) before any runner can claim
+        await asyncio.wait_for(_set_status(company_id, "queued", f"Queued (job {job_id})"), timeout=STATUS_HOLD_S / 2)
+    except asyncio.TimeoutError:
+        logger.warning("marking company %s queued timed out", company_id)
+    if get_job_queue().make_ready(job_id) and on_ready is not None:
+        on_ready()
+
+
+def enqueue_hubspot_enrichment(
+    company_id: str,
+    force_refresh: bool = False,
+    source: str = "api",
+    priority: str | None = None,
+    tenant: str | None = None,
+    on_ready: Callable[[], None] | None = None,
+) -> str:
+    """Queue an enrichment, or return the job already queued/running for this company (webhook redeliveries, double clicks).
+
+    The priority class defaults from `source`: webhook -> interactive, api -> api, bulk -> bulk.
+    A new job stays unclaimable until HubSpot shows "queued", so that write can never land after the
+    runner's "running"/"success". The write runs in the background, so callers return at once;
+    `on_ready` is called once the job can be claimed.
+    """
+    queue = get_job_queue()
+    job_id, created = queue.enqueue_once(
+        KIND,
+        {"hubspot_company_id": company_id, "force_refresh": force_refresh, "source": source},
+        dedup_key=f"{KIND}:{company_id}",
+        priority=priority or SOURCE_PRIORITY.get(source, API),
+        tenant=tenant,
+        delay_s=STATUS_HOLD_S,
+    )
+    if not created:
+        return job_id
+    task = asyncio.create_task(_mark_queued(company_id, job_id, on_ready))
+    _status_writes.add(task)
+    task.add_done_callback(_status_writes.discard)
+    return job_id
+
+
+async def run(job: dict) -> dict:
+    payload = job["payload"]
+    result = await enrich_hubspot_company_by_id(
+        payload["hubspot_company_id"],
+        force_refresh=payload.get("force_refresh", False),
+        mark_error=False,
+    )
+    if result is None:
+        raise PermanentJobError("HubSpot company not found")
+    return result.model_dump()
+
+
+async def on_failure(job: dict, status: str, error: str) -> None:
+    company_id = job["payload"]["hubspot_company_id"]
+    if status == DEAD:
+        await _set_status(company_id, "error", f"Pipeline failed: {error[:500]}")
+    else:
+        await _set_status(company_id, "queued", f"Retrying (attempt {job['attempts']} failed): {error[:500]}")
@@ -0,0 +1,311 @@
+import time
+import uuid
+from collections import Counter
+
+import orjson
+
+from app.config.settings import settings
+from app.utils.log import get_logger
+from app.utils.priority import API, PRIORITIES, FairScheduler
+from app.utils.sqlite import connect, transaction
+
+logger = get_logger("sf-jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCESS = "success"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at_ms INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires_ms INTEGER,
+    result TEXT,
+    last_error TEXT,
+    created_at_ms INTEGER NOT NULL,
+    updated_at_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at_ms);
+CREATE INDEX IF NOT EXISTS jobs_by_lease ON jobs (status, lease_expires_ms);
+"""
+
+# added after the first release; created on open by ALTER TABLE when missing
+_COLUMNS = {
+    "dedup_key": "TEXT",
+    "priority": f"TEXT NOT NULL DEFAULT '{API}'",
+    "tenant": "TEXT NOT NULL DEFAULT ''",
+    "claimed_at_ms": "INTEGER",
+    "waited_ms": "INTEGER",
+}
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_by_dedup_key ON jobs (dedup_key, status);
+CREATE INDEX IF NOT EXISTS jobs_fair ON jobs (status, priority, tenant, run_at_ms);
+CREATE INDEX IF NOT EXISTS jobs_by_claim ON jobs (claimed_at_ms);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help; the job goes straight to the dead-letter list."""
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _backoff_s(attempts: int) -> float:
+    return min(settings.JOBS_RETRY_MAX_S, settings.JOBS_RETRY_BASE_S * (2 ** max(0, attempts - 1)))
+
+
+class JobQueue:
+    """Durable SQLite job queue shared by every process: leases, retries with backoff and a dead-letter status."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for name, decl in _COLUMNS.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+        self.conn.executescript(_INDEXES)
+        self._scheduler = FairScheduler()
+        self.coalesced = 0
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        max_attempts: int | None = None,
+        dedup_key: str | None = None,
+        priority: str = API,
+        tenant: str | None = None,
+        delay_s: float = 0.0,
+    ) -> str:
+        """Queue a job; `delay_s` keeps it unclaimable until then (or until make_ready)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority!r}")
+        job_id = uuid.uuid4().hex
+        now = _now_ms()
+        self.conn.execute(
+            "INSERT INTO jobs (id, kind, payload, status, max_attempts, run_at_ms, created_at_ms, updated_at_ms, dedup_key, "
+            "priority, tenant) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, orjson.dumps(payload), QUEUED, max_attempts or settings.JOBS_MAX_ATTEMPTS,
+             now + int(delay_s * 1000), now, now, dedup_key, priority, tenant or ""),
+        )
+        return job_id
+
+    def enqueue_once(
+        self,
+        kind: str,
+        payload: dict,
+        dedup_key: str,
+        max_attempts: int | None = None,
+        priority: str = API,
+        tenant: str | None = None,
+        delay_s: float = 0.0,
+    ) -> tuple[str, bool]:
+        """Enqueue unless a job with the same dedup_key is already queued or running; returns (job_id, created).
+
+        A still-queued job is raised to `priority` (and takes `tenant`) if that outranks its own, so a
+        rep's click is not left waiting behind the bulk run that queued the company first.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority!r}")
+        with transaction(self.conn):
+            row = self.conn.execute(
+                "SELECT id, status, priority FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at_ms LIMIT 1",
+                (dedup_key, QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                self.coalesced += 1
+                if row["status"] == QUEUED and PRIORITIES.index(priority) < PRIORITIES.index(row["priority"]):
+                    self.conn.execute(
+                        "UPDATE jobs SET priority = ?, tenant = ?, updated_at_ms = ? WHERE id = ?",
+                        (priority, tenant or "", _now_ms(), row["id"]),
+                    )
+                return row["id"], False
+            job_id = self.enqueue(
+                kind, payload, max_attempts=max_attempts, dedup_key=dedup_key, priority=priority, tenant=tenant, delay_s=delay_s
+            )
+            return job_id, True
+
+    def make_ready(self, job_id: str) -> bool:
+        """Let a job queued with delay_s be claimed now."""
+        now = _now_ms()
+        cur = self.conn.execute(
+            "UPDATE jobs SET run_at_ms = ?, updated_at_ms = ? WHERE id = ? AND status = ? AND run_at_ms > ?",
+            (now, now, job_id, QUEUED, now),
+        )
+        return cur.rowcount == 1
+
+    def claim(self, owner: str, limit: int = 1) -> list[dict]:
+        """Lease up to `limit` due jobs to `owner`.
+
+        Jobs whose lease expired go first. Queued jobs are then picked by weighted fair queuing: priority
+        classes share claims by PRIORITY_WEIGHT_*, tenants within a class share equally, oldest first.
+        """
+        now = _now_ms()
+        lease_until = now + int(settings.JOBS_LEASE_S * 1000)
+        with transaction(self.conn):
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND lease_expires_ms < ? ORDER BY lease_expires_ms LIMIT ?",
+                (RUNNING, now, limit),
+            ).fetchall()
+            backlog: dict[str, dict[str, int]] = {}
+            for row in self.conn.execute(
+                "SELECT priority, tenant, COUNT(*) AS n FROM jobs WHERE status = ? AND run_at_ms <= ? GROUP BY priority, tenant",
+                (QUEUED, now),
+            ):
+                backlog.setdefault(row["priority"], {})[row["tenant"]] = row["n"]
+            picks: Counter = Counter()
+            for _ in range(limit - len(rows)):
+                lane = self._scheduler.pick(backlog)
+                if lane is None:
+                    break
+                picks[lane] += 1
+                priority, tenant = lane
+                backlog[priority][tenant] -= 1
+                if not backlog[priority][tenant]:
+                    del backlog[priority][tenant]
+            for (priority, tenant), n in picks.items():
+                rows += self.conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND priority = ? AND tenant = ? AND run_at_ms <= ? ORDER BY run_at_ms LIMIT ?",
+                    (QUEUED, priority, tenant, now, n),
+                ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires_ms = ?, attempts = attempts + 1, "
+                "claimed_at_ms = ?, waited_ms = ?, updated_at_ms = ? WHERE id = ?",
+                [(RUNNING, owner, lease_until, now, max(0, now - row["run_at_ms"]), now, row["id"]) for row in rows],
+            )
+        jobs = []
+        for row in rows:
+            job = self._row(row)
+            job.update(status=RUNNING, lease_owner=owner, attempts=row["attempts"] + 1)
+            jobs.append(job)
+        return jobs
+
+    def extend_lease(self, job_id: str, owner: str) -> bool:
+        cur = self.conn.execute(
+            "UPDATE jobs SET lease_expires_ms = ?, updated_at_ms = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (_now_ms() + int(settings.JOBS_LEASE_S * 1000), _now_ms(), job_id, RUNNING, owner),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, owner: str, result: dict | None = None) -> bool:
+        cur = self.conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, lease_expires_ms = NULL, updated_at_ms = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            (SUCCESS, orjson.dumps(result) if result is not None else None, _now_ms(), job_id, owner),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, job_id: str, owner: str, error: str, permanent: bool = False) -> str | None:
+        """Requeue with backoff, or dead-letter once attempts run out. Returns the new status (None if the lease was lost)."""
+        with transaction(self.conn):
+            row = self.conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, owner)
+            ).fetchone()
+            if row is None:
+                return None
+            now = _now_ms()
+            dead = permanent or row["attempts"] >= row["max_attempts"]
+            status = DEAD if dead else QUEUED
+            run_at = now if dead else now + int(_backoff_s(row["attempts"]) * 1000)
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, last_error = ?, run_at_ms = ?, lease_owner = NULL, lease_expires_ms = NULL, "
+                "updated_at_ms = ? WHERE id = ?",
+                (status, error[:2000], run_at, now, job_id),
+            )
+        return status
+
+    def release(self, job_id: str, owner: str) -> bool:
+        """Hand an unfinished job back (graceful shutdown) without spending one of its attempts."""
+        now = _now_ms()
+        cur = self.conn.execute(
+            "UPDATE jobs SET status = ?, attempts = MAX(0, attempts - 1), run_at_ms = ?, lease_owner = NULL, "
+            "lease_expires_ms = NULL, updated_at_ms = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (QUEUED, now, now, job_id, owner, RUNNING),
+        )
+        return cur.rowcount == 1
+
+    def retry(self, job_id: str) -> bool:
+        """Move a dead-lettered job back to the queue with a fresh attempt budget."""
+        now = _now_ms()
+        cur = self.conn.execute(
+            "UPDATE jobs SET status = ?, attempts = 0, run_at_ms = ?, updated_at_ms = ? WHERE id = ? AND status = ?",
+            (QUEUED, now, now, job_id, DEAD),
+        )
+        return cur.rowcount == 1
+
+    def get(self, job_id: str) -> dict | None:
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, status: str | None = None, limit: int = 100) -> list[dict]:
+        if status:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at_ms DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY updated_at_ms DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    @staticmethod
+    def _row(row) -> dict:
+        job = dict(row)
+        job["payload"] = orjson.loads(job["payload"])
+        job["result"] = orjson.loads(job["result"]) if job["result"] else None
+        return job
+
+    def snapshot(self) -> dict:
+        now = _now_ms()
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        ready = {
+            row["priority"]: row for row in self.conn.execute(
+                "SELECT priority, COUNT(*) AS n, MIN(run_at_ms) AS oldest FROM jobs WHERE status = ? AND run_at_ms <= ? "
+                "GROUP BY priority",
+                (QUEUED, now),
+            )
+        }
+        waits: dict[str, list[int]] = {}
+        for row in self.conn.execute(
+            "SELECT priority, waited_ms FROM jobs WHERE claimed_at_ms >= ?",
+            (now - int(settings.JOBS_WAIT_METRICS_WINDOW_S * 1000),),
+        ):
+            waits.setdefault(row["priority"], []).append(row["waited_ms"])
+        lanes = {}
+        for priority in PRIORITIES:
+            waited = sorted(waits.get(priority, []))
+            lane = ready.get(priority)
+            lanes[priority] = {
+                "ready": lane["n"] if lane else 0,
+                "oldest_ready_age_s": round((now - lane["oldest"]) / 1000, 1) if lane else 0.0,
+                "claimed": len(waited),
+                "wait_avg_s": round(sum(waited) / len(waited) / 1000, 2) if waited else 0.0,
+                "wait_p95_s": round(waited[int(0.95 * (len(waited) - 1))] / 1000, 2) if waited else 0.0,
+                "wait_max_s": round(waited[-1] / 1000, 2) if waited else 0.0,
+            }
+        oldest = min((lane["oldest"] for lane in ready.values()), default=None)
+        return {
+            "counts": {row["status"]: row["n"] for row in rows},
+            "oldest_ready_age_s": round((now - oldest) / 1000, 1) if oldest else 0.0,
+            "coalesced": self.coalesced,
+            "priorities": lanes,
+        }
+
+
+_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(settings.JOBS_DB_PATH)
+    return _queue
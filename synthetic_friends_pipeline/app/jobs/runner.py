@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+
+from app.config.settings import settings
+from app.jobs import enrichment
+from app.jobs.queue import DEAD, PermanentJobError, get_job_queue
+from app.utils.log import get_logger
+from app.utils.priority import set_lane
+from app.utils.runtime import worker_id
+
+logger = get_logger("sf-jobs")
+
+# kind -> (run(job) -> result, on_failure(job, new_status, error))
+HANDLERS = {
+    enrichment.KIND: (enrichment.run, enrichment.on_failure),
+}
+
+
+class JobRunner:
+    """Claims jobs from the durable queue and runs up to `concurrency` of them on this event loop."""
+
+    def __init__(self, concurrency: int | None = None):
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.owner = f"{worker_id()}:{uuid.uuid4().hex[:6]}"
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+        self.lost = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _heartbeat(self, job_id: str, job_task: asyncio.Task) -> None:
+        queue = get_job_queue()
+        while True:
+            await asyncio.sleep(settings.JOBS_LEASE_S / 3)
+            if not queue.extend_lease(job_id, self.owner):
+                # another worker may already be running it: stop ours rather than race it to HubSpot
+                logger.warning("lost lease on job %s; cancelling it here", job_id)
+                self.lost += 1
+                job_task.cancel()
+                return
+
+    async def _execute(self, job: dict) -> None:
+        set_lane(job["priority"], job["tenant"])  # this task's vendor calls wait in the job's lane
+        queue = get_job_queue()
+        run, on_failure = HANDLERS[job["kind"]]
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"], asyncio.current_task()))
+        try:
+            result = await run(job)
+            if queue.complete(job["id"], self.owner, result):
+                self.completed += 1
+            else:
+                self.lost += 1
+                logger.warning("job %s finished after its lease was lost; result discarded", job["id"])
+        except asyncio.CancelledError:
+            queue.release(job["id"], self.owner)
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            status = queue.fail(job["id"], self.owner, error, permanent=isinstance(exc, PermanentJobError))
+            if status is None:
+                self.lost += 1
+                logger.warning("job %s failed after its lease was lost (%s); left to its new owner", job["id"], error)
+                return
+            if status == DEAD:
+                self.dead += 1
+                logger.warning("job %s (%s) dead-lettered: %s", job["id"], job["kind"], error)
+            else:
+                self.retried += 1
+            await on_failure(job, status, error)
+        finally:
+            heartbeat.cancel()
+            self._inflight.pop(job["id"], None)
+            self._wake.set()
+
+    async def _run(self) -> None:
+        queue = get_job_queue()
+        while True:
+            free = self.concurrency - len(self._inflight)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = queue.claim(self.owner, free)
+                except Exception as exc:
+                    logger.warning("job claim failed: %s", exc)
+            for job in jobs:
+                if job["kind"] not in HANDLERS:
+                    queue.fail(job["id"], self.owner, f"no handler for {job['kind']}", permanent=True)
+                    continue
+                self._inflight[job["id"]] = asyncio.create_task(self._execute(job))
+            if not jobs or len(self._inflight) >= self.concurrency:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=settings.JOBS_POLL_INTERVAL_S)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop claiming, give in-flight jobs JOBS_DRAIN_TIMEOUT_S to finish, then hand the rest back."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        inflight = list(self._inflight.values())
+        if inflight:
+            _, pending = await asyncio.wait(inflight, timeout=settings.JOBS_DRAIN_TIMEOUT_S)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "owner": self.owner,
+            "inflight": len(self._inflight),
+            "concurrency": self.concurrency,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead": self.dead,
+            "lost": self.lost,
+        }
+
+
+job_runner = JobRunner()
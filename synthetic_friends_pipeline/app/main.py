@@ -1,22 +1,103 @@
+import asyncio
 import datetime
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import Response, RedirectResponse
+from fastapi.responses import JSONResponse, Response, RedirectResponse, StreamingResponse
+from pydantic import ValidationError
 from app.models.schemas import CompanyInput, HubSpotCompanyRef, EnrichmentResult, EmailEvent
 from app.utils.log import get_logger
-from app.hubspot.client import HubSpotClient
-from app.pipeline.orchestrator import enrich_company
-from app.pipeline.hubspot_writer import write_result_to_hubspot
-from app.pipeline.email_tracking import handle_email_event, PIXEL_GIF_BYTES
-from app.config.hubspot_properties import COMPANY_PROPS
+from app.hubspot.client import get_hubspot_client
+from app.hubspot.mirror import get_mirror, run_sync_loop
+from app.hubspot.loader import contact_loader
+from app.hubspot.diff import write_stats
+from app.pipeline.orchestrator import enrich_company, enrich_flights, ENRICHERS, VERIFIERS
+from app.pipeline.hubspot_company import hubspot_flights
+from app.pipeline.bulk_enrich import spool_rows, stream_enrichments
+from app.jobs.enrichment import enqueue_hubspot_enrichment
+from app.jobs.queue import get_job_queue
+from app.jobs.runner import job_runner
+from app.pipeline.email_tracking import handle_email_event, handle_email_events, log_email_event, PIXEL_GIF_BYTES, parse_occurred_at
+from app.pipeline.email_stats import close_stats_store, get_stats_store
+from app.pipeline.verification_cache import get_verification_cache
+from app.pipeline.enrichment_cache import get_enrichment_cache
+from app.pipeline.tracking_queue import tracking_queue
+from app.pipeline.email_rollups import aggregator
+from app.pipeline.dedup import dedup_index
 from app.config.settings import settings
+from app.utils.http import clients
+from app.utils.event_log import close_event_logs, get_event_log
+from app.utils.breaker import breaker_snapshot
+from app.utils.idempotency import KeyReuseError, derive_key, get_idempotency_store
+from app.utils.singleflight import SingleFlight
+from app.utils.ratelimit import limiter_snapshot, retry_budget
+from app.utils.streaming import StreamFormatError, iter_json_records
 
 logger = get_logger("sf-pipeline")
 
-app = FastAPI(title="Synthetic Friends Pipeline", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await clients.startup([settings.HUBSPOT_BASE_URL] + [p.base_url for p in ENRICHERS + VERIFIERS])
+    background: list[asyncio.Task] = []
+    if settings.EMAIL_DEDUP_STATE_PATH:
+        dedup_index.load(settings.EMAIL_DEDUP_STATE_PATH)
+    mirror = get_mirror()
+    if mirror and settings.HUBSPOT_PRIVATE_APP_TOKEN:
+        background.append(asyncio.create_task(run_sync_loop(get_hubspot_client(), mirror)))
+    if settings.EMAIL_ROLLUP_FLUSH_INTERVAL_S > 0 and settings.HUBSPOT_PRIVATE_APP_TOKEN:
+        await aggregator.start()
+    await tracking_queue.start()
+    if settings.JOBS_RUN_IN_WEB:
+        await job_runner.start()
+    try:
+        yield
+    finally:
+        await job_runner.stop()
+        await tracking_queue.stop()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await aggregator.stop()
+        if settings.EMAIL_DEDUP_STATE_PATH:
+            try:
+                dedup_index.save(settings.EMAIL_DEDUP_STATE_PATH)
+            except Exception as exc:
+                logger.warning("email dedup state save failed: %s", exc)
+        await clients.aclose()
+        close_stats_store()
+        close_event_logs()
+
+app = FastAPI(title="Synthetic Friends Pipeline", version="0.1.0", lifespan=lifespan)
 
 @app.get("/health")
 def health():
-    return {"ok": True}
+    providers = breaker_snapshot()
+    bypassed = sorted(name for name, b in providers.items() if b["state"] != "closed")
+    return {"ok": True, "bypassed_providers": bypassed, "providers": providers}
+
+@app.get("/metrics")
+def metrics():
+    mirror = get_mirror()
+    return {
+        "hubspot_writes": write_stats.snapshot(),
+        "hubspot_lookups": contact_loader.snapshot(),
+        "hubspot_mirror": mirror.snapshot() if mirror else None,
+        "email_rollups": aggregator.snapshot(),
+        "tracking_queue": tracking_queue.snapshot(),
+        "email_dedup": dedup_index.snapshot(),
+        "email_stats": get_stats_store().snapshot() if get_stats_store() else None,
+        "event_log": get_event_log(settings.EMAIL_EVENT_LOG_PATH).snapshot() if settings.EMAIL_EVENT_LOG_PATH else None,
+        "verification_cache": get_verification_cache().snapshot() if get_verification_cache() else None,
+        "enrichment_cache": get_enrichment_cache().snapshot() if get_enrichment_cache() else None,
+        "jobs": {**get_job_queue().snapshot(), "runner": job_runner.snapshot()},
+        "single_flight": {
+            "enrich_company": enrich_flights.snapshot(),
+            "hubspot_company": hubspot_flights.snapshot(),
+            "requests": request_flights.snapshot(),
+        },
+        "idempotency": get_idempotency_store().snapshot() if get_idempotency_store() else None,
+        "rate_limits": limiter_snapshot(),
+        "retry_budget": retry_budget.snapshot(),
+    }
 
 def _verify_tracking_token(request: Request) -> None:
     if not settings.EMAIL_TRACKING_SECRET:
@@ -29,6 +110,20 @@ def _verify_tracking_token(request: Request) -> None:
     if token != settings.EMAIL_TRACKING_SECRET:
         raise HTTPException(status_code=401, detail="Invalid tracking token")
 
+async def _track(event: EmailEvent, request_meta: dict) -> dict:
+    if not tracking_queue.running:
+        return await handle_email_event(event, request_meta=request_meta)
+    queued = tracking_queue.submit(event, request_meta)
+    if queued is not None:
+        return queued
+    if settings.TRACKING_QUEUE_OVERFLOW == "reject":
+        raise HTTPException(
+            status_code=503,
+            detail="Tracking queue full",
+            headers={"Retry-After": str(settings.TRACKING_QUEUE_RETRY_AFTER_S)},
+        )
+    return {**log_email_event(event, request_meta=request_meta, skip_rollup="shed"), "shed": True}
+
 @app.post("/email/event")
 async def email_event_endpoint(event: EmailEvent, request: Request):
     _verify_tracking_token(request)
@@ -36,9 +131,54 @@ async def email_event_endpoint(event: EmailEvent, request: Request):
         "ip": request.client.host if request.client else None,
         "user_agent": request.headers.get("User-Agent"),
     }
+    if settings.TRACKING_QUEUE_EVENT_API:
+        return await _track(event, request_meta)
     result = await handle_email_event(event, request_meta=request_meta)
     return result
 
+@app.post("/email/events")
+async def email_events_endpoint(request: Request):
+    """Batch ingest: JSON array or NDJSON body, validated as it streams in, one status per event."""
+    _verify_tracking_token(request)
+    request_meta = {
+        "ip": request.client.host if request.client else None,
+        "user_agent": request.headers.get("User-Agent"),
+    }
+    results: list[dict] = []
+    batch: list[tuple[int, EmailEvent]] = []
+
+    async def flush() -> None:
+        statuses = await handle_email_events([event for _, event in batch], request_meta=request_meta)
+        results.extend({"index": i, **status} for (i, _), status in zip(batch, statuses))
+        batch.clear()
+
+    received = 0
+    try:
+        async for record in iter_json_records(request.stream(), request.headers.get("Content-Type")):
+            if received >= settings.EMAIL_EVENTS_MAX_PER_REQUEST:
+                results.append({"index": received, "ok": False, "error": "too many events in one request"})
+                break
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append((received, EmailEvent.model_validate(record)))
+            except ValidationError as exc:
+                errors = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+                results.append({"index": received, "ok": False, "error": errors[:500]})
+            except Exception as exc:
+                results.append({"index": received, "ok": False, "error": str(exc)[:500]})
+            received += 1
+            if len(batch) >= settings.EMAIL_EVENTS_BATCH_SIZE:
+                await flush()
+    except StreamFormatError as exc:
+        # earlier batches are already logged; report where the body broke instead of failing them too
+        results.append({"index": received, "ok": False, "error": f"malformed body: {exc}"})
+    if batch:
+        await flush()
+    results.sort(key=lambda r: r["index"])
+    failed = sum(1 for r in results if not r["ok"])
+    return {"ok": failed == 0, "received": received, "failed": failed, "results": results}
+
 @app.get("/email/pixel.gif")
 async def email_pixel_endpoint(request: Request, tid: str, e: str | None = None):
     event = EmailEvent(
@@ -54,7 +194,7 @@ async def email_pixel_endpoint(request: Request, tid: str, e: str | None = None)
         "ip": request.client.host if request.client else None,
         "user_agent": request.headers.get("User-Agent"),
     }
-    await handle_email_event(event, request_meta=request_meta)
+    await _track(event, request_meta)
     headers = {
         "Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
         "Pragma": "no-cache",
@@ -78,58 +218,154 @@ async def email_redirect_endpoint(request: Request, tid: str, url: str, e: str |
         "ip": request.client.host if request.client else None,
         "user_agent": request.headers.get("User-Agent"),
     }
-    await handle_email_event(event, request_meta=request_meta)
+    await _track(event, request_meta)
     return RedirectResponse(url=url)
 
-@app.post("/pipeline/enrich_company", response_model=EnrichmentResult)
-async def enrich_company_endpoint(company: CompanyInput):
-    return await enrich_company(company)
-
-@app.post("/pipeline/enrich_hubspot_company", response_model=EnrichmentResult)
-async def enrich_hubspot_company(ref: HubSpotCompanyRef):
-    hs = HubSpotClient()
-    props = ["name", "domain", "city", "state"] + list(COMPANY_PROPS.values())
-    company_obj = await hs.get_company(ref.hubspot_company_id, properties=props)
-    if not company_obj:
-        raise HTTPException(status_code=404, detail="HubSpot company not found")
-
-    p = (company_obj.get("properties") or {})
-    company = CompanyInput(
-        company_name=p.get("name") or f"Company {ref.hubspot_company_id}",
-        domain=p.get("domain") or None,
-        hq_city=p.get("city") or None,
-        hq_state=p.get("state") or None,
-        notes=f"HubSpot companyId={ref.hubspot_company_id}",
-    )
+def _stats_store(request: Request):
+    _verify_tracking_token(request)
+    store = get_stats_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Email stats are disabled (EMAIL_STATS_PATH)")
+    return store
 
-    # mark running (best-effort)
-    try:
-        await hs.update_company(ref.hubspot_company_id, {
-            COMPANY_PROPS["sf_enrichment_status"]: "running",
-            COMPANY_PROPS["sf_enrichment_notes"]: "Pipeline started",
-        })
-    except Exception:
-        pass
+def _window(since: str | None, until: str | None) -> tuple[int | None, int | None]:
+    return (parse_occurred_at(since) if since else None, parse_occurred_at(until) if until else None)
+
+@app.get("/email/stats/contact/{email}")
+async def email_stats_contact(request: Request, email: str, since: str | None = None, until: str | None = None, bucket: str = "hour", top_urls: int = 10):
+    store = _stats_store(request)
+    since_ms, until_ms = _window(since, until)
+    stats = store.query("contact", email, since_ms, until_ms, bucket)
+    stats["top_urls"] = store.top_urls(email=email, since_ms=since_ms, until_ms=until_ms, limit=top_urls)
+    return stats
 
+@app.get("/email/stats/thread/{thread_id}")
+async def email_stats_thread(request: Request, thread_id: str, since: str | None = None, until: str | None = None, bucket: str = "hour"):
+    since_ms, until_ms = _window(since, until)
+    return _stats_store(request).query("thread", thread_id, since_ms, until_ms, bucket)
+
+@app.get("/email/stats/tid/{tid}")
+async def email_stats_tid(request: Request, tid: str, since: str | None = None, until: str | None = None, bucket: str = "hour", top_urls: int = 10):
+    store = _stats_store(request)
+    since_ms, until_ms = _window(since, until)
+    stats = store.query("tid", tid, since_ms, until_ms, bucket)
+    stats["top_urls"] = store.top_urls(tid=tid, since_ms=since_ms, until_ms=until_ms, limit=top_urls)
+    return stats
+
+@app.delete("/verification/cache")
+def invalidate_verification_cache(email: str | None = None, domain: str | None = None):
+    cache = get_verification_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Verification cache is disabled (VERIFY_CACHE_PATH)")
+    return {"ok": True, "removed": cache.invalidate(email=email, domain=domain)}
+
+request_flights = SingleFlight()
+_flight_bodies: dict[str, str] = {}  # idempotency key -> body hash of the request running under it
+
+async def _idempotent(request: Request, scope: str, body: dict, status_code: int, handler) -> JSONResponse:
+    """Replay the stored response for a repeated Idempotency-Key.
+
+    Without a key, only an identical body inside IDEMPOTENCY_DERIVED_TTL_S is replayed (double submits), and
+    `force_refresh` is never replayed. A key reused with a different body is answered 422. A repeat that arrives
+    while the first request is still running waits for that result. Only successes are stored.
+    """
+    explicit = request.headers.get("Idempotency-Key")
+    if not explicit and body.get("force_refresh"):
+        return JSONResponse(await handler(), status_code=status_code)
+    body_hash = derive_key(scope, body)
+    key = f"{scope}:{explicit}" if explicit else body_hash
+    ttl_s = None if explicit else settings.IDEMPOTENCY_DERIVED_TTL_S
+    store = get_idempotency_store() if ttl_s is None or ttl_s > 0 else None
     try:
-        result = await enrich_company(company)
-    except Exception as e:
+        if _flight_bodies.get(key, body_hash) != body_hash:
+            raise KeyReuseError(key)
+        stored = store.get(key, body_hash, ttl_s) if store is not None else None
+    except KeyReuseError:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    if stored is not None:
+        return JSONResponse(stored[1], status_code=stored[0], headers={"Idempotent-Replayed": "true"})
+
+    async def run() -> dict:
         try:
-            await hs.update_company(ref.hubspot_company_id, {
-                COMPANY_PROPS["sf_enrichment_status"]: "error",
-                COMPANY_PROPS["sf_enrichment_notes"]: f"Pipeline failed: {str(e)[:500]}",
-            })
-        except Exception:
-            pass
-        raise
-
-    await write_result_to_hubspot(ref.hubspot_company_id, result)
-    return result
+            content = await handler()
+        finally:
+            _flight_bodies.pop(key, None)
+        if store is not None:
+            store.put(key, status_code, content, body_hash)
+        return content
+
+    _flight_bodies.setdefault(key, body_hash)
+    return JSONResponse(await request_flights.do(key, run), status_code=status_code)
+
+@app.post("/pipeline/enrich_company", response_model=EnrichmentResult)
+async def enrich_company_endpoint(company: CompanyInput, request: Request):
+    async def handler() -> dict:
+        return (await enrich_company(company)).model_dump(mode="json")
+    return await _idempotent(request, "enrich_company", company.model_dump(mode="json"), 200, handler)
+
+@app.post("/pipeline/enrich_hubspot_company", status_code=202)
+async def enrich_hubspot_company(ref: HubSpotCompanyRef, request: Request):
+    async def handler() -> dict:
+        job_id = enqueue_hubspot_enrichment(
+            ref.hubspot_company_id,
+            force_refresh=ref.force_refresh,
+            source="api",
+            priority=ref.priority,
+            tenant=ref.requested_by,
+            on_ready=job_runner.wake,
+        )
+        return {"ok": True, "companyId": ref.hubspot_company_id, "job_id": job_id, "status": "queued"}
+    return await _idempotent(request, "enrich_hubspot_company", ref.model_dump(mode="json"), 202, handler)
+
+@app.post("/pipeline/enrich_companies")
+async def enrich_companies_endpoint(
+    request: Request,
+    write_back: bool = False,
+    concurrency: int | None = None,
+    requested_by: str | None = None,
+):
+    """JSON array, NDJSON or CSV of CompanyInput rows / HubSpot ids in; one NDJSON line per company out, as each finishes."""
+    try:
+        spool, rows = await spool_rows(request.stream(), request.headers.get("Content-Type"), settings.BULK_ENRICH_MAX_ROWS)
+    except StreamFormatError as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed body: {exc}")
+    limit = min(concurrency or settings.BULK_ENRICH_CONCURRENCY, settings.BULK_ENRICH_MAX_CONCURRENCY)
+    return StreamingResponse(
+        stream_enrichments(spool, limit, write_back, tenant=requested_by),
+        media_type="application/x-ndjson",
+        headers={"X-Row-Count": str(rows)},
+    )
 
-@app.post("/webhook/hubspot/company")
+@app.post("/webhook/hubspot/company", status_code=202)
 async def hubspot_company_webhook(payload: dict):
     company_id = payload.get("companyId") or payload.get("company_id") or payload.get("hubspot_company_id")
     if not company_id:
         raise HTTPException(status_code=400, detail="Missing companyId in payload")
-    result = await enrich_hubspot_company(HubSpotCompanyRef(hubspot_company_id=str(company_id)))
-    return {"ok": True, "companyId": str(company_id), "best": result.best_contact.model_dump() if result.best_contact else None}
+    # CRM card / workflow payloads name the rep (userEmail/userId) or at least the account (portalId)
+    requested_by = payload.get("userEmail") or payload.get("userId") or payload.get("portalId")
+    job_id = enqueue_hubspot_enrichment(
+        str(company_id),
+        source="webhook",
+        tenant=str(requested_by) if requested_by else None,
+        on_ready=job_runner.wake,
+    )
+    return {"ok": True, "companyId": str(company_id), "job_id": job_id, "status": "queued"}
+
+@app.get("/jobs")
+async def list_jobs(status: str | None = None, limit: int = 100):
+    """Recent jobs; `?status=dead` is the dead-letter list."""
+    return {"jobs": get_job_queue().list(status=status, limit=min(limit, 1000))}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    if not get_job_queue().retry(job_id):
+        raise HTTPException(status_code=409, detail="Only dead-lettered jobs can be retried")
+    job_runner.wake()
+    return {"ok": True, "job_id": job_id, "status": "queued"}
@@ -7,9 +7,13 @@ class CompanyInput(BaseModel):
     hq_city: Optional[str] = None
     hq_state: Optional[str] = None
     notes: Optional[str] = None
+    force_refresh: bool = Field(False, description="Bypass cached provider results")
 
 class HubSpotCompanyRef(BaseModel):
     hubspot_company_id: str
+    force_refresh: bool = False
+    priority: Optional[Literal["interactive", "api", "bulk"]] = Field(None, description="Queue class; defaults to api")
+    requested_by: Optional[str] = Field(None, description="Tenant/owner for fair scheduling within the class")
 
 class ContactCandidate(BaseModel):
     first_name: Optional[str] = None
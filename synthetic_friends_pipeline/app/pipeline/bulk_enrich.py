@@ -0,0 +1,111 @@
+import asyncio
+import tempfile
+from typing import IO, AsyncIterator
+
+import orjson
+from pydantic import ValidationError
+
+from app.models.schemas import CompanyInput
+from app.pipeline.hubspot_company import enrich_hubspot_company_by_id
+from app.pipeline.orchestrator import VerifyBatch, enrich_company, set_verify_batch
+from app.utils.log import get_logger
+from app.utils.priority import BULK, set_lane
+from app.utils.streaming import StreamFormatError, iter_records
+
+logger = get_logger("sf-bulk-enrich")
+
+_ID_KEYS = ("hubspot_company_id", "companyId", "company_id")
+_DONE = object()
+
+
+async def spool_rows(chunks: AsyncIterator[bytes], content_type: str | None, max_rows: int) -> tuple[IO[bytes], int]:
+    """Copy the request body to a temp file as one JSON record per line, so memory stays flat while it is read."""
+    spool = tempfile.TemporaryFile()
+    rows = 0
+    try:
+        async for record in iter_records(chunks, content_type):
+            if rows >= max_rows:
+                raise StreamFormatError(f"more than {max_rows} rows")
+            if isinstance(record, Exception):
+                record = {"__error__": str(record)}
+            elif not isinstance(record, dict):
+                # a bare id per row ([123, 456] or one id per NDJSON line)
+                record = {"hubspot_company_id": str(record)}
+            spool.write(orjson.dumps(record) + b"\n")
+            rows += 1
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, rows
+
+
+async def _enrich_row(index: int, record: dict, write_back: bool) -> dict:
+    if "__error__" in record:
+        return {"index": index, "ok": False, "error": record["__error__"]}
+    company_id = next((str(record[k]) for k in _ID_KEYS if record.get(k)), None)
+    force_refresh = str(record.get("force_refresh", "")).lower() in ("1", "true", "yes")
+    try:
+        if company_id:
+            result = await enrich_hubspot_company_by_id(company_id, force_refresh=force_refresh, write_back=write_back)
+            if result is None:
+                return {"index": index, "ok": False, "hubspot_company_id": company_id, "error": "HubSpot company not found"}
+        else:
+            result = await enrich_company(CompanyInput.model_validate({**record, "force_refresh": force_refresh}))
+    except ValidationError as exc:
+        errors = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+        return {"index": index, "ok": False, "error": errors[:500]}
+    except Exception as exc:
+        logger.warning("bulk enrichment of row %d failed: %s", index, exc)
+        return {"index": index, "ok": False, "hubspot_company_id": company_id, "error": f"{type(exc).__name__}: {str(exc)[:500]}"}
+    line = {"index": index, "ok": True, "result": result.model_dump()}
+    if company_id:
+        line["hubspot_company_id"] = company_id
+    return line
+
+
+async def stream_enrichments(
+    spool: IO[bytes],
+    concurrency: int,
+    write_back: bool,
+    tenant: str | None = None,
+) -> AsyncIterator[bytes]:
+    """Enrich spooled rows `concurrency` at a time and yield one NDJSON line per company as each finishes.
+
+    Rows run in the bulk lane of this process's rate limiters, so interactive and API enrichments made
+    by the same process get vendor tokens first (rows do not go through the job queue), and their
+    unverified contacts are pooled into one VerifyBatch so they reach the vendors' bulk APIs together.
+    """
+    concurrency = max(1, concurrency)
+    batch = VerifyBatch(max_waiters=concurrency)
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+    async def feed() -> None:
+        for index, line in enumerate(spool):
+            await inbox.put((index, orjson.loads(line)))
+        for _ in range(concurrency):
+            await inbox.put(_DONE)
+
+    async def work() -> None:
+        set_lane(BULK, tenant)
+        set_verify_batch(batch)
+        while (item := await inbox.get()) is not _DONE:
+            await outbox.put(await _enrich_row(*item, write_back))
+        await outbox.put(_DONE)
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            line = await outbox.get()
+            if line is _DONE:
+                finished += 1
+                continue
+            yield orjson.dumps(line) + b"\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await batch.aclose()
+        spool.close()
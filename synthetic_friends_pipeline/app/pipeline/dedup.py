@@ -0,0 +1,105 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import orjson
+
+from app.config.settings import settings
+from app.utils.log import get_logger
+
+logger = get_logger("sf-email-dedup")
+
+
+class DedupIndex:
+    """Time-windowed, size-capped set of recently seen open/click keys.
+
+    Keys are 12-byte digests of (tid, event_type, recipient, url); entries expire
+    `window_s` after first sight and the oldest are evicted past `max_entries`, so
+    memory stays bounded no matter how hard scanners hammer the pixel.
+    """
+
+    def __init__(self, window_s: float | None = None, max_entries: int | None = None):
+        self.window_s = settings.EMAIL_DEDUP_WINDOW_S if window_s is None else window_s
+        self.max_entries = settings.EMAIL_DEDUP_MAX_ENTRIES if max_entries is None else max_entries
+        self._seen: OrderedDict[bytes, float] = OrderedDict()  # digest -> expires_at (epoch s)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _key(tid: str, event_type: str, recipient: str, url: str) -> bytes:
+        raw = "\x1f".join((tid or "", event_type or "", recipient or "", url or "")).encode()
+        return hashlib.blake2b(raw, digest_size=12).digest()
+
+    def _expire(self, now: float) -> None:
+        # constant TTL from first sight, so insertion order is expiry order
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            self._seen.popitem(last=False)
+
+    def check(self, tid: str, event_type: str, recipient: str, url: str = "") -> bool:
+        """True if this key was already seen inside the window (and records it otherwise)."""
+        now = time.time()
+        self._expire(now)
+        key = self._key(tid, event_type, recipient, url)
+        if key in self._seen:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._seen[key] = now + self.window_s
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def load(self, path: str) -> None:
+        file = Path(path)
+        if not file.exists():
+            return
+        try:
+            entries = orjson.loads(file.read_bytes())
+        except Exception as exc:
+            logger.warning("email dedup state unreadable (%s): %s", path, exc)
+            return
+        now = time.time()
+        merged = dict(self._seen)
+        for hex_key, expires_at in entries:
+            key = bytes.fromhex(hex_key)
+            if expires_at > now and expires_at > merged.get(key, 0):
+                merged[key] = expires_at
+        # _expire and eviction pop from the front, so keep the index oldest-first
+        self._seen = OrderedDict(sorted(merged.items(), key=lambda kv: kv[1]))
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def save(self, path: str) -> None:
+        # merge with what other workers saved so the last one to stop doesn't erase the rest
+        self.load(path)
+        self._expire(time.time())
+        file = Path(path)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")  # workers stopping together never share one
+        tmp.write_bytes(orjson.dumps([[k.hex(), v] for k, v in self._seen.items()]))
+        tmp.replace(file)
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+dedup_index = DedupIndex()
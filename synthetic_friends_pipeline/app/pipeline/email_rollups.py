@@ -0,0 +1,370 @@
+import asyncio
+import time
+from typing import Any
+
+from app.config.hubspot_properties import CONTACT_PROPS
+from app.config.settings import settings
+from app.hubspot.client import get_hubspot_client
+from app.hubspot.diff import diff_properties, write_stats
+from app.utils.event_log import iter_log_records, writer_segments
+from app.utils.log import get_logger
+from app.utils.runtime import worker_id
+from app.utils.sqlite import connect, transaction
+
+logger = get_logger("sf-email-rollups")
+
+EMAIL_PROP_KEYS = [
+    CONTACT_PROPS["sf_email_first_tracked_at"],
+    CONTACT_PROPS["sf_email_last_activity_at"],
+    CONTACT_PROPS["sf_email_last_sent_at"],
+    CONTACT_PROPS["sf_email_last_received_at"],
+    CONTACT_PROPS["sf_email_last_opened_at"],
+    CONTACT_PROPS["sf_email_last_clicked_at"],
+    CONTACT_PROPS["sf_email_sent_count"],
+    CONTACT_PROPS["sf_email_received_count"],
+    CONTACT_PROPS["sf_email_open_count"],
+    CONTACT_PROPS["sf_email_click_count"],
+    CONTACT_PROPS["sf_email_last_subject"],
+    CONTACT_PROPS["sf_email_last_thread_id"],
+    CONTACT_PROPS["sf_email_last_message_id"],
+    CONTACT_PROPS["sf_email_last_event_type"],
+    CONTACT_PROPS["sf_email_last_direction"],
+]
+
+# event_type -> (counter property, last-at property)
+_EVENT_PROPS = {
+    "sent": (CONTACT_PROPS["sf_email_sent_count"], CONTACT_PROPS["sf_email_last_sent_at"]),
+    "received": (CONTACT_PROPS["sf_email_received_count"], CONTACT_PROPS["sf_email_last_received_at"]),
+    "open": (CONTACT_PROPS["sf_email_open_count"], CONTACT_PROPS["sf_email_last_opened_at"]),
+    "click": (CONTACT_PROPS["sf_email_click_count"], CONTACT_PROPS["sf_email_last_clicked_at"]),
+}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _parse_int(value: Any) -> int:
+    try:
+        return int(float(value))
+    except Exception:
+        return 0
+
+
+def _latest(current: tuple[int, Any] | None, ms: int, value: Any) -> tuple[int, Any] | None:
+    if value in (None, ""):
+        return current
+    if current is None or ms >= current[0]:
+        return (ms, value)
+    return current
+
+
+class EmailRollup:
+    """Folded tracking activity for one contact: counters add up, last-* fields keep the newest event."""
+
+    __slots__ = ("counts", "last_at", "first_ms", "last", "direction", "subject", "thread_id", "message_id", "oldest_ingest_ms")
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.last_at: dict[str, int] = {}
+        self.first_ms: int | None = None
+        self.last: tuple[int, str] | None = None
+        self.direction: tuple[int, str] | None = None
+        self.subject: tuple[int, str] | None = None
+        self.thread_id: tuple[int, str] | None = None
+        self.message_id: tuple[int, str] | None = None
+        self.oldest_ingest_ms: int | None = None
+
+    def add(
+        self,
+        event_type: str,
+        event_ms: int,
+        direction: str | None = None,
+        subject: str | None = None,
+        thread_id: str | None = None,
+        message_id: str | None = None,
+        ingested_ms: int | None = None,
+    ) -> "EmailRollup":
+        self.last = _latest(self.last, event_ms, event_type)
+        self.direction = _latest(self.direction, event_ms, direction)
+        self.subject = _latest(self.subject, event_ms, subject)
+        self.thread_id = _latest(self.thread_id, event_ms, thread_id)
+        self.message_id = _latest(self.message_id, event_ms, message_id)
+        self.first_ms = event_ms if self.first_ms is None else min(self.first_ms, event_ms)
+        if event_type in _EVENT_PROPS:
+            self.counts[event_type] = self.counts.get(event_type, 0) + 1
+            self.last_at[event_type] = max(self.last_at.get(event_type, event_ms), event_ms)
+        if ingested_ms is not None:
+            self.oldest_ingest_ms = ingested_ms if self.oldest_ingest_ms is None else min(self.oldest_ingest_ms, ingested_ms)
+        return self
+
+    def add_event(self, event, event_ms: int, ingested_ms: int | None = None) -> "EmailRollup":
+        return self.add(event.event_type, event_ms, event.direction, event.subject, event.thread_id, event.message_id, ingested_ms)
+
+    def add_payload(self, payload: dict) -> "EmailRollup":
+        """Fold one logged event (see email_tracking._event_payload)."""
+        return self.add(
+            payload.get("event_type"),
+            int(payload.get("received_at_ms") or 0),
+            payload.get("direction"),
+            payload.get("subject"),
+            payload.get("thread_id"),
+            payload.get("message_id"),
+            payload.get("ingested_at_ms"),
+        )
+
+    def merge(self, other: "EmailRollup") -> "EmailRollup":
+        for event_type, n in other.counts.items():
+            self.counts[event_type] = self.counts.get(event_type, 0) + n
+        for event_type, ms in other.last_at.items():
+            self.last_at[event_type] = max(self.last_at.get(event_type, ms), ms)
+        for field in ("last", "direction", "subject", "thread_id", "message_id"):
+            theirs = getattr(other, field)
+            if theirs is not None:
+                setattr(self, field, _latest(getattr(self, field), *theirs))
+        for field in ("first_ms", "oldest_ingest_ms"):
+            mine, theirs = getattr(self, field), getattr(other, field)
+            if theirs is not None:
+                setattr(self, field, theirs if mine is None else min(mine, theirs))
+        return self
+
+    def to_updates(self, current: dict) -> dict:
+        updates: dict[str, Any] = {}
+        if self.last:
+            updates[CONTACT_PROPS["sf_email_last_activity_at"]] = self.last[0]
+            updates[CONTACT_PROPS["sf_email_last_event_type"]] = self.last[1]
+        if self.direction:
+            updates[CONTACT_PROPS["sf_email_last_direction"]] = self.direction[1]
+        if self.first_ms is not None and not current.get(CONTACT_PROPS["sf_email_first_tracked_at"]):
+            updates[CONTACT_PROPS["sf_email_first_tracked_at"]] = self.first_ms
+        if self.subject:
+            updates[CONTACT_PROPS["sf_email_last_subject"]] = self.subject[1][:255]
+        if self.thread_id:
+            updates[CONTACT_PROPS["sf_email_last_thread_id"]] = self.thread_id[1]
+        if self.message_id:
+            updates[CONTACT_PROPS["sf_email_last_message_id"]] = self.message_id[1]
+        for event_type, n in self.counts.items():
+            count_prop, last_at_prop = _EVENT_PROPS[event_type]
+            updates[last_at_prop] = self.last_at[event_type]
+            updates[count_prop] = _parse_int(current.get(count_prop)) + n
+        return updates
+
+
+def _error_emails(errors: list[dict]) -> set[str]:
+    emails: set[str] = set()
+    for err in errors:
+        item = err.get("input")
+        if item and item.get("id"):
+            emails.add(str(item["id"]).lower())
+        for value in ((err.get("context") or {}).get("ids") or []):
+            emails.add(str(value).lower())
+    return emails
+
+
+async def apply_rollups(rollups: dict[str, EmailRollup], absolute: bool = False) -> set[str]:
+    """Write folded rollups with one batch read + one batch upsert per 100 contacts.
+
+    Returns the emails that could not be written (the caller keeps them for a retry).
+    With absolute=True counters replace HubSpot's values instead of adding to them.
+    """
+    hs = get_hubspot_client()
+    read = await hs.batch_read_contacts(list(rollups), properties=EMAIL_PROP_KEYS)
+    # a failed read chunk means we don't know the current counters: retry those later
+    failed = _error_emails([e for e in read["errors"] if e.get("input")])
+    existing = {((r.get("properties") or {}).get("email") or "").strip().lower(): r for r in read["results"]}
+
+    items: list[tuple[str, dict]] = []
+    for email, rollup in rollups.items():
+        if email in failed:
+            continue
+        contact = existing.get(email)
+        current = (contact or {}).get("properties") or {}
+        base = {k: v for k, v in current.items() if k not in {p for p, _ in _EVENT_PROPS.values()}} if absolute else current
+        updates = rollup.to_updates(base)
+        changed = diff_properties(current, updates) if contact else updates
+        write_stats.record(len(updates), len(changed))
+        if changed:
+            items.append((email, changed))
+
+    if items:
+        upserted = await hs.batch_upsert_contacts(items)
+        failed |= _error_emails(upserted["errors"])
+    return failed
+
+
+_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_checkpoints (
+    worker TEXT PRIMARY KEY,
+    pending_since_ms INTEGER NOT NULL,
+    heartbeat_ms INTEGER NOT NULL
+);
+"""
+
+RECOVERY_LEASE_MS = 600_000  # a recovering worker that dies leaves the stale row to be claimed again
+
+
+class RollupAggregator:
+    """Write-behind buffer for tracking rollups.
+
+    Events are merged per contact in memory and flushed every EMAIL_ROLLUP_FLUSH_INTERVAL_S
+    (or once EMAIL_ROLLUP_MAX_PENDING contacts are waiting) as one read + one write per
+    contact. Each worker checkpoints the ingest time of its oldest unflushed event. Every
+    EMAIL_ROLLUP_RECOVER_INTERVAL_S, checkpoints whose heartbeat went stale are leased to one
+    live worker, which re-folds that worker's unflushed events from the event log and writes
+    them.
+
+    Delivery is at-least-once: a worker that dies after a flush reached HubSpot but before its
+    checkpoint moved past it has that flush re-added on recovery, so counters can overcount.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, EmailRollup] = {}
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._conn = None
+        self.worker = worker_id()
+        self._last_recovery = 0.0
+        self._held: dict[int, int] = {}  # ingest ms -> events logged but not yet added (tracking queue)
+        self.events = 0
+        self.flushes = 0
+        self.recovered = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    def add(self, email: str, event, event_ms: int, ingested_ms: int) -> None:
+        self._pending.setdefault(email, EmailRollup()).add_event(event, event_ms, ingested_ms)
+        self.events += 1
+        if len(self._pending) >= settings.EMAIL_ROLLUP_MAX_PENDING:
+            self._wake.set()
+
+    def hold(self, ingested_ms: int) -> None:
+        """Keep the checkpoint at or before an event that is logged but still queued for add()."""
+        self._held[ingested_ms] = self._held.get(ingested_ms, 0) + 1
+
+    def release(self, ingested_ms: int) -> None:
+        n = self._held.get(ingested_ms, 0) - 1
+        if n > 0:
+            self._held[ingested_ms] = n
+        else:
+            self._held.pop(ingested_ms, None)
+
+    def _checkpoint(self) -> None:
+        if self._conn is None:
+            return
+        oldest = [r.oldest_ingest_ms for r in self._pending.values() if r.oldest_ingest_ms is not None] + list(self._held)
+        now = _now_ms()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO rollup_checkpoints (worker, pending_since_ms, heartbeat_ms) VALUES (?, ?, ?)",
+            (self.worker, min(oldest) if oldest else now, now),
+        )
+
+    async def flush(self) -> None:
+        async with self._lock:
+            batch, self._pending = self._pending, {}
+            if batch:
+                try:
+                    failed = await apply_rollups(batch)
+                except Exception as exc:
+                    logger.warning("email rollup flush failed (%d contacts): %s", len(batch), exc)
+                    failed = set(batch)
+                for email in failed:
+                    if email in batch:
+                        self._pending.setdefault(email, EmailRollup()).merge(batch[email])
+                self.flushes += 1
+            self._checkpoint()
+
+    def _fold(self, since: dict[str, tuple[int, int]]) -> dict[str, EmailRollup]:
+        """Re-fold logged events of the given workers ingested in [from_ms, until_ms).
+
+        Only the segments those workers' processes opened from `from_ms` on are read, so recovery costs
+        what the dead worker left unflushed rather than the whole log history.
+        """
+        segments = []
+        for worker, (from_ms, _) in since.items():
+            host, pid, _ = (worker.rsplit(":", 2) + ["", ""])[:3]
+            if pid.isdigit():
+                segments += writer_segments(settings.EMAIL_EVENT_LOG_PATH, host, int(pid), from_ms)
+        rollups: dict[str, EmailRollup] = {}
+        for payload in iter_log_records(settings.EMAIL_EVENT_LOG_PATH, segments):
+            window = since.get(payload.get("worker"))
+            ingested = payload.get("ingested_at_ms") or 0
+            if window is None or not window[0] <= ingested < window[1] or payload.get("skip_rollup"):
+                continue
+            for email in payload.get("contact_emails") or []:
+                rollups.setdefault(email, EmailRollup()).add_payload(payload)
+                self.recovered += 1
+        return rollups
+
+    async def _recover(self) -> None:
+        now = _now_ms()
+        staleness_ms = int(settings.EMAIL_ROLLUP_FLUSH_INTERVAL_S * 3000) + 60_000
+        with transaction(self._conn):
+            rows = self._conn.execute(
+                "SELECT worker, pending_since_ms FROM rollup_checkpoints WHERE worker != ? AND heartbeat_ms < ?",
+                (self.worker, now - staleness_ms),
+            ).fetchall()
+            # the lease: move the heartbeat so the row only looks stale again RECOVERY_LEASE_MS from now
+            self._conn.executemany(
+                "UPDATE rollup_checkpoints SET heartbeat_ms = ? WHERE worker = ?",
+                [(now + RECOVERY_LEASE_MS - staleness_ms, r["worker"]) for r in rows],
+            )
+        if not rows:
+            return
+        since = {r["worker"]: (r["pending_since_ms"], now) for r in rows}
+        before = self.recovered
+        rollups = await asyncio.to_thread(self._fold, since)
+        failed = await apply_rollups(rollups) if rollups else set()
+        for email in failed:
+            self._pending.setdefault(email, EmailRollup()).merge(rollups[email])
+        self._conn.executemany("DELETE FROM rollup_checkpoints WHERE worker = ?", [(w,) for w in since])
+        logger.info("recovered %d unflushed rollup events from %d stale workers", self.recovered - before, len(rows))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.EMAIL_ROLLUP_FLUSH_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if time.monotonic() - self._last_recovery >= settings.EMAIL_ROLLUP_RECOVER_INTERVAL_S:
+                self._last_recovery = time.monotonic()
+                try:
+                    await self._recover()
+                except Exception as exc:
+                    logger.warning("email rollup recovery failed: %s", exc)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._conn = connect(settings.EMAIL_ROLLUP_STATE_PATH)
+        self._conn.executescript(_CHECKPOINT_SCHEMA)
+        self._checkpoint()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+        if not self._pending and not self._held:
+            self._conn.execute("DELETE FROM rollup_checkpoints WHERE worker = ?", (self.worker,))
+        self._conn.close()
+        self._conn = None
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending_contacts": len(self._pending),
+            "events": self.events,
+            "flushes": self.flushes,
+            "recovered": self.recovered,
+        }
+
+
+aggregator = RollupAggregator()
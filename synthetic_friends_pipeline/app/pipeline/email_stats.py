@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Iterable
+
+from app.config.settings import settings
+from app.utils.event_log import iter_log_records
+from app.utils.log import get_logger
+from app.utils.sqlite import connect, transaction
+
+logger = get_logger("sf-email-stats")
+
+HOUR_S = 3600
+BUCKETS = {"hour": HOUR_S, "day": 86400}
+
+# one row per (tid, contact, hour, event type); per-contact/thread/tid queries hit their own index
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hourly (
+    tid TEXT NOT NULL,
+    email TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (tid, email, hour, event_type)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hourly_by_email ON hourly (email, hour);
+CREATE INDEX IF NOT EXISTS hourly_by_thread ON hourly (thread_id, hour);
+CREATE TABLE IF NOT EXISTS url_clicks (
+    email TEXT NOT NULL,
+    url TEXT NOT NULL,
+    tid TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (email, url, tid, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS url_clicks_by_tid ON url_clicks (tid, hour);
+"""
+
+_SCOPES = {"contact": "email", "thread": "thread_id", "tid": "tid"}
+
+
+def _rows(payload: dict) -> tuple[Counter, Counter]:
+    event_type = payload.get("event_type")
+    tid = payload.get("tid") or ""
+    thread_id = payload.get("thread_id") or payload.get("gmail_thread_id") or ""
+    hour = (payload.get("received_at_ms") or int(time.time() * 1000)) // 1000 // HOUR_S * HOUR_S
+    url = (payload.get("metadata") or {}).get("url") if event_type == "click" else None
+    hourly: Counter = Counter()
+    clicks: Counter = Counter()
+    # recipient-less pixels still count towards their tid/thread
+    for email in payload.get("contact_emails") or [""]:
+        hourly[(tid, email, hour, event_type, thread_id)] += 1
+        if url:
+            clicks[(email, str(url), tid, hour)] += 1
+    return hourly, clicks
+
+
+class EmailStatsStore:
+    """Hourly open/click/sent/received rollups per contact, thread and tid, kept beside the event log.
+
+    `submit` only buffers: a background thread folds whatever has queued up into one transaction
+    on its own connection, so tracking requests never wait on a SQLite write lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        self._cond = threading.Condition()
+        self._buffer: list[dict] = []
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stopping = False
+        self._writing = False
+        self.events = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def record_many(self, payloads: Iterable[dict], conn=None) -> int:
+        """Synchronous write, for the background thread and offline rebuilds."""
+        conn = conn or self.conn
+        hourly: Counter = Counter()
+        clicks: Counter = Counter()
+        n = 0
+        for payload in payloads:
+            if payload.get("skip_rollup") == "duplicate" or not payload.get("event_type"):
+                continue
+            h, c = _rows(payload)
+            hourly.update(h)
+            clicks.update(c)
+            n += 1
+        if not n:
+            return 0
+        with transaction(conn):
+            conn.executemany(
+                "INSERT INTO hourly (tid, email, hour, event_type, thread_id, count) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (tid, email, hour, event_type) DO UPDATE SET count = count + excluded.count, "
+                "thread_id = CASE WHEN excluded.thread_id != '' THEN excluded.thread_id ELSE thread_id END",
+                [(*key, count) for key, count in hourly.items()],
+            )
+            conn.executemany(
+                "INSERT INTO url_clicks (email, url, tid, hour, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (email, url, tid, hour) DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in clicks.items()],
+            )
+        self.events += n
+        return n
+
+    def submit(self, payloads: list[dict]) -> None:
+        """Queue payloads for the background writer; drops (and counts) them past EVENT_LOG_MAX_BUFFER."""
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start_after_fork()
+            if len(self._buffer) + len(payloads) > settings.EVENT_LOG_MAX_BUFFER:
+                self.dropped += len(payloads)
+                return
+            self._buffer.extend(payloads)
+            self._cond.notify()
+
+    def record(self, payload: dict) -> None:
+        self.submit([payload])
+
+    def _start_after_fork(self) -> None:
+        self._pid = os.getpid()
+        self._buffer = []
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="email-stats-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        conn = connect(self.path)
+        linger = settings.EVENT_LOG_LINGER_MS / 1000
+        try:
+            while True:
+                with self._cond:
+                    while not self._buffer and not self._stopping:
+                        self._cond.wait()
+                    if not self._buffer:
+                        return
+                    stopping = self._stopping
+                if linger and not stopping:
+                    time.sleep(linger)  # let concurrent events join this transaction
+                with self._cond:
+                    batch, self._buffer = self._buffer, []
+                    self._writing = True
+                try:
+                    self.record_many(batch, conn)
+                except Exception as exc:
+                    self.errors += 1
+                    logger.warning("email stats update failed (%d events lost): %s", len(batch), exc)
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+        finally:
+            conn.close()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while (self._buffer or self._writing) and self._thread and self._thread.is_alive():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.notify_all()
+                self._cond.wait(timeout=remaining)
+
+    def close(self, timeout: float = 10.0) -> None:
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        self._pid = None
+
+    def rebuild(self, base_path: str, batch: int = 5000) -> int:
+        """Drop every rollup and refold them from the event log."""
+        with transaction(self.conn):
+            self.conn.execute("DELETE FROM hourly")
+            self.conn.execute("DELETE FROM url_clicks")
+        total = 0
+        pending: list[dict] = []
+        for payload in iter_log_records(base_path):
+            pending.append(payload)
+            if len(pending) >= batch:
+                total += self.record_many(pending)
+                pending = []
+        total += self.record_many(pending)
+        return total
+
+    def query(
+        self,
+        scope: str,
+        key: str,
+        since_ms: int | None = None,
+        until_ms: int | None = None,
+        bucket: str = "hour",
+    ) -> dict:
+        column = _SCOPES[scope]
+        if scope == "contact":
+            key = key.strip().lower()
+        width = BUCKETS.get(bucket, HOUR_S)
+        lo = (since_ms or 0) // 1000 // HOUR_S * HOUR_S
+        hi = until_ms // 1000 if until_ms is not None else 2**62
+        rows = self.conn.execute(
+            f"SELECT (hour / ?) * ? AS bucket, event_type, SUM(count) AS n FROM hourly "
+            f"WHERE {column} = ? AND hour >= ? AND hour < ? GROUP BY bucket, event_type ORDER BY bucket",
+            (width, width, key, lo, hi),
+        ).fetchall()
+        totals: Counter = Counter()
+        series: dict[int, dict] = {}
+        for row in rows:
+            totals[row["event_type"]] += row["n"]
+            series.setdefault(row["bucket"], {})[row["event_type"]] = row["n"]
+        return {
+            scope: key,
+            "totals": dict(totals),
+            "series": [{"start": _iso(start), **counts} for start, counts in series.items()],
+        }
+
+    def top_urls(
+        self,
+        email: str | None = None,
+        tid: str | None = None,
+        since_ms: int | None = None,
+        until_ms: int | None = None,
+        limit: int = 10,
+    ) -> list[dict]:
+        column, key = ("email", email.strip().lower()) if email else ("tid", tid or "")
+        lo = (since_ms or 0) // 1000 // HOUR_S * HOUR_S
+        hi = until_ms // 1000 if until_ms is not None else 2**62
+        rows = self.conn.execute(
+            f"SELECT url, SUM(count) AS clicks FROM url_clicks WHERE {column} = ? AND hour >= ? AND hour < ? "
+            f"GROUP BY url ORDER BY clicks DESC LIMIT ?",
+            (key, lo, hi, limit),
+        ).fetchall()
+        return [{"url": row["url"], "clicks": row["clicks"]} for row in rows]
+
+    def snapshot(self) -> dict:
+        return {"events": self.events, "errors": self.errors, "dropped": self.dropped, "buffered": len(self._buffer)}
+
+
+def _iso(epoch_s: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch_s))
+
+
+_store: EmailStatsStore | None = None
+
+
+def get_stats_store() -> EmailStatsStore | None:
+    global _store
+    if _store is None and settings.EMAIL_STATS_PATH:
+        _store = EmailStatsStore(settings.EMAIL_STATS_PATH)
+    return _store
+
+
+def close_stats_store() -> None:
+    if _store is not None:
+        _store.close()
@@ -1,14 +1,18 @@
+import asyncio
 import datetime
-from pathlib import Path
-from typing import Any, Iterable
+from typing import Iterable
 
-import orjson
-
-from app.config.hubspot_properties import CONTACT_PROPS
 from app.config.settings import settings
-from app.hubspot.client import HubSpotClient
+from app.hubspot.client import get_hubspot_client
+from app.hubspot.diff import diff_properties, write_stats
+from app.hubspot.loader import contact_loader
 from app.models.schemas import EmailEvent
+from app.pipeline.dedup import dedup_index
+from app.pipeline.email_rollups import EMAIL_PROP_KEYS, EmailRollup, aggregator, apply_rollups
+from app.pipeline.email_stats import get_stats_store
+from app.utils.event_log import get_event_log
 from app.utils.log import get_logger
+from app.utils.runtime import worker_id
 
 logger = get_logger("sf-email-tracking")
 
@@ -17,30 +21,12 @@ PIXEL_GIF_BYTES = (
     b"\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
 )
 
-EMAIL_PROP_KEYS = [
-    CONTACT_PROPS["sf_email_first_tracked_at"],
-    CONTACT_PROPS["sf_email_last_activity_at"],
-    CONTACT_PROPS["sf_email_last_sent_at"],
-    CONTACT_PROPS["sf_email_last_received_at"],
-    CONTACT_PROPS["sf_email_last_opened_at"],
-    CONTACT_PROPS["sf_email_last_clicked_at"],
-    CONTACT_PROPS["sf_email_sent_count"],
-    CONTACT_PROPS["sf_email_received_count"],
-    CONTACT_PROPS["sf_email_open_count"],
-    CONTACT_PROPS["sf_email_click_count"],
-    CONTACT_PROPS["sf_email_last_subject"],
-    CONTACT_PROPS["sf_email_last_thread_id"],
-    CONTACT_PROPS["sf_email_last_message_id"],
-    CONTACT_PROPS["sf_email_last_event_type"],
-    CONTACT_PROPS["sf_email_last_direction"],
-]
-
 
 def _now_ms() -> int:
     return int(datetime.datetime.utcnow().timestamp() * 1000)
 
 
-def _parse_occurred_at(value: str | None) -> int:
+def parse_occurred_at(value: str | None) -> int:
     if not value:
         return _now_ms()
     try:
@@ -69,31 +55,23 @@ def _dedupe(items: Iterable[str]) -> list[str]:
     return out
 
 
-def _parse_int(value: Any) -> int:
-    try:
-        return int(float(value))
-    except Exception:
-        return 0
-
-
-def _event_log_path() -> Path | None:
+def _append_event_log(payload: dict) -> bool:
+    """False if the event could not be buffered for the log (full buffer, serialization error)."""
     path = (settings.EMAIL_EVENT_LOG_PATH or "").strip()
     if not path:
-        return None
-    return Path(path)
-
-
-def _append_event_log(payload: dict) -> None:
-    path = _event_log_path()
-    if not path:
-        return
+        return True
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("ab") as handle:
-            handle.write(orjson.dumps(payload))
-            handle.write(b"\n")
+        get_event_log(path).append(payload)
     except Exception as exc:
         logger.warning("email tracking log write failed: %s", exc)
+        return False
+    return True
+
+
+def _record_stats(payload: dict) -> None:
+    store = get_stats_store()
+    if store is not None:
+        store.record(payload)
 
 
 def _resolve_contact_emails(event: EmailEvent) -> list[str]:
@@ -114,48 +92,10 @@ def _resolve_contact_emails(event: EmailEvent) -> list[str]:
 
 
 def _build_updates(current: dict, event: EmailEvent, event_ms: int) -> dict:
-    updates: dict[str, Any] = {
-        CONTACT_PROPS["sf_email_last_activity_at"]: event_ms,
-        CONTACT_PROPS["sf_email_last_event_type"]: event.event_type,
-    }
-    if event.direction:
-        updates[CONTACT_PROPS["sf_email_last_direction"]] = event.direction
-
-    if not current.get(CONTACT_PROPS["sf_email_first_tracked_at"]):
-        updates[CONTACT_PROPS["sf_email_first_tracked_at"]] = event_ms
-
-    if event.subject:
-        updates[CONTACT_PROPS["sf_email_last_subject"]] = event.subject[:255]
-    if event.thread_id:
-        updates[CONTACT_PROPS["sf_email_last_thread_id"]] = event.thread_id
-    if event.message_id:
-        updates[CONTACT_PROPS["sf_email_last_message_id"]] = event.message_id
-
-    if event.event_type == "sent":
-        updates[CONTACT_PROPS["sf_email_last_sent_at"]] = event_ms
-        updates[CONTACT_PROPS["sf_email_sent_count"]] = _parse_int(
-            current.get(CONTACT_PROPS["sf_email_sent_count"])
-        ) + 1
-    elif event.event_type == "received":
-        updates[CONTACT_PROPS["sf_email_last_received_at"]] = event_ms
-        updates[CONTACT_PROPS["sf_email_received_count"]] = _parse_int(
-            current.get(CONTACT_PROPS["sf_email_received_count"])
-        ) + 1
-    elif event.event_type == "open":
-        updates[CONTACT_PROPS["sf_email_last_opened_at"]] = event_ms
-        updates[CONTACT_PROPS["sf_email_open_count"]] = _parse_int(
-            current.get(CONTACT_PROPS["sf_email_open_count"])
-        ) + 1
-    elif event.event_type == "click":
-        updates[CONTACT_PROPS["sf_email_last_clicked_at"]] = event_ms
-        updates[CONTACT_PROPS["sf_email_click_count"]] = _parse_int(
-            current.get(CONTACT_PROPS["sf_email_click_count"])
-        ) + 1
-
-    return updates
-
-
-def _event_payload(event: EmailEvent, request_meta: dict | None, event_ms: int) -> dict:
+    return EmailRollup().add_event(event, event_ms).to_updates(current)
+
+
+def _event_payload(event: EmailEvent, request_meta: dict | None, event_ms: int, contact_emails: list[str]) -> dict:
     if hasattr(event, "model_dump"):
         base = event.model_dump()
     else:
@@ -165,37 +105,170 @@ def _event_payload(event: EmailEvent, request_meta: dict | None, event_ms: int)
         **base,
         "received_at": received_at,
         "received_at_ms": event_ms,
+        "ingested_at_ms": _now_ms(),
+        "worker": worker_id(),
+        "contact_emails": contact_emails,
     }
     if request_meta:
         payload["request_meta"] = request_meta
     return payload
 
 
+def log_email_event(event: EmailEvent, request_meta: dict | None = None, skip_rollup: str | None = None) -> dict:
+    """Append the event to the log only; `skip_rollup` marks it so replay/recovery leave HubSpot alone."""
+    event_ms = parse_occurred_at(event.occurred_at)
+    payload = _event_payload(event, request_meta, event_ms, _resolve_contact_emails(event))
+    if skip_rollup:
+        payload["skip_rollup"] = skip_rollup
+    logged = _append_event_log(payload)
+    _record_stats(payload)
+    return {"ok": logged, "logged": logged, "hubspot": False}
+
+
+def _split_duplicates(event: EmailEvent, contact_emails: list[str]) -> tuple[list[str], list[str]]:
+    """(fresh, duplicate) recipients for opens/clicks already seen inside the dedup window."""
+    if event.event_type not in {"open", "click"} or not dedup_index.enabled:
+        return contact_emails, []
+    url = str((event.metadata or {}).get("url") or "")
+    fresh, duplicate = [], []
+    # recipient-less pixels still dedupe on the tid itself
+    for email in contact_emails or [""]:
+        (duplicate if dedup_index.check(event.tid or "", event.event_type, email, url) else fresh).append(email)
+    return fresh, duplicate
+
+
+def _prepare(event: EmailEvent, request_meta: dict | None) -> tuple[dict, list[str], bool]:
+    """(log payload, contacts to roll up, whether the whole event is a suppressed duplicate)."""
+    event_ms = parse_occurred_at(event.occurred_at)
+    fresh, duplicates = _split_duplicates(event, _resolve_contact_emails(event))
+    contact_emails = [email for email in fresh if email]
+    payload = _event_payload(event, request_meta, event_ms, contact_emails)
+    duplicate = bool(duplicates) and not fresh
+    if duplicates:
+        payload["duplicate_emails"] = [email for email in duplicates if email]
+    if duplicate:
+        payload["skip_rollup"] = "duplicate"
+    return payload, contact_emails, duplicate
+
+
+def accept_email_event(event: EmailEvent, request_meta: dict | None = None) -> tuple[dict, list[str], bool, bool]:
+    """Dedup the event and append it to the durable log.
+
+    Returns what apply_email_event needs, plus whether the log write was accepted.
+    """
+    payload, contact_emails, duplicate = _prepare(event, request_meta)
+    return payload, contact_emails, duplicate, _append_event_log(payload)
+
+
 async def handle_email_event(event: EmailEvent, request_meta: dict | None = None) -> dict:
-    event_ms = _parse_occurred_at(event.occurred_at)
-    payload = _event_payload(event, request_meta, event_ms)
-    _append_event_log(payload)
+    payload, contact_emails, duplicate, logged = accept_email_event(event, request_meta)
+    result = await apply_email_event(event, payload, contact_emails, duplicate)
+    if not logged:
+        # rolled up, but absent from the log: replay and recovery will not see it
+        result["logged"] = False
+    return result
+
+
+async def apply_email_event(event: EmailEvent, payload: dict, contact_emails: list[str], duplicate: bool) -> dict:
+    """Stats and HubSpot rollups for an event that accept_email_event already logged."""
+    event_ms = payload["received_at_ms"]
+    if duplicate:
+        return {"ok": True, "logged": True, "hubspot": False, "duplicate": True}
+    _record_stats(payload)
 
     try:
-        hs = HubSpotClient()
+        hs = get_hubspot_client()
     except Exception as exc:
         logger.warning("email tracking HubSpot client unavailable: %s", exc)
         return {"ok": True, "logged": True, "hubspot": False}
 
-    contact_emails = _resolve_contact_emails(event)
     if not contact_emails:
         return {"ok": True, "logged": True, "hubspot": False}
 
-    for email in contact_emails:
+    if aggregator.enabled:
+        for email in contact_emails:
+            aggregator.add(email, event, event_ms, payload["ingested_at_ms"])
+        return {"ok": True, "logged": True, "hubspot": True, "deferred": True}
+
+    lookups = await asyncio.gather(
+        *(contact_loader.load(email, EMAIL_PROP_KEYS) for email in contact_emails),
+        return_exceptions=True,
+    )
+    for email, contact in zip(contact_emails, lookups):
         try:
-            contact = await hs.search_contact_by_email(email, properties=EMAIL_PROP_KEYS)
+            if isinstance(contact, Exception):
+                raise contact
             if contact:
-                updates = _build_updates(contact.get("properties", {}), event, event_ms)
-                await hs.update_contact(contact["id"], updates)
+                current = contact.get("properties", {})
+                updates = _build_updates(current, event, event_ms)
+                changed = diff_properties(current, updates)
+                write_stats.record(len(updates), len(changed))
+                if changed:
+                    await hs.update_contact(contact["id"], changed)
             else:
                 updates = _build_updates({}, event, event_ms)
+                write_stats.record(len(updates), len(updates))
                 await hs.create_contact({"email": email, **updates})
         except Exception as exc:
             logger.warning("email tracking HubSpot update failed (%s): %s", email, exc)
 
     return {"ok": True, "logged": True, "hubspot": True}
+
+
+async def handle_email_events(events: list[EmailEvent], request_meta: dict | None = None) -> list[dict]:
+    """Batch form of handle_email_event: one log write, one stats submit and grouped HubSpot rollups.
+
+    Returns one status per event, in order.
+    """
+    prepared = [_prepare(event, request_meta) for event in events]
+    payloads = [payload for payload, _, _ in prepared]
+    results = [
+        {"ok": True, "logged": True, "hubspot": False, **({"duplicate": True} if duplicate else {})}
+        for _, _, duplicate in prepared
+    ]
+
+    path = (settings.EMAIL_EVENT_LOG_PATH or "").strip()
+    if path and payloads:
+        try:
+            get_event_log(path).append_many(payloads)
+        except Exception as exc:
+            logger.warning("email tracking log write failed (%d events): %s", len(payloads), exc)
+            return [{"ok": False, "logged": False, "error": "event log write failed"} for _ in events]
+    store = get_stats_store()
+    if store is not None:
+        store.submit(payloads)
+
+    todo = [i for i, (_, emails, duplicate) in enumerate(prepared) if emails and not duplicate]
+    if not todo:
+        return results
+    try:
+        get_hubspot_client()
+    except Exception as exc:
+        logger.warning("email tracking HubSpot client unavailable: %s", exc)
+        return results
+
+    if aggregator.enabled:
+        for i in todo:
+            payload, emails, _ = prepared[i]
+            for email in emails:
+                aggregator.add(email, events[i], payload["received_at_ms"], payload["ingested_at_ms"])
+            results[i].update(hubspot=True, deferred=True)
+        return results
+
+    rollups: dict[str, EmailRollup] = {}
+    for i in todo:
+        payload, emails, _ = prepared[i]
+        for email in emails:
+            rollups.setdefault(email, EmailRollup()).add_event(events[i], payload["received_at_ms"])
+    try:
+        failed = await apply_rollups(rollups)
+    except Exception as exc:
+        logger.warning("email tracking batch HubSpot update failed (%d contacts): %s", len(rollups), exc)
+        failed = set(rollups)
+    for i in todo:
+        missed = sorted(set(prepared[i][1]) & failed)
+        if missed:
+            results[i].update(ok=False, error="hubspot update failed", failed_emails=missed)
+        else:
+            results[i]["hubspot"] = True
+    return results
@@ -0,0 +1,103 @@
+import time
+from typing import List
+
+import orjson
+
+from app.config.settings import settings
+from app.models.schemas import CompanyInput, ContactCandidate
+from app.utils.log import get_logger
+from app.utils.sqlite import connect
+
+logger = get_logger("sf-enrich-cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS provider_results (
+    provider TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    contacts TEXT NOT NULL,
+    fetched_at_ms INTEGER NOT NULL,
+    PRIMARY KEY (provider, domain, fingerprint)
+);
+"""
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def normalize_domain(domain: str | None) -> str:
+    d = (domain or "").strip().lower()
+    for prefix in ("https://", "http://"):
+        if d.startswith(prefix):
+            d = d[len(prefix):]
+    d = d.split("/", 1)[0]
+    return d[4:] if d.startswith("www.") else d
+
+
+class EnrichmentCache:
+    """Raw enricher output per (provider, domain, query fingerprint), served fresh or stale-while-revalidate."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def key_for(self, provider, company: CompanyInput) -> tuple[str, str, str] | None:
+        domain = normalize_domain(company.domain)
+        if not domain:
+            return None
+        return provider.name, domain, provider.query_fingerprint(company)
+
+    def get(self, key: tuple[str, str, str]) -> tuple[str, List[ContactCandidate]] | None:
+        row = self.conn.execute(
+            "SELECT contacts, fetched_at_ms FROM provider_results WHERE provider = ? AND domain = ? AND fingerprint = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        contacts = [ContactCandidate(**c) for c in orjson.loads(row["contacts"])]
+        ttl = settings.ENRICH_CACHE_TTL_S if contacts else settings.ENRICH_CACHE_EMPTY_TTL_S
+        age_s = (_now_ms() - row["fetched_at_ms"]) / 1000
+        if age_s < ttl:
+            self.hits += 1
+            return FRESH, contacts
+        if age_s < ttl + settings.ENRICH_CACHE_STALE_S:
+            self.stale_hits += 1
+            return STALE, contacts
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple[str, str, str], contacts: List[ContactCandidate]) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO provider_results (provider, domain, fingerprint, contacts, fetched_at_ms) VALUES (?, ?, ?, ?, ?)",
+            (*key, orjson.dumps([c.model_dump() for c in contacts]), _now_ms()),
+        )
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": self.conn.execute("SELECT COUNT(*) FROM provider_results").fetchone()[0],
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / total, 4) if total else 0.0,
+            "refreshes": self.refreshes,
+        }
+
+
+_cache: EnrichmentCache | None = None
+
+
+def get_enrichment_cache() -> EnrichmentCache | None:
+    global _cache
+    if _cache is None and settings.ENRICH_CACHE_PATH:
+        _cache = EnrichmentCache(settings.ENRICH_CACHE_PATH)
+    return _cache
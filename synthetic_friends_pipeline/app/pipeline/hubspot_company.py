@@ -0,0 +1,96 @@
+from app.config.hubspot_properties import COMPANY_PROPS
+from app.hubspot.client import get_hubspot_client
+from app.models.schemas import CompanyInput, EnrichmentResult
+from app.pipeline.hubspot_writer import write_result_to_hubspot
+from app.pipeline.orchestrator import enrich_company
+from app.utils.singleflight import SingleFlight
+
+COMPANY_READ_PROPS = ["name", "domain", "city", "state"] + list(COMPANY_PROPS.values())
+
+
+async def load_hubspot_company(company_id: str, force_refresh: bool = False) -> CompanyInput | None:
+    return (await _load(company_id, force_refresh))[0]
+
+
+async def _load(company_id: str, force_refresh: bool) -> tuple[CompanyInput | None, dict]:
+    """The company as pipeline input plus its current HubSpot properties (to diff the write-back against)."""
+    hs = get_hubspot_client()
+    company_obj = await hs.get_company(company_id, properties=COMPANY_READ_PROPS)
+    if not company_obj:
+        return None, {}
+    p = (company_obj.get("properties") or {})
+    return CompanyInput(
+        company_name=p.get("name") or f"Company {company_id}",
+        domain=p.get("domain") or None,
+        hq_city=p.get("city") or None,
+        hq_state=p.get("state") or None,
+        notes=f"HubSpot companyId={company_id}",
+        force_refresh=force_refresh,
+    ), p
+
+
+hubspot_flights = SingleFlight()
+
+
+async def enrich_hubspot_company_by_id(
+    company_id: str,
+    force_refresh: bool = False,
+    write_back: bool = True,
+    mark_error: bool = True,
+) -> EnrichmentResult | None:
+    """Load the company from HubSpot, enrich it and (optionally) write the result back. None if it doesn't exist.
+
+    Concurrent calls for the same company share one run whatever their options, so it is loaded, enriched
+    and written back once; a caller that wants the write-back but joined a run started without it writes
+    the result itself. With mark_error=False a failure is left for the caller (the job queue) to report.
+    """
+    try:
+        shared = await hubspot_flights.do(
+            f"{company_id}|{int(force_refresh)}",
+            lambda: _enrich_hubspot_company_by_id(company_id, force_refresh, write_back),
+        )
+        if shared is None:
+            return None
+        result, current, written = shared
+        if write_back and not written:
+            await write_result_to_hubspot(company_id, result, current)
+        return result
+    except Exception as e:
+        if write_back and mark_error:
+            try:
+                await get_hubspot_client().update_company(company_id, {
+                    COMPANY_PROPS["sf_enrichment_status"]: "error",
+                    COMPANY_PROPS["sf_enrichment_notes"]: f"Pipeline failed: {str(e)[:500]}",
+                })
+            except Exception:
+                pass
+        raise
+
+
+async def _enrich_hubspot_company_by_id(
+    company_id: str,
+    force_refresh: bool,
+    write_back: bool,
+) -> tuple[EnrichmentResult, dict, bool] | None:
+    """(result, the company's properties before the write-back, whether it was written back)."""
+    hs = get_hubspot_client()
+    company, current = await _load(company_id, force_refresh)
+    if company is None:
+        return None
+    if not write_back:
+        return await enrich_company(company), current, False
+
+    # mark running (best-effort)
+    running = {
+        COMPANY_PROPS["sf_enrichment_status"]: "running",
+        COMPANY_PROPS["sf_enrichment_notes"]: "Pipeline started",
+    }
+    try:
+        await hs.update_company(company_id, running)
+        current = {**current, **running}
+    except Exception:
+        pass
+
+    result = await enrich_company(company)
+    await write_result_to_hubspot(company_id, result, current)
+    return result, current, True
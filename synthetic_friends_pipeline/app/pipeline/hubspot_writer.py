@@ -1,13 +1,29 @@
 import datetime
-from app.hubspot.client import HubSpotClient
+from app.hubspot.client import get_hubspot_client
+from app.hubspot.diff import diff_properties, write_stats
 from app.config.hubspot_properties import COMPANY_PROPS, CONTACT_PROPS
-from app.models.schemas import EnrichmentResult
+from app.models.schemas import ContactCandidate, EnrichmentResult
+from app.utils.log import get_logger
+
+logger = get_logger("sf-hubspot-writer")
 
 def _iso_now():
     return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
-async def write_result_to_hubspot(company_id: str, result: EnrichmentResult):
-    hs = HubSpotClient()
+def _contact_props(c: ContactCandidate) -> dict:
+    return {
+        "firstname": (c.first_name or (c.full_name.split(" ")[0] if c.full_name else ""))[:50],
+        "lastname": (c.last_name or (" ".join(c.full_name.split(" ")[1:]) if c.full_name and len(c.full_name.split(" ")) > 1 else ""))[:50],
+        "jobtitle": (c.title or "")[:255],
+        CONTACT_PROPS["sf_role_fit_score"]: str(c.role_fit_score),
+        CONTACT_PROPS["sf_email_verification"]: c.email_verification,
+        CONTACT_PROPS["sf_confidence"]: str(c.confidence),
+        CONTACT_PROPS["sf_source"]: c.source,
+    }
+
+async def write_result_to_hubspot(company_id: str, result: EnrichmentResult, current: dict | None = None) -> dict:
+    """Write the result back, sending only what differs from `current` (the company's properties as last read)."""
+    hs = get_hubspot_client()
 
     best = result.best_contact
     company_props = {
@@ -22,21 +38,64 @@ async def write_result_to_hubspot(company_id: str, result: EnrichmentResult):
             COMPANY_PROPS["sf_best_contact_role"]: best.title or "",
             COMPANY_PROPS["sf_best_contact_score"]: str(best.confidence),
         })
+    if current is not None:
+        # sf_last_enriched_at always goes out: it records that this run happened even if nothing changed
+        proposed = len(company_props)
+        stamp = COMPANY_PROPS["sf_last_enriched_at"]
+        company_props = {stamp: company_props[stamp], **diff_properties(current, company_props)}
+        write_stats.record(proposed, len(company_props))
     await hs.update_company(company_id, company_props)
 
+    # one read + one upsert + one association call per 100 contacts, independent of contact count
+    items: dict[str, dict] = {}
     for c in result.contacts:
-        if not c.email:
-            continue
-        contact_props = {
-            "firstname": (c.first_name or (c.full_name.split(" ")[0] if c.full_name else ""))[:50],
-            "lastname": (c.last_name or (" ".join(c.full_name.split(" ")[1:]) if c.full_name and len(c.full_name.split(" ")) > 1 else ""))[:50],
-            "jobtitle": (c.title or "")[:255],
-            CONTACT_PROPS["sf_role_fit_score"]: str(c.role_fit_score),
-            CONTACT_PROPS["sf_email_verification"]: c.email_verification,
-            CONTACT_PROPS["sf_confidence"]: str(c.confidence),
-            CONTACT_PROPS["sf_source"]: c.source,
-        }
-        obj = await hs.create_or_update_contact_by_email(c.email, contact_props)
-        contact_id = (obj or {}).get("id")
-        if contact_id:
-            await hs.associate_contact_to_company(contact_id, company_id)
+        if c.email:
+            items[c.email.strip().lower()] = _contact_props(c)
+    if not items:
+        return {"contacts_written": 0, "contacts_unchanged": 0, "fields_sent": 0, "fields_skipped": 0, "errors": []}
+
+    prop_keys = sorted({k for props in items.values() for k in props})
+    read = await hs.batch_read_contacts(list(items), properties=prop_keys)
+    existing = {((r.get("properties") or {}).get("email") or "").strip().lower(): r for r in read["results"]}
+
+    changed: list[tuple[str, dict]] = []
+    unchanged_ids: list[str] = []
+    fields_sent = fields_skipped = 0
+    for email, props in items.items():
+        contact = existing.get(email)
+        delta = diff_properties((contact or {}).get("properties"), props)
+        write_stats.record(len(props), len(delta))
+        fields_sent += len(delta)
+        fields_skipped += len(props) - len(delta)
+        if contact and not delta:
+            unchanged_ids.append(contact["id"])
+        else:
+            changed.append((email, delta or props))
+
+    upserted = await hs.batch_upsert_contacts(changed) if changed else {"results": [], "errors": []}
+    contact_ids = unchanged_ids + [r["id"] for r in upserted["results"] if r.get("id")]
+    # contacts that existed before this run may already be linked; brand-new ones never are
+    linked: set[str] = set()
+    if existing:
+        try:
+            linked = await hs.list_company_contact_ids(company_id)
+        except Exception as exc:
+            logger.warning("could not list contacts of company %s; associating all: %s", company_id, exc)
+    to_link = [cid for cid in contact_ids if str(cid) not in linked]
+    associated = await hs.batch_associate_contacts_to_company(to_link, company_id) if to_link else {"errors": []}
+
+    errors = upserted["errors"] + associated["errors"]
+    for err in errors:
+        logger.warning("HubSpot contact write failed for company %s: %s", company_id, err.get("message"))
+    logger.info(
+        "HubSpot company %s: %d contacts written, %d unchanged, %d fields sent, %d skipped",
+        company_id, len(contact_ids) - len(unchanged_ids), len(unchanged_ids), fields_sent, fields_skipped,
+    )
+    return {
+        "contacts_written": len(contact_ids) - len(unchanged_ids),
+        "contacts_unchanged": len(unchanged_ids),
+        "fields_sent": fields_sent,
+        "fields_skipped": fields_skipped,
+        "associations_skipped": len(contact_ids) - len(to_link),
+        "errors": errors,
+    }
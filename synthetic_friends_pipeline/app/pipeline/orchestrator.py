@@ -1,5 +1,8 @@
+import asyncio
 import datetime
+from contextvars import ContextVar
 from typing import List, Optional
+from app.config.settings import settings
 from app.models.schemas import CompanyInput, ContactCandidate, EnrichmentResult
 from app.providers.apollo import ApolloProvider
 from app.providers.clearbit import ClearbitProvider
@@ -7,17 +10,292 @@ from app.providers.hunter_verify import HunterVerifyProvider
 from app.providers.zerobounce_verify import ZeroBounceProvider
 from app.providers.neverbounce_verify import NeverBounceProvider
 from app.pipeline.scoring import compute_role_fit, compute_overall_confidence
+from app.pipeline.enrichment_cache import STALE, get_enrichment_cache, normalize_domain
+from app.pipeline.verification_cache import DOMAIN_VERDICTS, domain_of, get_verification_cache
+from app.utils.breaker import CircuitOpenError, breaker_for
+from app.utils.log import get_logger
+from app.utils.singleflight import SingleFlight
+
+logger = get_logger("sf-orchestrator")
 
 ENRICHERS = [ApolloProvider(), ClearbitProvider()]
 VERIFIERS = [ZeroBounceProvider(), NeverBounceProvider(), HunterVerifyProvider()]
 
-async def enrich_company(company: CompanyInput) -> EnrichmentResult:
+# Register breakers up front so /health lists every provider before its first call.
+for _p in ENRICHERS + VERIFIERS:
+    breaker_for(_p.name)
+
+def _provider_timeout(name: str) -> float:
+    override = getattr(settings, f"{name.upper()}_TIMEOUT_S", None)
+    return override if override is not None else settings.ENRICHER_TIMEOUT_S
+
+async def _find_contacts(p, company: CompanyInput) -> List[ContactCandidate]:
+    # timeout inside the breaker so a hung vendor counts against it
+    return await asyncio.wait_for(p.find_contacts(company), timeout=_provider_timeout(p.name)) or []
+
+_refreshing: dict[tuple, asyncio.Task] = {}
+
+async def _refresh(p, company: CompanyInput, key: tuple) -> None:
+    try:
+        contacts = await breaker_for(p.name).call(_find_contacts, p, company)
+        get_enrichment_cache().put(key, contacts)
+        get_enrichment_cache().refreshes += 1
+    except Exception as exc:
+        logger.warning("background refresh of %s for %s failed: %s", p.name, key[1], exc)
+    finally:
+        _refreshing.pop(key, None)
+
+async def _cached_find_contacts(p, company: CompanyInput) -> List[ContactCandidate]:
+    cache = get_enrichment_cache()
+    key = cache.key_for(p, company) if cache else None
+    if key is None:
+        return await breaker_for(p.name).call(_find_contacts, p, company)
+    if not company.force_refresh:
+        cached = cache.get(key)
+        if cached:
+            state, contacts = cached
+            if state == STALE and key not in _refreshing:
+                _refreshing[key] = asyncio.create_task(_refresh(p, company, key))
+            return contacts
+    contacts = await breaker_for(p.name).call(_find_contacts, p, company)
+    cache.put(key, contacts)
+    return contacts
+
+async def _run_enrichers(company: CompanyInput) -> tuple[List[ContactCandidate], List[str]]:
+    """Fan out to every configured enricher; returns contacts in ENRICHERS order plus per-provider problems."""
+    # an unconfigured enricher's [] would otherwise be cached and outlive a key being added
+    tasks = {p.name: asyncio.create_task(_cached_find_contacts(p, company)) for p in ENRICHERS if p.configured}
+    done, pending = await asyncio.wait(tasks.values(), timeout=settings.ENRICHMENT_DEADLINE_S)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
     contacts: List[ContactCandidate] = []
-    for p in ENRICHERS:
+    problems: List[str] = []
+    for name, task in tasks.items():
+        if task in pending:
+            problems.append(f"{name} missed the {settings.ENRICHMENT_DEADLINE_S:g}s deadline")
+            continue
+        exc = task.exception()
+        if isinstance(exc, asyncio.TimeoutError):
+            problems.append(f"{name} timed out after {_provider_timeout(name):g}s")
+        elif isinstance(exc, CircuitOpenError):
+            problems.append(f"{name} skipped (circuit open)")
+        elif exc is not None:
+            problems.append(f"{name} failed ({type(exc).__name__})")
+        else:
+            contacts.extend(task.result())
+    return contacts, problems
+
+_verifier_slots: dict[str, asyncio.Semaphore] = {}
+
+def _verifier_limit(name: str) -> int:
+    return max(1, getattr(settings, f"{name.upper()}_VERIFY_CONCURRENCY", None) or settings.VERIFIER_CONCURRENCY)
+
+def _verifier_slot(name: str) -> asyncio.Semaphore:
+    slot = _verifier_slots.get(name)
+    if slot is None:
+        slot = asyncio.Semaphore(_verifier_limit(name))
+        _verifier_slots[name] = slot
+    return slot
+
+async def _verify_contact(c: ContactCandidate, gate: asyncio.Semaphore) -> None:
+    cache = get_verification_cache()
+    domain = domain_of(c.email)
+    known = cache.get_domain(domain) if cache else None
+    if known:
+        c.email_verification = DOMAIN_VERDICTS[known]
+        return
+    # waterfall per contact: first non-"unknown" verdict wins; unconfigured vendors are never asked
+    answered_by = None
+    async with gate:
+        for v in VERIFIERS:
+            if not v.configured:
+                continue
+            try:
+                async with _verifier_slot(v.name):
+                    res, domain_verdict = await breaker_for(v.name).call(v.verify_details, c.email)
+                answered_by = answered_by or v.name
+                if domain_verdict and cache:
+                    cache.put_domain(domain, domain_verdict, source=v.name)
+                if res != "unknown":
+                    c.email_verification = res
+                    answered_by = v.name
+                    break
+            except Exception:
+                continue
+    # only cache what a vendor actually said; errors and open circuits are retried next time
+    if cache and answered_by:
+        cache.put(c.email, c.email_verification, source=answered_by)
+
+def _group_by_domain(contacts: List[ContactCandidate]) -> List[List[ContactCandidate]]:
+    groups: dict[str, List[ContactCandidate]] = {}
+    for c in contacts:
+        if c.email:
+            groups.setdefault(domain_of(c.email), []).append(c)
+    return list(groups.values())
+
+async def _verify_domain(group: List[ContactCandidate], gate: asyncio.Semaphore) -> None:
+    # with the domain cache on, verify one address first so a catch-all answer covers the rest
+    if get_verification_cache() is None:
+        await asyncio.gather(*(_verify_contact(c, gate) for c in group))
+        return
+    await _verify_contact(group[0], gate)
+    await asyncio.gather(*(_verify_contact(c, gate) for c in group[1:]))
+
+async def _verify_bulk(contacts: List[ContactCandidate]) -> None:
+    """Same waterfall as _verify_contact, but each verifier gets every still-unknown address in one verify_many."""
+    cache = get_verification_cache()
+    pending: dict[str, List[ContactCandidate]] = {}
+    for c in contacts:
+        known = cache.get_domain(domain_of(c.email)) if cache else None
+        if known:
+            c.email_verification = DOMAIN_VERDICTS[known]
+        else:
+            pending.setdefault(c.email.strip().lower(), []).append(c)
+
+    answered_by: dict[str, str] = {}
+
+    async def drain(v) -> None:
+        async for email, res, domain_verdict in v.verify_many(list(pending), concurrency=_verifier_limit(v.name)):
+            key = (email or "").strip().lower()
+            if key not in pending:
+                continue
+            answered_by[key] = v.name
+            if domain_verdict and cache:
+                cache.put_domain(domain_of(key), domain_verdict, source=v.name)
+            if res != "unknown":
+                for c in pending.pop(key):
+                    c.email_verification = res
+
+    for v in VERIFIERS:
+        if not pending:
+            break
+        if not v.configured:
+            continue
+        try:
+            # a bulk job's duration says nothing about vendor health, so only the outcome counts
+            await breaker_for(v.name).call(drain, v, timed=False)
+        except CircuitOpenError:
+            continue
+        except Exception as exc:
+            logger.warning("bulk verification via %s failed (%d addresses left): %s", v.name, len(pending), exc)
+
+    if cache:
+        for c in contacts:
+            source = answered_by.get(c.email.strip().lower())
+            if source:
+                cache.put(c.email, c.email_verification, source=source)
+
+async def _verify_uncached(contacts: List[ContactCandidate]) -> None:
+    if len(contacts) >= settings.VERIFY_BATCH_THRESHOLD:
+        await _verify_bulk(contacts)
+        return
+    gate = asyncio.Semaphore(max(1, settings.VERIFY_CONCURRENCY))
+    await asyncio.gather(*(_verify_domain(group, gate) for group in _group_by_domain(contacts)))
+
+class VerifyBatch:
+    """Pools the unverified contacts of concurrent enrichments (e.g. the rows of one bulk request) so that
+    together they can reach VERIFY_BATCH_THRESHOLD and go to the vendors' bulk APIs.
+
+    A batch is sent once it holds VERIFY_BATCH_THRESHOLD addresses, once `max_waiters` enrichments are
+    all waiting on it, or VERIFY_BATCH_LINGER_S after its first address arrived; a smaller batch
+    falls back to the per-contact waterfall.
+    """
+
+    def __init__(self, max_waiters: int):
+        self.max_waiters = max(1, max_waiters)
+        self._contacts: List[ContactCandidate] = []
+        self._waiters: List[asyncio.Future] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def verify(self, contacts: List[ContactCandidate]) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._contacts.extend(contacts)
+        self._waiters.append(waiter)
+        if len(self._contacts) >= settings.VERIFY_BATCH_THRESHOLD or len(self._waiters) >= self.max_waiters:
+            self._send()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(settings.VERIFY_BATCH_LINGER_S, self._send)
+        await waiter
+
+    def _send(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        contacts, waiters = self._contacts, self._waiters
+        self._contacts, self._waiters = [], []
+        if waiters:
+            task = asyncio.create_task(self._run(contacts, waiters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, contacts: List[ContactCandidate], waiters: List[asyncio.Future]) -> None:
         try:
-            contacts.extend(await p.find_contacts(company) or [])
-        except Exception:
+            await _verify_uncached(contacts)
+        except asyncio.CancelledError:
+            for waiter in waiters:
+                waiter.cancel()
+            raise
+        except Exception as exc:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def aclose(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+_verify_batch: ContextVar[VerifyBatch | None] = ContextVar("sf_verify_batch", default=None)
+
+def set_verify_batch(batch: VerifyBatch | None) -> None:
+    """Route verify_contacts in the current task (and the tasks it starts) through `batch`."""
+    _verify_batch.set(batch)
+
+async def verify_contacts(contacts: List[ContactCandidate]) -> None:
+    """Set email_verification on every contact with an email, switching to bulk APIs for large sets."""
+    cache = get_verification_cache()
+    todo: List[ContactCandidate] = []
+    for c in contacts:
+        if not c.email:
             continue
+        cached = cache.get(c.email) if cache else None
+        if cached:
+            c.email_verification = cached
+        else:
+            todo.append(c)
+    if not todo:
+        return
+    batch = _verify_batch.get()
+    if batch is not None:
+        await batch.verify(todo)
+    else:
+        await _verify_uncached(todo)
+
+enrich_flights = SingleFlight()
+
+def _flight_key(company: CompanyInput) -> str:
+    target = normalize_domain(company.domain) or company.company_name.strip().lower()
+    return f"{target}|{int(company.force_refresh)}"
+
+async def enrich_company(company: CompanyInput) -> EnrichmentResult:
+    """Concurrent requests for the same domain (or, without one, the same name) share one enrichment run."""
+    result = await enrich_flights.do(_flight_key(company), lambda: _enrich_company(company))
+    if result.company is company:
+        return result
+    return result.model_copy(update={"company": company}, deep=True)
+
+async def _enrich_company(company: CompanyInput) -> EnrichmentResult:
+    contacts, problems = await _run_enrichers(company)
 
     seen = set()
     deduped: List[ContactCandidate] = []
@@ -31,17 +309,7 @@ async def enrich_company(company: CompanyInput) -> EnrichmentResult:
     for c in deduped:
         c.role_fit_score = compute_role_fit(c.title)
 
-    for c in deduped:
-        if not c.email:
-            continue
-        for v in VERIFIERS:
-            try:
-                res = await v.verify(c.email)
-                if res != "unknown":
-                    c.email_verification = res
-                    break
-            except Exception:
-                continue
+    await verify_contacts(deduped)
 
     for c in deduped:
         c.confidence = compute_overall_confidence(c)
@@ -51,4 +319,6 @@ async def enrich_company(company: CompanyInput) -> EnrichmentResult:
         best = sorted(deduped, key=lambda x: (x.confidence, x.role_fit_score), reverse=True)[0]
 
     notes = f"Enriched {len(deduped)} contacts at {datetime.datetime.utcnow().isoformat()}Z"
+    if problems:
+        notes += "; " + "; ".join(problems)
     return EnrichmentResult(company=company, contacts=deduped, best_contact=best, notes=notes)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from app.config.settings import settings
+from app.models.schemas import EmailEvent
+from app.pipeline.email_rollups import aggregator
+from app.pipeline.email_tracking import accept_email_event, apply_email_event
+from app.utils.log import get_logger
+
+logger = get_logger("sf-tracking-queue")
+
+
+class TrackingQueue:
+    """Bounded queue + asyncio worker pool so tracking endpoints answer before HubSpot does.
+
+    Accepted events are appended to the event log before they are queued, so a crash with events
+    still waiting loses only their rollups, which replay and rollup recovery rebuild from the log.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+        self.shed = 0
+        self.unlogged = 0
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def submit(self, event: EmailEvent, request_meta: dict | None = None) -> dict | None:
+        """Log and queue the event; returns its status, or None if the queue is full (shed)."""
+        # checked before logging: a shed event is logged by the caller (marked) or rejected outright
+        if self._queue.full():
+            self.shed += 1
+            return None
+        payload, contact_emails, duplicate, logged = accept_email_event(event, request_meta)
+        if not logged:
+            self.unlogged += 1
+        aggregator.hold(payload["ingested_at_ms"])
+        self._queue.put_nowait((event, payload, contact_emails, duplicate, time.monotonic()))
+        return {"ok": True, "queued": True, "logged": logged}
+
+    async def _work(self) -> None:
+        while True:
+            event, payload, contact_emails, duplicate, enqueued = await self._queue.get()
+            self.last_lag_s = time.monotonic() - enqueued
+            self.max_lag_s = max(self.max_lag_s, self.last_lag_s)
+            try:
+                await apply_email_event(event, payload, contact_emails, duplicate)
+                self.processed += 1
+            except Exception as exc:
+                self.failed += 1
+                logger.warning("queued email event failed (tid=%s): %s", event.tid, exc)
+            finally:
+                aggregator.release(payload["ingested_at_ms"])
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        if self.running or settings.TRACKING_QUEUE_WORKERS <= 0:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.TRACKING_QUEUE_MAXSIZE)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(settings.TRACKING_QUEUE_WORKERS)]
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.TRACKING_QUEUE_DRAIN_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logger.warning("tracking queue drain timed out with %d events left", self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": settings.TRACKING_QUEUE_MAXSIZE,
+            "workers": len(self._workers),
+            "processed": self.processed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "unlogged": self.unlogged,
+            "last_lag_s": round(self.last_lag_s, 4),
+            "max_lag_s": round(self.max_lag_s, 4),
+        }
+
+
+tracking_queue = TrackingQueue()
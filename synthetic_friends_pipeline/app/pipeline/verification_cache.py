@@ -0,0 +1,142 @@
+import time
+
+from app.config.settings import settings
+from app.utils.log import get_logger
+from app.utils.sqlite import connect
+
+logger = get_logger("sf-verify-cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verifications (
+    email TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT,
+    verified_at_ms INTEGER NOT NULL,
+    expires_at_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verifications_by_expiry ON verifications (expires_at_ms);
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    source TEXT,
+    seen_at_ms INTEGER NOT NULL,
+    expires_at_ms INTEGER NOT NULL
+);
+"""
+
+# what a known domain verdict means for any address on that domain
+DOMAIN_VERDICTS = {
+    "catch_all": "risky",
+    "disposable": "risky",
+    "invalid_domain": "undeliverable",
+}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _normalize(email: str | None) -> str:
+    return (email or "").strip().lower()
+
+
+def domain_of(email: str | None) -> str:
+    return _normalize(email).rpartition("@")[2]
+
+
+def ttl_for(status: str) -> float:
+    return {
+        "deliverable": settings.VERIFY_CACHE_TTL_DELIVERABLE_S,
+        "undeliverable": settings.VERIFY_CACHE_TTL_UNDELIVERABLE_S,
+        "risky": settings.VERIFY_CACHE_TTL_RISKY_S,
+    }.get(status, settings.VERIFY_CACHE_TTL_UNKNOWN_S)
+
+
+class VerificationCache:
+    """Verdicts of the VERIFIERS waterfall per normalized email, shared by every worker via SQLite."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.domain_hits = 0
+
+    def get(self, email: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT status FROM verifications WHERE email = ? AND expires_at_ms > ?", (_normalize(email), _now_ms())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row["status"]
+
+    def put(self, email: str, status: str, source: str | None = None) -> None:
+        ttl = ttl_for(status)
+        if ttl <= 0:
+            return
+        now = _now_ms()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO verifications (email, status, source, verified_at_ms, expires_at_ms) VALUES (?, ?, ?, ?, ?)",
+            (_normalize(email), status, source, now, now + int(ttl * 1000)),
+        )
+        self.writes += 1
+
+    def get_domain(self, domain: str) -> str | None:
+        """The cached catch-all/disposable/invalid verdict for a domain, if any."""
+        if settings.VERIFY_DOMAIN_CACHE_TTL_S <= 0:
+            return None
+        row = self.conn.execute(
+            "SELECT verdict FROM domains WHERE domain = ? AND expires_at_ms > ?", (_normalize(domain), _now_ms())
+        ).fetchone()
+        if row is None:
+            return None
+        self.domain_hits += 1
+        return row["verdict"]
+
+    def put_domain(self, domain: str, verdict: str, source: str | None = None) -> None:
+        if settings.VERIFY_DOMAIN_CACHE_TTL_S <= 0 or verdict not in DOMAIN_VERDICTS or not domain:
+            return
+        now = _now_ms()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO domains (domain, verdict, source, seen_at_ms, expires_at_ms) VALUES (?, ?, ?, ?, ?)",
+            (_normalize(domain), verdict, source, now, now + int(settings.VERIFY_DOMAIN_CACHE_TTL_S * 1000)),
+        )
+
+    def invalidate(self, email: str | None = None, domain: str | None = None) -> int:
+        """Drop one address, a domain (its verdict and every address on it), or (neither given) only expired rows."""
+        if email:
+            return self.conn.execute("DELETE FROM verifications WHERE email = ?", (_normalize(email),)).rowcount
+        if domain:
+            domain = _normalize(domain)
+            removed = self.conn.execute("DELETE FROM domains WHERE domain = ?", (domain,)).rowcount
+            return removed + self.conn.execute("DELETE FROM verifications WHERE email LIKE ?", ("%@" + domain,)).rowcount
+        now = _now_ms()
+        removed = self.conn.execute("DELETE FROM domains WHERE expires_at_ms <= ?", (now,)).rowcount
+        return removed + self.conn.execute("DELETE FROM verifications WHERE expires_at_ms <= ?", (now,)).rowcount
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        entries = self.conn.execute("SELECT COUNT(*) FROM verifications").fetchone()[0]
+        domains = self.conn.execute("SELECT verdict, COUNT(*) FROM domains GROUP BY verdict").fetchall()
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "writes": self.writes,
+            "domain_hits": self.domain_hits,
+            "domains": {row[0]: row[1] for row in domains},
+        }
+
+
+_cache: VerificationCache | None = None
+
+
+def get_verification_cache() -> VerificationCache | None:
+    global _cache
+    if _cache is None and settings.VERIFY_CACHE_PATH:
+        _cache = VerificationCache(settings.VERIFY_CACHE_PATH)
+    return _cache
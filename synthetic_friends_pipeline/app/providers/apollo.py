@@ -1,22 +1,21 @@
+import hashlib
 import orjson
 from typing import List
 from app.config.settings import settings
 from app.models.schemas import CompanyInput, ContactCandidate
 from app.providers.base import EnrichmentProvider
-from app.utils.http import make_client, retryable
+from app.utils.http import retryable, send
 
 class ApolloProvider(EnrichmentProvider):
     name = "apollo"
+    base_url = "https://api.apollo.io"
 
-    async def find_contacts(self, company: CompanyInput) -> List[ContactCandidate]:
-        if not settings.APOLLO_API_KEY:
-            return []
-        headers = {
-            "Content-Type": "application/json",
-            "Cache-Control": "no-cache",
-            "X-Api-Key": settings.APOLLO_API_KEY,
-        }
-        payload = {
+    @property
+    def configured(self) -> bool:
+        return bool(settings.APOLLO_API_KEY)
+
+    def _search_payload(self, company: CompanyInput) -> dict:
+        return {
             "q_organization_domains": company.domain or "",
             "page": 1,
             "person_titles": [
@@ -33,16 +32,29 @@ class ApolloProvider(EnrichmentProvider):
             "per_page": 10,
         }
 
-        async with make_client(headers=headers) as client:
-            @retryable()
-            async def do():
-                # Placeholder endpoint; Apollo endpoint availability varies by plan.
-                resp = await client.post("https://api.apollo.io/v1/mixed_people/search", content=orjson.dumps(payload))
-                if resp.status_code == 404:
-                    return {"people": []}
-                resp.raise_for_status()
-                return resp.json()
-            data = await do()
+    def query_fingerprint(self, company: CompanyInput) -> str:
+        query = {k: v for k, v in self._search_payload(company).items() if k != "q_organization_domains"}
+        return hashlib.blake2b(orjson.dumps(query, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+    async def find_contacts(self, company: CompanyInput) -> List[ContactCandidate]:
+        if not settings.APOLLO_API_KEY:
+            return []
+        headers = {
+            "Content-Type": "application/json",
+            "Cache-Control": "no-cache",
+            "X-Api-Key": settings.APOLLO_API_KEY,
+        }
+        payload = self._search_payload(company)
+
+        @retryable()
+        async def do():
+            # Placeholder endpoint; Apollo endpoint availability varies by plan.
+            resp = await send(self.name, "POST", f"{self.base_url}/v1/mixed_people/search", content=orjson.dumps(payload), headers=headers)
+            if resp.status_code == 404:
+                return {"people": []}
+            resp.raise_for_status()
+            return resp.json()
+        data = await do()
 
         people = data.get("people") or data.get("contacts") or []
         out: List[ContactCandidate] = []
@@ -1,18 +1,59 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from typing import AsyncIterator, List
 from app.models.schemas import CompanyInput, ContactCandidate
 
 class EnrichmentProvider(ABC):
     name: str = "base"
+    base_url: str | None = None
+
+    @property
+    def configured(self) -> bool:
+        """False when the vendor has no credentials: it is neither called nor cached."""
+        return True
 
     @abstractmethod
     async def find_contacts(self, company: CompanyInput) -> List[ContactCandidate]:
         raise NotImplementedError
 
+    def query_fingerprint(self, company: CompanyInput) -> str:
+        """Everything besides the domain that shapes find_contacts' answer (part of the result-cache key)."""
+        return ""
+
 class EmailVerificationProvider(ABC):
     name: str = "base"
+    base_url: str | None = None
+
+    @property
+    def configured(self) -> bool:
+        """False when the vendor has no credentials: verify_details then answers "unknown" without calling it."""
+        return True
 
     @abstractmethod
     async def verify(self, email: str) -> str:
         """Return: deliverable | undeliverable | risky | unknown"""
         raise NotImplementedError
+
+    async def verify_details(self, email: str) -> tuple[str, str | None]:
+        """(verdict, domain verdict); the domain verdict is catch_all | disposable | invalid_domain | None."""
+        return await self.verify(email), None
+
+    async def verify_many(self, emails: List[str], concurrency: int = 4) -> AsyncIterator[tuple[str, str, str | None]]:
+        """Yield (email, verdict, domain verdict) as results arrive.
+
+        Providers with a bulk API override this; the default runs verify_details with bounded
+        concurrency. Addresses whose check errored are not yielded.
+        """
+        slots = asyncio.Semaphore(max(1, concurrency))
+
+        async def one(email: str):
+            async with slots:
+                try:
+                    return (email, *await self.verify_details(email))
+                except Exception:
+                    return None
+
+        for next_done in asyncio.as_completed([one(e) for e in emails]):
+            result = await next_done
+            if result is not None:
+                yield result
@@ -1,22 +1,39 @@
 from app.config.settings import settings
 from app.providers.base import EmailVerificationProvider
-from app.utils.http import make_client, retryable
+from app.utils.http import retryable, send
 
 class HunterVerifyProvider(EmailVerificationProvider):
+    # Hunter has no bulk verification API: verify_many uses the base class's bounded concurrent single checks.
     name = "hunter"
+    base_url = "https://api.hunter.io"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.HUNTER_API_KEY)
 
     async def verify(self, email: str) -> str:
+        return (await self.verify_details(email))[0]
+
+    async def verify_details(self, email: str) -> tuple[str, str | None]:
         if not settings.HUNTER_API_KEY:
-            return "unknown"
+            return "unknown", None
         params = {"email": email, "api_key": settings.HUNTER_API_KEY}
-        async with make_client() as client:
-            @retryable()
-            async def do():
-                resp = await client.get("https://api.hunter.io/v2/email-verifier", params=params)
-                resp.raise_for_status()
-                return resp.json()
-            data = await do()
-        result = (((data or {}).get("data") or {}).get("result") or "unknown").lower()
+
+        @retryable()
+        async def do():
+            resp = await send(self.name, "GET", f"{self.base_url}/v2/email-verifier", params=params)
+            resp.raise_for_status()
+            return resp.json()
+        data = await do()
+        info = (data or {}).get("data") or {}
+        result = (info.get("result") or "unknown").lower()
+        domain = None
+        if info.get("accept_all") or info.get("status") == "accept_all":
+            domain = "catch_all"
+        elif info.get("disposable"):
+            domain = "disposable"
+        elif info.get("mx_records") is False and result == "undeliverable":
+            domain = "invalid_domain"
         if result in ("deliverable", "undeliverable", "risky"):
-            return result
-        return "unknown"
+            return result, domain
+        return "unknown", domain
@@ -1,30 +1,96 @@
+import asyncio
+import time
 import orjson
+from typing import AsyncIterator, List
 from app.config.settings import settings
 from app.providers.base import EmailVerificationProvider
-from app.utils.http import make_client, retryable
+from app.utils.http import retryable, send
+
+RESULTS_PAGE_SIZE = 1000
+
+def _classify(result: str, flags: list) -> tuple[str, str | None]:
+    domain = None
+    if result in ("catchall", "catch_all"):
+        domain = "catch_all"
+    elif result == "disposable":
+        domain = "disposable"
+    elif result == "invalid" and flags and "has_dns" not in flags:
+        domain = "invalid_domain"
+    if result in ("valid",):
+        return "deliverable", domain
+    if result in ("catchall", "catch_all"):
+        return "risky", domain
+    if result in ("invalid",):
+        return "undeliverable", domain
+    return "unknown", domain
 
 class NeverBounceProvider(EmailVerificationProvider):
     name = "neverbounce"
+    base_url = "https://api.neverbounce.com"
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {settings.NEVERBOUNCE_API_KEY}", "Content-Type": "application/json"}
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.NEVERBOUNCE_API_KEY)
 
     async def verify(self, email: str) -> str:
+        return (await self.verify_details(email))[0]
+
+    async def verify_details(self, email: str) -> tuple[str, str | None]:
         if not settings.NEVERBOUNCE_API_KEY:
-            return "unknown"
-        headers = {"Authorization": f"Bearer {settings.NEVERBOUNCE_API_KEY}", "Content-Type": "application/json"}
+            return "unknown", None
+        headers = self._headers()
         payload = {"email": email}
-        async with make_client(headers=headers) as client:
-            @retryable()
-            async def do():
-                resp = await client.post("https://api.neverbounce.com/v4/single/check", content=orjson.dumps(payload))
-                if resp.status_code == 404:
-                    return {"result": "unknown"}
-                resp.raise_for_status()
-                return resp.json()
-            data = await do()
-        result = (data.get("result") or "unknown").lower()
-        if result in ("valid",):
-            return "deliverable"
-        if result in ("catchall", "catch_all"):
-            return "risky"
-        if result in ("invalid",):
-            return "undeliverable"
-        return "unknown"
+
+        @retryable()
+        async def do():
+            resp = await send(self.name, "POST", f"{self.base_url}/v4/single/check", content=orjson.dumps(payload), headers=headers)
+            if resp.status_code == 404:
+                return {"result": "unknown"}
+            resp.raise_for_status()
+            return resp.json()
+        data = await do()
+        return _classify((data.get("result") or "unknown").lower(), data.get("flags") or [])
+
+    async def verify_many(self, emails: List[str], concurrency: int = 4) -> AsyncIterator[tuple[str, str, str | None]]:
+        """Bulk job: create with the addresses inline, poll until complete, then page through results."""
+        if not settings.NEVERBOUNCE_API_KEY:
+            return
+        headers = self._headers()
+        job = {
+            "input_location": "supplied",
+            "input": [{"email": e} for e in emails],
+            "auto_parse": 1,
+            "auto_start": 1,
+        }
+
+        @retryable()
+        async def call(method: str, path: str, **kwargs):
+            resp = await send(self.name, method, f"{self.base_url}{path}", headers=headers, **kwargs)
+            resp.raise_for_status()
+            return resp.json()
+
+        job_id = (await call("POST", "/v4/jobs/create", content=orjson.dumps(job)))["job_id"]
+        deadline = time.monotonic() + settings.VERIFY_BULK_TIMEOUT_S
+        while True:
+            status = ((await call("GET", "/v4/jobs/status", params={"job_id": job_id})).get("job_status") or "").lower()
+            if status == "complete":
+                break
+            if status in ("failed", "under_review"):
+                raise RuntimeError(f"NeverBounce job {job_id} {status}")
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"NeverBounce job {job_id} still {status or 'pending'}")
+            await asyncio.sleep(settings.VERIFY_BULK_POLL_INTERVAL_S)
+
+        page = 1
+        while True:
+            data = await call("GET", "/v4/jobs/results", params={"job_id": job_id, "page": page, "items_per_page": RESULTS_PAGE_SIZE})
+            for item in data.get("results") or []:
+                verification = item.get("verification") or {}
+                email = (item.get("data") or {}).get("email") or ""
+                yield (email, *_classify((verification.get("result") or "unknown").lower(), verification.get("flags") or []))
+            if page >= (data.get("total_pages") or 1):
+                break
+            page += 1
@@ -1,24 +1,65 @@
+import orjson
+from typing import AsyncIterator, List
 from app.config.settings import settings
 from app.providers.base import EmailVerificationProvider
-from app.utils.http import make_client, retryable
+from app.utils.http import retryable, send
+
+BATCH_LIMIT = 100  # validatebatch accepts up to 100 addresses per call
+
+def _classify(status: str, sub_status: str) -> tuple[str, str | None]:
+    domain = None
+    if status == "catch-all":
+        domain = "catch_all"
+    elif sub_status == "disposable":
+        domain = "disposable"
+    elif sub_status == "no_dns_entries":
+        domain = "invalid_domain"
+    if status in ("valid", "catch-all"):
+        return ("deliverable" if status == "valid" else "risky"), domain
+    if status in ("invalid", "spamtrap", "abuse"):
+        return "undeliverable", domain
+    return "unknown", domain
 
 class ZeroBounceProvider(EmailVerificationProvider):
     name = "zerobounce"
+    base_url = "https://api.zerobounce.net"
+    bulk_url = "https://bulkapi.zerobounce.net"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.ZEROBOUNCE_API_KEY)
 
     async def verify(self, email: str) -> str:
+        return (await self.verify_details(email))[0]
+
+    async def verify_details(self, email: str) -> tuple[str, str | None]:
         if not settings.ZEROBOUNCE_API_KEY:
-            return "unknown"
+            return "unknown", None
         params = {"api_key": settings.ZEROBOUNCE_API_KEY, "email": email}
-        async with make_client() as client:
+
+        @retryable()
+        async def do():
+            resp = await send(self.name, "GET", f"{self.base_url}/v2/validate", params=params)
+            resp.raise_for_status()
+            return resp.json()
+        data = await do()
+        return _classify((data.get("status") or "unknown").lower(), (data.get("sub_status") or "").lower())
+
+    async def verify_many(self, emails: List[str], concurrency: int = 4) -> AsyncIterator[tuple[str, str, str | None]]:
+        if not settings.ZEROBOUNCE_API_KEY:
+            return
+        for i in range(0, len(emails), BATCH_LIMIT):
+            payload = {
+                "api_key": settings.ZEROBOUNCE_API_KEY,
+                "email_batch": [{"email_address": e, "ip_address": None} for e in emails[i:i + BATCH_LIMIT]],
+            }
+
             @retryable()
             async def do():
-                resp = await client.get("https://api.zerobounce.net/v2/validate", params=params)
+                resp = await send("zerobounce_bulk", "POST", f"{self.bulk_url}/v2/validatebatch", content=orjson.dumps(payload), headers={"Content-Type": "application/json"})
                 resp.raise_for_status()
                 return resp.json()
             data = await do()
-        status = (data.get("status") or "unknown").lower()
-        if status in ("valid", "catch-all"):
-            return "deliverable" if status == "valid" else "risky"
-        if status in ("invalid", "spamtrap", "abuse"):
-            return "undeliverable"
-        return "unknown"
+            for item in data.get("email_batch") or []:
+                status = (item.get("status") or "unknown").lower()
+                yield (item.get("address") or "", *_classify(status, (item.get("sub_status") or "").lower()))
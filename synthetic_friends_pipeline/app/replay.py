@@ -0,0 +1,286 @@
+"""
+Rebuild HubSpot email-tracking rollups from the JSONL event log.
+
+    python -m app.replay                      # add logged activity on top of HubSpot's counters
+    python -m app.replay --rebuild            # counters/last-* values come from the log alone
+    python -m app.replay --since 2026-01-01T00:00:00Z --until 2026-01-02T00:00:00Z
+    python -m app.replay --stats              # rebuild the local /email/stats store only (no HubSpot calls)
+
+Streams every segment (rotated and compressed included), folds events into per-contact
+rollups in bounded batches, writes them with batch read/upsert calls through the HubSpot
+rate limiter, and checkpoints (segment, byte offset) after each batch so an interrupted
+run resumes where it stopped. Contacts written from a batch that did not finish are recorded
+as they go, so a resumed run re-folds that batch but does not add them twice.
+"""
+import argparse
+import asyncio
+import datetime
+from pathlib import Path
+
+import orjson
+
+from app.config.settings import settings
+from app.models.schemas import EmailEvent
+from app.pipeline.email_rollups import EmailRollup, apply_rollups
+from app.pipeline.email_stats import get_stats_store
+from app.pipeline.email_tracking import _resolve_contact_emails
+from app.utils.event_log import list_segments, open_segment, segment_key
+from app.utils.http import clients
+from app.utils.log import get_logger
+from app.utils.sqlite import connect, transaction
+
+logger = get_logger("sf-replay")
+
+
+def _parse_ts(value: str | None) -> int | None:
+    if not value:
+        return None
+    return int(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def _contact_emails(payload: dict) -> list[str]:
+    if "contact_emails" in payload:
+        return payload["contact_emails"] or []
+    # lines written before contact_emails was logged
+    fields = {k: v for k, v in payload.items() if k in EmailEvent.model_fields}
+    try:
+        return _resolve_contact_emails(EmailEvent(**fields))
+    except Exception:
+        return []
+
+
+_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rebuilt (email TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS batch_written (
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    PRIMARY KEY (name, email)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = {"batch_end": "INTEGER"}
+
+
+class Checkpoint:
+    """Replay progress in SQLite: byte offset per segment (keyed without its compression suffix, so a
+    segment rotated to .gz resumes where it left off) and, for --rebuild, the contacts already reset.
+
+    While a batch is being written, `batch_end` is the offset it folds up to and `batch_written`
+    holds the contacts already written from it; both are cleared when the offset moves past it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        legacy = None
+        if path.exists() and path.read_bytes()[:1] == b"{":
+            legacy = orjson.loads(path.read_bytes())  # JSON checkpoints written before the SQLite format
+            path.replace(path.with_name(path.name + ".legacy"))
+        self.conn = connect(str(path))
+        self.conn.executescript(_CHECKPOINT_SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(segments)")}
+        for column, decl in _COLUMNS.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE segments ADD COLUMN {column} {decl}")
+        if legacy:
+            done = {segment_key(Path(n)) for n in legacy.get("done", [])}
+            offsets = {segment_key(Path(n)): o for n, o in legacy.get("offsets", {}).items()}
+            self.save([(n, offsets.get(n, 0), n in done) for n in set(offsets) | done], legacy.get("rebuilt", []))
+
+    def offset(self, name: str) -> tuple[int, bool]:
+        row = self.conn.execute("SELECT offset, done FROM segments WHERE name = ?", (name,)).fetchone()
+        return (row["offset"], bool(row["done"])) if row else (0, False)
+
+    def in_progress(self, name: str) -> tuple[int | None, set[str]]:
+        """(batch_end, contacts already written) for a batch an earlier run did not finish."""
+        row = self.conn.execute("SELECT batch_end FROM segments WHERE name = ?", (name,)).fetchone()
+        if row is None or row["batch_end"] is None:
+            return None, set()
+        rows = self.conn.execute("SELECT email FROM batch_written WHERE name = ?", (name,))
+        return row["batch_end"], {r["email"] for r in rows}
+
+    def record_written(self, name: str, batch_end: int, emails: list[str], rebuilt: list[str] = ()) -> None:
+        with transaction(self.conn):
+            self.conn.execute(
+                "INSERT INTO segments (name, offset, batch_end) VALUES (?, 0, ?) "
+                "ON CONFLICT (name) DO UPDATE SET batch_end = excluded.batch_end",
+                (name, batch_end),
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO batch_written (name, email) VALUES (?, ?)", [(name, e) for e in emails])
+            self.conn.executemany("INSERT OR IGNORE INTO rebuilt (email) VALUES (?)", [(e,) for e in rebuilt])
+
+    def rebuilt_among(self, emails: list[str]) -> set[str]:
+        found: set[str] = set()
+        for i in range(0, len(emails), 500):
+            chunk = emails[i:i + 500]
+            rows = self.conn.execute(f"SELECT email FROM rebuilt WHERE email IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(row["email"] for row in rows)
+        return found
+
+    def save(self, segments: list[tuple[str, int, bool]], rebuilt: list[str] = ()) -> None:
+        with transaction(self.conn):
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO segments (name, offset, done) VALUES (?, ?, ?)",
+                [(name, offset, int(done)) for name, offset, done in segments],
+            )
+            self.conn.executemany("DELETE FROM batch_written WHERE name = ?", [(name,) for name, _, _ in segments])
+            self.conn.executemany("INSERT OR IGNORE INTO rebuilt (email) VALUES (?)", [(e,) for e in rebuilt])
+
+
+async def _flush(
+    pending: dict[str, EmailRollup],
+    checkpoint: Checkpoint,
+    name: str,
+    batch_end: int,
+    written: set[str],
+    rebuild: bool,
+    dry_run: bool,
+) -> None:
+    """Write the rollups folded from `name` up to `batch_end`, skipping contacts in `written`.
+
+    Each attempt's successful contacts are checkpointed straight away, so a failure part-way
+    through never re-adds them on resume.
+    """
+    pending = {e: r for e, r in pending.items() if e not in written}
+    if dry_run or not pending:
+        return
+    batches = [(pending, False)]
+    if rebuild:
+        already = checkpoint.rebuilt_among(list(pending))
+        fresh = {e: r for e, r in pending.items() if e not in already}
+        seen = {e: r for e, r in pending.items() if e in already}
+        batches = [(fresh, True), (seen, False)]
+    for rollups, absolute in batches:
+        remaining = rollups
+        for attempt in range(3):
+            if not remaining:
+                break
+            failed = await apply_rollups(remaining, absolute=absolute)
+            ok = [e for e in remaining if e not in failed]
+            checkpoint.record_written(name, batch_end, ok, ok if absolute else ())
+            remaining = {e: remaining[e] for e in failed if e in remaining}
+            if remaining:
+                await asyncio.sleep(2 ** attempt)
+        if remaining:
+            raise RuntimeError(f"{len(remaining)} contacts could not be written (e.g. {next(iter(remaining))})")
+
+
+def _fold_line(line: bytes, pending: dict[str, EmailRollup], since_ms: int | None, until_ms: int | None, stats: dict) -> None:
+    try:
+        payload = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return
+    event_ms = payload.get("received_at_ms") or 0
+    if (
+        payload.get("skip_rollup")
+        or (since_ms is not None and event_ms < since_ms)
+        or (until_ms is not None and event_ms >= until_ms)
+    ):
+        stats["skipped"] += 1
+        return
+    for email in _contact_emails(payload):
+        pending.setdefault(email, EmailRollup()).add_payload(payload)
+    stats["events"] += 1
+
+
+async def replay(
+    base_path: str,
+    checkpoint_path: Path,
+    since_ms: int | None = None,
+    until_ms: int | None = None,
+    rebuild: bool = False,
+    batch_contacts: int = 1000,
+    dry_run: bool = False,
+) -> dict:
+    checkpoint = Checkpoint(checkpoint_path)
+    pending: dict[str, EmailRollup] = {}
+    stats = {"segments": 0, "events": 0, "skipped": 0, "contacts_written": 0}
+
+    for segment in list_segments(base_path):
+        name = segment_key(segment)
+        offset, done = checkpoint.offset(name)
+        if done:
+            continue
+        # an unfinished batch is re-folded to exactly where it ended, so `written` matches it
+        batch_end, written = checkpoint.in_progress(name)
+        stats["segments"] += 1
+        complete = True
+        try:
+            handle = open_segment(segment)
+        except FileNotFoundError:
+            # rotated + compressed since listing; the .gz/.zst twin is picked up on the next run
+            continue
+        with handle:
+            if offset:
+                handle.seek(offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    complete = False  # torn tail of a live segment: resume here next time
+                    break
+                offset += len(line)
+                _fold_line(line, pending, since_ms, until_ms, stats)
+                if offset == batch_end or (batch_end is None and len(pending) >= batch_contacts):
+                    await _flush(pending, checkpoint, name, offset, written, rebuild, dry_run)
+                    stats["contacts_written"] += len(pending.keys() - written)
+                    pending, batch_end, written = {}, None, set()
+                    if not dry_run:
+                        checkpoint.save([(name, offset, False)])
+        await _flush(pending, checkpoint, name, offset, written, rebuild, dry_run)
+        stats["contacts_written"] += len(pending.keys() - written)
+        pending = {}
+        # closed segments never grow again
+        done = complete and segment.suffix in (".gz", ".zst")
+        if not dry_run:
+            checkpoint.save([(name, offset, done)])
+        logger.info("replayed %s (%d events so far)", name, stats["events"])
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.replay", description="Replay the email event log into HubSpot rollups.")
+    parser.add_argument("--log", default=settings.EMAIL_EVENT_LOG_PATH, help="event log base path")
+    parser.add_argument("--checkpoint", default="data/email_replay.checkpoint.db")
+    parser.add_argument("--since", help="only events at/after this ISO timestamp")
+    parser.add_argument("--until", help="only events before this ISO timestamp")
+    parser.add_argument("--rebuild", action="store_true", help="replace counters instead of adding to them")
+    parser.add_argument("--batch-contacts", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="ignore and overwrite an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--stats", action="store_true", help="rebuild the EMAIL_STATS_PATH analytics store instead")
+    args = parser.parse_args()
+
+    if args.stats:
+        store = get_stats_store()
+        if store is None:
+            parser.error("EMAIL_STATS_PATH is not set")
+        print(orjson.dumps({"events": store.rebuild(args.log)}).decode())
+        return
+
+    checkpoint_path = Path(args.checkpoint)
+    if args.reset:
+        for path in (checkpoint_path, Path(f"{checkpoint_path}-wal"), Path(f"{checkpoint_path}-shm")):
+            path.unlink(missing_ok=True)
+
+    async def run():
+        try:
+            return await replay(
+                args.log,
+                checkpoint_path,
+                since_ms=_parse_ts(args.since),
+                until_ms=_parse_ts(args.until),
+                rebuild=args.rebuild,
+                batch_contacts=args.batch_contacts,
+                dry_run=args.dry_run,
+            )
+        finally:
+            await clients.aclose()
+
+    print(orjson.dumps(asyncio.run(run()), option=orjson.OPT_INDENT_2).decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import time
+from collections import deque
+
+from app.config.settings import settings
+from app.utils.log import get_logger
+
+logger = get_logger("sf-breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Count-window breaker: failures and slow calls both count against the vendor."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float | None = None,
+        slow_call_s: float | None = None,
+        window: int | None = None,
+        min_calls: int | None = None,
+        probe_interval_s: float | None = None,
+    ):
+        self.name = name
+        self.failure_rate = settings.BREAKER_FAILURE_RATE if failure_rate is None else failure_rate
+        self.slow_call_s = settings.BREAKER_SLOW_CALL_S if slow_call_s is None else slow_call_s
+        self.min_calls = settings.BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.probe_interval_s = settings.BREAKER_PROBE_INTERVAL_S if probe_interval_s is None else probe_interval_s
+        self._outcomes: deque[bool] = deque(maxlen=settings.BREAKER_WINDOW if window is None else window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.skipped = 0
+        self.last_error: str | None = None
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            logger.warning("circuit %s opened (%s)", self.name, self.last_error or "slow calls")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def _close(self) -> None:
+        if self.state != CLOSED:
+            logger.info("circuit %s closed", self.name)
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.probe_interval_s:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == CLOSED
+
+    def record(self, ok: bool, elapsed_s: float) -> None:
+        bad = not ok or elapsed_s >= self.slow_call_s
+        if self.state == HALF_OPEN:
+            if bad:
+                self._open()
+            else:
+                self._close()
+            return
+        self._outcomes.append(bad)
+        if len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    async def call(self, fn, *args, timed: bool = True, **kwargs):
+        """Run fn through the breaker; timed=False judges only the outcome (e.g. a bulk job that is slow by design)."""
+        if not self.allow():
+            self.skipped += 1
+            raise CircuitOpenError(self.name)
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as exc:
+            self.last_error = f"{type(exc).__name__}: {str(exc)[:200]}"
+            self.record(False, time.monotonic() - started if timed else 0.0)
+            raise
+        except BaseException:
+            # cancelled mid-call: release the half-open probe slot without judging the vendor
+            self._probing = False
+            raise
+        self.record(True, time.monotonic() - started if timed else 0.0)
+        return result
+
+    def snapshot(self) -> dict:
+        window = len(self._outcomes)
+        probe_in = self.probe_interval_s - (time.monotonic() - self._opened_at)
+        return {
+            "state": self.state,
+            "probe_in_s": round(max(0.0, probe_in), 1) if self.state == OPEN else None,
+            "failure_rate": round(sum(self._outcomes) / window, 3) if window else 0.0,
+            "window_calls": window,
+            "skipped": self.skipped,
+            "last_error": self.last_error,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name)
+        _breakers[name] = breaker
+    return breaker
+
+
+def breaker_snapshot() -> dict:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
@@ -0,0 +1,336 @@
+import calendar
+import gzip
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import IO, Iterator
+
+import orjson
+
+from app.config.settings import settings
+from app.utils.log import get_logger
+
+logger = get_logger("sf-event-log")
+
+_SEGMENT_TS = "%Y%m%dT%H%M%S"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def host_tag(hostname: str) -> str:
+    """The hostname as it appears in segment names."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", hostname)
+
+
+def _split_base(base_path: str | Path) -> tuple[Path, str, str]:
+    base = Path(base_path)
+    suffix = base.suffix or ".jsonl"
+    return base.parent, base.name[: -len(base.suffix)] if base.suffix else base.name, suffix
+
+
+class EventLogWriter:
+    """Append-only JSONL log with group commit from a background thread.
+
+    Every process writes its own segment (`<stem>.<host>-<pid>.<ts>-<seq>.jsonl`), so
+    `uvicorn --workers N` never interleaves partial lines. Segments rotate on size or age
+    and closed segments are optionally compressed (gzip, or zstd if installed).
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self._cond = threading.Condition()
+        self._buffer: list[bytes] = []
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._stopping = False
+        self._handle: IO[bytes] | None = None
+        self._segment: Path | None = None
+        self._segment_opened = 0.0
+        self._segment_bytes = 0
+        self._last_fsync = 0.0
+        self._seq = 0
+        self.records = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def append(self, payload: dict) -> None:
+        """Raises BufferError (nothing buffered) once EVENT_LOG_MAX_BUFFER records are waiting."""
+        line = orjson.dumps(payload) + b"\n"
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            if len(self._buffer) >= settings.EVENT_LOG_MAX_BUFFER:
+                self.dropped += 1
+                raise BufferError(f"event log buffer full ({len(self._buffer)} records waiting)")
+            self._buffer.append(line)
+            self._cond.notify()
+
+    def append_many(self, payloads: list[dict]) -> None:
+        """All-or-nothing: raises BufferError (nothing buffered) if the batch would exceed EVENT_LOG_MAX_BUFFER."""
+        lines = [orjson.dumps(p) + b"\n" for p in payloads]
+        with self._cond:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            if len(self._buffer) + len(lines) > settings.EVENT_LOG_MAX_BUFFER:
+                self.dropped += len(lines)
+                raise BufferError(f"event log buffer full ({len(self._buffer)} records waiting)")
+            self._buffer.extend(lines)
+            self._cond.notify()
+
+    def _reset_after_fork(self) -> None:
+        self._pid = os.getpid()
+        self._buffer = []
+        self._handle = None
+        self._segment = None
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        linger = settings.EVENT_LOG_LINGER_MS / 1000
+        while True:
+            with self._cond:
+                if not self._buffer and not self._stopping:
+                    self._cond.wait(timeout=1.0)
+                pending, stopping = bool(self._buffer), self._stopping
+            if not pending:
+                if stopping:
+                    # compressed here rather than on a daemon thread that process exit would cut short
+                    self._close_segment(compress=True, background=False)
+                    with self._cond:
+                        self._cond.notify_all()
+                    return
+                if self._handle is not None and time.monotonic() - self._segment_opened >= settings.EVENT_LOG_ROTATE_S:
+                    self._close_segment(compress=True)
+                continue
+            if linger and not stopping:
+                time.sleep(linger)  # let concurrent appends join this commit
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            try:
+                self._write(batch)
+            except Exception as exc:
+                logger.warning("event log write failed (%d records lost): %s", len(batch), exc)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _open_segment(self) -> None:
+        directory, stem, suffix = _split_base(self.base_path)
+        directory.mkdir(parents=True, exist_ok=True)
+        host = host_tag(socket.gethostname())
+        stamp = time.strftime(_SEGMENT_TS, time.gmtime())
+        self._seq += 1
+        self._segment = directory / f"{stem}.{host}-{os.getpid()}.{stamp}-{self._seq:04d}{suffix}"
+        self._handle = self._segment.open("ab")
+        self._segment_opened = time.monotonic()
+        self._segment_bytes = self._segment.stat().st_size
+
+    def _write(self, batch: list[bytes]) -> None:
+        if self._handle is None:
+            self._open_segment()
+        data = b"".join(batch)
+        self._handle.write(data)
+        self._handle.flush()
+        self._segment_bytes += len(data)
+        self.records += len(batch)
+        self.batches += 1
+        policy = settings.EVENT_LOG_FSYNC
+        now = time.monotonic()
+        if policy == "always" or (policy == "interval" and now - self._last_fsync >= settings.EVENT_LOG_FSYNC_INTERVAL_S):
+            os.fsync(self._handle.fileno())
+            self._last_fsync = now
+        if self._segment_bytes >= settings.EVENT_LOG_ROTATE_BYTES or now - self._segment_opened >= settings.EVENT_LOG_ROTATE_S:
+            self._close_segment(compress=True)
+
+    def _close_segment(self, compress: bool, background: bool = True) -> None:
+        if self._handle is None:
+            return
+        handle, segment = self._handle, self._segment
+        self._handle = None
+        self._segment = None
+        try:
+            handle.flush()
+            if settings.EVENT_LOG_FSYNC != "never":
+                os.fsync(handle.fileno())
+            handle.close()
+        except Exception as exc:
+            logger.warning("event log close failed for %s: %s", segment, exc)
+            return
+        if compress and settings.EVENT_LOG_COMPRESSION in ("gzip", "zstd"):
+            if background:
+                # off the writer thread so a large segment doesn't stall the next commit
+                threading.Thread(target=_compress_quietly, args=(segment,), daemon=True).start()
+            else:
+                _compress_quietly(segment)
+
+    def flush(self, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._buffer and self._thread and self._thread.is_alive():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.notify()
+                self._cond.wait(timeout=remaining)
+
+    def close(self, timeout: float = 10.0) -> None:
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        self._pid = None
+
+    def snapshot(self) -> dict:
+        return {
+            "segment": str(self._segment) if self._segment else None,
+            "buffered": len(self._buffer),
+            "records": self.records,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+def compress_segment(path: Path, method: str) -> Path:
+    zstd = _zstd() if method == "zstd" else None
+    if method == "zstd" and zstd is None:
+        logger.warning("EVENT_LOG_COMPRESSION=zstd but zstandard is not installed; using gzip")
+        method = "gzip"
+    target = path.with_name(path.name + (".zst" if method == "zstd" else ".gz"))
+    tmp = target.with_name(target.name + ".tmp")
+    with path.open("rb") as src:
+        if method == "zstd":
+            with tmp.open("wb") as raw, zstd.ZstdCompressor().stream_writer(raw) as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            with gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+def _compress_quietly(path: Path) -> None:
+    try:
+        compress_segment(path, settings.EVENT_LOG_COMPRESSION)
+    except Exception as exc:
+        logger.warning("event log compression failed for %s: %s", path, exc)
+
+
+_COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def segment_key(path: Path) -> str:
+    """A segment's name without its compression suffix: stable across rotation + compression."""
+    name = path.name
+    for ext in _COMPRESSED_SUFFIXES:
+        if name.endswith(ext):
+            return name[: -len(ext)]
+    return name
+
+
+def open_segment(path: Path) -> IO[bytes]:
+    """Open a segment for reading; a plain segment compressed since it was listed is followed to its new name."""
+    if segment_key(path) == path.name:
+        for candidate in [path] + [path.with_name(path.name + ext) for ext in _COMPRESSED_SUFFIXES]:
+            try:
+                return _open_one(candidate)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(path)
+    return _open_one(path)
+
+
+def _open_one(path: Path) -> IO[bytes]:
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.name.endswith(".zst"):
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return zstd.ZstdDecompressor().stream_reader(path.open("rb"))
+    return path.open("rb")
+
+
+def list_segments(base_path: str | Path) -> list[Path]:
+    """The legacy single file (if any) followed by every worker segment, oldest first."""
+    directory, stem, suffix = _split_base(base_path)
+    if not directory.exists():
+        return []
+    legacy = directory / f"{stem}{suffix}"
+    by_key: dict[str, Path] = {}
+    for p in directory.glob(f"{stem}.*{suffix}*"):
+        if p.name.endswith(".tmp") or p == legacy:
+            continue
+        # mid-compression both names exist; the plain one is complete and open_segment follows it if it goes away
+        key = segment_key(p)
+        if key not in by_key or p.name == key:
+            by_key[key] = p
+    segments = list(by_key.values())
+
+    def _stamp(p: Path) -> str:
+        parts = p.name[len(stem) + 1:].split(".")
+        return parts[1] if len(parts) > 1 else ""
+
+    ordered = sorted(segments, key=lambda p: (_stamp(p), p.name))
+    return ([legacy] if legacy.exists() else []) + ordered
+
+
+def writer_segments(base_path: str | Path, host: str, pid: int, since_ms: int) -> list[Path]:
+    """Segments written by one process (host + pid) that can hold records appended at or after since_ms:
+    the last one opened at or before since_ms and every later one."""
+    directory, stem, suffix = _split_base(base_path)
+    prefix = f"{stem}.{host_tag(host)}-{pid}."
+    opened: list[tuple[int, Path]] = []
+    for segment in list_segments(base_path):
+        if not segment.name.startswith(prefix):
+            continue
+        stamp = segment.name[len(prefix):].split("-", 1)[0]
+        try:
+            opened.append((int(calendar.timegm(time.strptime(stamp, _SEGMENT_TS)) * 1000), segment))
+        except ValueError:
+            continue
+    first = max((i for i, (ms, _) in enumerate(opened) if ms <= since_ms), default=0)
+    return [segment for _, segment in opened[first:]]
+
+
+def iter_log_records(base_path: str | Path, segments: list[Path] | None = None) -> Iterator[dict]:
+    """Every record of the log, or of just `segments`, oldest segment first."""
+    for segment in list_segments(base_path) if segments is None else segments:
+        try:
+            with open_segment(segment) as handle:
+                for line in handle:
+                    try:
+                        yield orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        continue  # torn tail of a segment still being written
+        except FileNotFoundError:
+            continue  # compressed away between listing and opening
+
+
+_writers: dict[str, EventLogWriter] = {}
+
+
+def get_event_log(base_path: str) -> EventLogWriter:
+    writer = _writers.get(base_path)
+    if writer is None:
+        writer = EventLogWriter(base_path)
+        _writers[base_path] = writer
+    return writer
+
+
+def close_event_logs() -> None:
+    for writer in _writers.values():
+        writer.close()
@@ -1,17 +1,143 @@
+import email.utils
+import time
+from urllib.parse import urlsplit
+
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_base, stop_after_attempt, wait_exponential
 from app.config.settings import settings
+from app.utils.log import get_logger
+from app.utils.ratelimit import limiter_for, retry_budget
+
+logger = get_logger("sf-http")
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _http2_enabled() -> bool:
+    if not settings.HTTP_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+class ClientRegistry:
+    """One pooled AsyncClient per upstream origin, shared by the whole process."""
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, origin: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_S,
+        )
+        return httpx.AsyncClient(
+            base_url=origin,
+            timeout=settings.HTTP_TIMEOUT_S,
+            limits=limits,
+            http2=_http2_enabled(),
+            follow_redirects=True,
+        )
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        origin = _origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._build(origin)
+            self._clients[origin] = client
+        return client
+
+    async def startup(self, urls: list[str]) -> None:
+        for url in urls:
+            if url:
+                self.get(url)
+        logger.info("http client pool ready for %s", ", ".join(sorted(self._clients)))
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as exc:
+                logger.warning("http client close failed: %s", exc)
+
+
+clients = ClientRegistry()
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    return clients.get(url)
+
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def _retry_after_s(resp: httpx.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+async def send(vendor: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send one attempt through the vendor's rate limiter on the pooled client."""
+    limiter = limiter_for(vendor)
+    await limiter.acquire()
+    retry_budget.record_request()
+    resp = await get_client(url).request(method, url, **kwargs)
+    if resp.status_code == 429:
+        limiter.pause(min(_retry_after_s(resp) or 1.0, settings.RETRY_AFTER_MAX_S))
+    return resp
+
+
+def _is_retryable(exc: BaseException | None) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    return False
+
+
+class _retry_if_retryable(retry_base):
+    def __call__(self, retry_state) -> bool:
+        if retry_state.attempt_number >= settings.MAX_RETRIES:
+            return False
+        if not retry_state.outcome.failed or not _is_retryable(retry_state.outcome.exception()):
+            return False
+        return retry_budget.try_spend()
+
+
+_backoff = wait_exponential(multiplier=0.5, min=0.5, max=6)
+
+
+def _wait(retry_state) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = _retry_after_s(exc.response)
+        if retry_after is not None:
+            return min(retry_after, settings.RETRY_AFTER_MAX_S)
+    return _backoff(retry_state)
 
-def make_client(headers: dict | None = None) -> httpx.AsyncClient:
-    return httpx.AsyncClient(
-        timeout=settings.HTTP_TIMEOUT_S,
-        headers=headers or {},
-        follow_redirects=True,
-    )
 
 def retryable():
     return retry(
         stop=stop_after_attempt(settings.MAX_RETRIES),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=6),
+        retry=_retry_if_retryable(),
+        wait=_wait,
         reraise=True,
     )
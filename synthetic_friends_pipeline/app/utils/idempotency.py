@@ -0,0 +1,87 @@
+import hashlib
+import time
+
+import orjson
+
+from app.config.settings import settings
+from app.utils.sqlite import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status_code INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    created_at_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_age ON responses (created_at_ms);
+"""
+
+# added after the first release; created on open by ALTER TABLE when missing
+_COLUMNS = {"body_hash": "TEXT"}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def derive_key(scope: str, body: object) -> str:
+    """Key for callers that send no Idempotency-Key: the endpoint plus its canonical JSON body."""
+    return hashlib.blake2b(scope.encode() + b"\0" + orjson.dumps(body, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+
+
+class KeyReuseError(Exception):
+    """An Idempotency-Key came back with a different request body."""
+
+
+class IdempotencyStore:
+    """Successful /pipeline/* responses by idempotency key, replayed for up to IDEMPOTENCY_TTL_S."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(responses)")}
+        for name, decl in _COLUMNS.items():
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE responses ADD COLUMN {name} {decl}")
+        self.replays = 0
+        self.conflicts = 0
+
+    def get(self, key: str, body_hash: str, ttl_s: float | None = None) -> tuple[int, object] | None:
+        """The stored (status, body) for `key` if younger than ttl_s; KeyReuseError if it was stored for another body."""
+        ttl_s = settings.IDEMPOTENCY_TTL_S if ttl_s is None else min(ttl_s, settings.IDEMPOTENCY_TTL_S)
+        row = self.conn.execute(
+            "SELECT status_code, body, body_hash FROM responses WHERE key = ? AND created_at_ms > ?",
+            (key, _now_ms() - int(ttl_s * 1000)),
+        ).fetchone()
+        if row is None:
+            return None
+        if row["body_hash"] is not None and row["body_hash"] != body_hash:
+            self.conflicts += 1
+            raise KeyReuseError(key)
+        self.replays += 1
+        return row["status_code"], orjson.loads(row["body"])
+
+    def put(self, key: str, status_code: int, body: object, body_hash: str) -> None:
+        now = _now_ms()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, status_code, body, created_at_ms, body_hash) VALUES (?, ?, ?, ?, ?)",
+            (key, status_code, orjson.dumps(body), now, body_hash),
+        )
+        self.conn.execute("DELETE FROM responses WHERE created_at_ms <= ?", (now - int(settings.IDEMPOTENCY_TTL_S * 1000),))
+
+    def snapshot(self) -> dict:
+        return {
+            "entries": self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0],
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+        }
+
+
+_store: IdempotencyStore | None = None
+
+
+def get_idempotency_store() -> IdempotencyStore | None:
+    global _store
+    if _store is None and settings.IDEMPOTENCY_DB_PATH:
+        _store = IdempotencyStore(settings.IDEMPOTENCY_DB_PATH)
+    return _store
@@ -0,0 +1,73 @@
+from contextvars import ContextVar
+from typing import Iterable, Mapping
+
+from app.config.settings import settings
+
+INTERACTIVE = "interactive"  # a rep clicking the HubSpot button / workflow webhooks
+API = "api"
+BULK = "bulk"  # /pipeline/enrich_companies and backfills
+PRIORITIES = (INTERACTIVE, API, BULK)
+
+SOURCE_PRIORITY = {"webhook": INTERACTIVE, "api": API, "bulk": BULK}
+
+_priority: ContextVar[str] = ContextVar("sf_priority", default=API)
+_tenant: ContextVar[str] = ContextVar("sf_tenant", default="")
+
+
+def weight(priority: str) -> float:
+    return max(0.001, float(getattr(settings, f"PRIORITY_WEIGHT_{priority.upper()}", 1.0)))
+
+
+def current_lane() -> tuple[str, str]:
+    """(priority class, tenant) of the work running in this task; vendor calls are scheduled by it."""
+    return _priority.get(), _tenant.get()
+
+
+def set_lane(priority: str, tenant: str | None = None) -> None:
+    """Set the lane for the current task and the tasks it starts (each task has its own copy of the context)."""
+    _priority.set(priority if priority in PRIORITIES else API)
+    _tenant.set(tenant or "")
+
+
+class FairScheduler:
+    """Stride scheduling over lanes: priority classes take turns in proportion to PRIORITY_WEIGHT_*,
+    tenants inside a class take equal turns.
+
+    A class or tenant that was idle rejoins at the current clock, so it cannot bank turns while away,
+    and no class with work ever waits more than a bounded number of turns.
+    """
+
+    def __init__(self):
+        self._pass: dict[str, float] = {}
+        self._clock = 0.0
+        self._tenant_pass: dict[str, dict[str, float]] = {}
+        self._tenant_clock: dict[str, float] = {}
+
+    def pick(self, ready: Mapping[str, Iterable[str]]) -> tuple[str, str] | None:
+        """Choose the next (priority, tenant) among those with work. `ready` maps priority -> tenants."""
+        best = None
+        for priority in PRIORITIES:
+            if not ready.get(priority):
+                continue
+            self._pass[priority] = max(self._pass.get(priority, 0.0), self._clock)
+            if best is None or self._pass[priority] < self._pass[best]:
+                best = priority
+        if best is None:
+            return None
+        self._clock = self._pass[best]
+        self._pass[best] += 1.0 / weight(best)
+
+        tenants = self._tenant_pass.setdefault(best, {})
+        clock = self._tenant_clock.get(best, 0.0)
+        present = sorted(ready[best])
+        tenant = None
+        for t in present:
+            tenants[t] = max(tenants.get(t, 0.0), clock)
+            if tenant is None or tenants[t] < tenants[tenant]:
+                tenant = t
+        self._tenant_clock[best] = tenants[tenant]
+        tenants[tenant] += 1.0
+        # tenants that went idle rejoin at the clock anyway; forget them
+        for t in [t for t, p in tenants.items() if p <= tenants[tenant] - 1.0 and t not in present]:
+            del tenants[t]
+        return best, tenant
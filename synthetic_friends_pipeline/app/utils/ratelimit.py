@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import deque
+
+from app.config.settings import settings
+from app.utils.priority import FairScheduler, current_lane
+
+WAIT_SAMPLES = 1000  # recent token waits per priority class kept for /metrics
+
+
+class TokenBucket:
+    """Per-vendor rate limit. Waiting callers are served by lane (see app.utils.priority): interactive work
+    gets the larger share of tokens while bulk work keeps a guaranteed trickle.
+
+    Buckets live in one process, so lane shares hold among the callers of that process only; across
+    processes it is the job queue's claim order that is fair.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float):
+        self.rate = float(rate_per_s)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting: dict[str, dict[str, deque]] = {}
+        self._scheduler = FairScheduler()
+        self._granter: asyncio.Task | None = None
+        self.granted: dict[str, int] = {}
+        self._waits: dict[str, deque[float]] = {}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after the vendor answered 429 + Retry-After."""
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, seconds))
+
+    def _grant_one(self, priority: str, tokens: float, waited_s: float = 0.0) -> None:
+        self._tokens -= tokens
+        self.granted[priority] = self.granted.get(priority, 0) + 1
+        self._waits.setdefault(priority, deque(maxlen=WAIT_SAMPLES)).append(waited_s)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return
+        priority, tenant = current_lane()
+        now = time.monotonic()
+        if not self._waiting and now >= self._paused_until:
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._grant_one(priority, tokens)
+                return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(priority, {}).setdefault(tenant, deque()).append((fut, tokens, now))
+        if self._granter is None or self._granter.done():
+            self._granter = asyncio.create_task(self._grant())
+        await fut
+
+    def _prune(self) -> None:
+        for priority in list(self._waiting):
+            tenants = self._waiting[priority]
+            for tenant in list(tenants):
+                waiters = tenants[tenant]
+                while waiters and waiters[0][0].done():
+                    waiters.popleft()
+                if not waiters:
+                    del tenants[tenant]
+            if not tenants:
+                del self._waiting[priority]
+
+    async def _grant(self) -> None:
+        chosen = None  # (priority, fut, tokens, enqueued) picked but still short of tokens
+        while True:
+            self._prune()
+            if chosen is None and not self._waiting:
+                return
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if chosen is None:
+                if self._tokens < 1.0:
+                    await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                    continue
+                priority, tenant = self._scheduler.pick(self._waiting)
+                chosen = (priority, *self._waiting[priority][tenant].popleft())
+            priority, fut, tokens, enqueued = chosen
+            if fut.done():
+                chosen = None
+                continue
+            if self._tokens < tokens:
+                # sleep, then re-check the pause: a 429 may arrive while a large request waits for tokens
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                continue
+            chosen = None
+            self._grant_one(priority, tokens, now - enqueued)
+            fut.set_result(None)
+
+    def snapshot(self) -> dict:
+        self._refill(time.monotonic())
+        return {
+            "rate_per_s": self.rate,
+            "burst": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "waiting": {p: sum(len(w) for w in tenants.values()) for p, tenants in self._waiting.items()},
+            "granted": dict(self.granted),
+            "wait": {
+                p: {"avg_s": round(sum(w) / len(w), 3), "max_s": round(max(w), 3)} for p, w in self._waits.items() if w
+            },
+        }
+
+
+class RetryBudget:
+    """Allow retries up to `ratio` of first attempts in a sliding window, plus a small floor."""
+
+    def __init__(self, ratio: float, min_per_s: float, window_s: float):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.window_s = window_s
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+        self.denied = 0
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        first_attempts = max(0, len(self._requests) - len(self._retries))
+        allowed = self.ratio * first_attempts + self.min_per_s * self.window_s
+        if len(self._retries) < allowed:
+            self._retries.append(now)
+            return True
+        self.denied += 1
+        return False
+
+    def snapshot(self) -> dict:
+        self._prune(time.monotonic())
+        return {"requests": len(self._requests), "retries": len(self._retries), "denied": self.denied}
+
+
+_limiters: dict[str, TokenBucket] = {}
+
+
+def limiter_for(vendor: str) -> TokenBucket:
+    limiter = _limiters.get(vendor)
+    if limiter is None:
+        key = vendor.upper()
+        limiter = TokenBucket(
+            getattr(settings, f"{key}_RATE_LIMIT_PER_S", 0.0),
+            getattr(settings, f"{key}_RATE_LIMIT_BURST", 1),
+        )
+        _limiters[vendor] = limiter
+    return limiter
+
+
+def limiter_snapshot() -> dict:
+    return {vendor: limiter.snapshot() for vendor, limiter in _limiters.items()}
+
+
+retry_budget = RetryBudget(
+    settings.RETRY_BUDGET_RATIO,
+    settings.RETRY_BUDGET_MIN_PER_S,
+    settings.RETRY_BUDGET_WINDOW_S,
+)
@@ -0,0 +1,14 @@
+import os
+import socket
+import uuid
+
+_boot = uuid.uuid4().hex[:8]
+
+
+def worker_id() -> str:
+    """Name for this process incarnation: host + pid + a per-boot nonce.
+
+    The pid is re-read so forked workers differ; the nonce keeps a restarted container (PID 1 again)
+    from reusing its predecessor's id.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{_boot}"
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one running call instead of starting their own.
+
+    The call runs in its own task, so a caller that is cancelled does not cancel it for the others;
+    once the last waiting caller is cancelled, the call is cancelled too, so nothing it would still
+    write outlives everyone who asked for it.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.started = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # every waiter may be gone; don't log "exception never retrieved"
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.started += 1
+        else:
+            self.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def snapshot(self) -> dict:
+        return {"in_flight": len(self._calls), "started": self.started, "shared": self.shared, "abandoned": self.abandoned}
@@ -0,0 +1,168 @@
+import csv
+import re
+from typing import AsyncIterator
+
+import orjson
+
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes], keepends: bool = False) -> AsyncIterator[bytes]:
+    """Split a chunked body into lines, scanning each byte once however long a line runs."""
+    buf = bytearray()
+    async for chunk in chunks:
+        scan = len(buf)  # the carried-over tail has no newline in it
+        buf += chunk
+        start = 0
+        while (end := buf.find(b"\n", scan)) != -1:
+            yield bytes(buf[start:end + keepends])
+            start = scan = end + 1
+        del buf[:start]
+    if buf:
+        yield bytes(buf)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield each non-blank line of an NDJSON body as it arrives."""
+    async for line in _iter_lines(chunks):
+        if line.strip():
+            yield line
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Yield one dict per CSV row keyed by the header row; quoted fields may span lines, empty cells are dropped."""
+    header: list[str] | None = None
+    parts: list[bytes] = []
+    quotes = 0
+    async for line in _iter_lines(chunks, keepends=True):
+        parts.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2:
+            continue  # inside a quoted field
+        text = b"".join(parts).decode("utf-8-sig" if header is None else "utf-8", errors="replace")
+        parts, quotes = [], 0
+        if not text.strip():
+            continue
+        row = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip() for h in row]
+            continue
+        yield {k: v.strip() for k, v in zip(header, row) if k and v.strip()}
+    if b"".join(parts).strip():
+        raise StreamFormatError("unterminated quoted CSV field")
+
+
+_WS = b" \t\r\n"
+_STRUCTURAL = re.compile(rb'[\[\]{}",]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield the raw bytes of each top-level element of a JSON array without loading the whole body.
+
+    Jumps between structural bytes with a regex rather than stepping through every byte in Python.
+    """
+    buf = bytearray()
+    pos = start = 0  # next byte to scan; first byte of the current element
+    state = "before"
+    depth = 0
+    in_string = False
+    async for chunk in chunks:
+        buf += chunk
+        while pos < len(buf):
+            if state == "before":
+                pos = len(buf) - len(buf[pos:].lstrip(_WS))
+                if pos == len(buf):
+                    break
+                if buf[pos] != ord("["):
+                    raise StreamFormatError("expected a JSON array")
+                state = "inside"
+                pos = start = pos + 1
+            elif state == "done":
+                if buf[pos:].strip(_WS):
+                    raise StreamFormatError("trailing data after JSON array")
+                pos = len(buf)
+            elif in_string:
+                m = _STRING_SPECIAL.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                elif buf[m.start()] == ord('"'):
+                    in_string = False
+                    pos = m.end()
+                elif m.end() < len(buf):
+                    pos = m.end() + 1  # skip the escaped byte
+                else:
+                    pos = m.start()  # escape split across chunks: rescan it with the next one
+                    break
+            else:
+                m = _STRUCTURAL.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                byte = buf[m.start()]
+                pos = m.end()
+                if byte == ord('"'):
+                    in_string = True
+                elif byte in b"{[":
+                    depth += 1
+                elif byte == ord("}") or (byte == ord("]") and depth):
+                    depth -= 1
+                elif depth == 0:
+                    item = buf[start:m.start()].strip(_WS)
+                    if item:
+                        yield bytes(item)
+                    start = pos
+                    if byte == ord("]"):
+                        state = "done"
+        keep = start if state == "inside" else pos
+        del buf[:keep]
+        pos -= keep
+        start -= min(start, keep)
+    if state != "done":
+        raise StreamFormatError("unterminated JSON array")
+
+
+async def iter_json_records(chunks: AsyncIterator[bytes], content_type: str | None) -> AsyncIterator[object]:
+    """Decode a JSON array or NDJSON body (picked by content type, else by the first byte) record by record.
+
+    A record that is not valid JSON is yielded as a StreamFormatError so the caller can report it
+    and carry on; a malformed array framing raises.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    source = chunks.__aiter__()
+    first = b""
+    async for chunk in source:
+        first = chunk
+        if chunk.strip():
+            break
+
+    async def replay() -> AsyncIterator[bytes]:
+        if first:
+            yield first
+        async for chunk in source:
+            yield chunk
+
+    is_array = content_type == "application/json" or (
+        content_type not in ("application/x-ndjson", "application/jsonl", "application/ndjson")
+        and first.lstrip()[:1] == b"["
+    )
+    raw = iter_json_array(replay()) if is_array else iter_ndjson(replay())
+    async for item in raw:
+        try:
+            yield orjson.loads(item)
+        except orjson.JSONDecodeError as exc:
+            yield StreamFormatError(str(exc))
+
+
+async def iter_records(chunks: AsyncIterator[bytes], content_type: str | None) -> AsyncIterator[object]:
+    """iter_json_records, plus CSV (with a header row) when the content type says so."""
+    if (content_type or "").split(";")[0].strip().lower() in CSV_TYPES:
+        async for row in iter_csv_records(chunks):
+            yield row
+        return
+    async for item in iter_json_records(chunks, content_type):
+        yield item
@@ -0,0 +1,106 @@
+"""
+Run enrichment jobs outside the web tier.
+
+    python -m app.worker                       # WORKER_PROCESSES processes, WORKER_CONCURRENCY jobs each
+    python -m app.worker --processes 4 --concurrency 8
+
+Each process has its own event loop, pooled HTTP clients and JobRunner, and they all claim from
+the shared SQLite queue (JOBS_DB_PATH). Run the web tier with JOBS_RUN_IN_WEB=false so it only
+enqueues and serves tracking traffic. SIGTERM/SIGINT stop claiming, give in-flight jobs
+JOBS_DRAIN_TIMEOUT_S to finish and hand the rest back to the queue; a process that dies is
+restarted.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import time
+
+from app.config.settings import settings
+from app.jobs.runner import JobRunner
+from app.pipeline.orchestrator import ENRICHERS, VERIFIERS
+from app.utils.http import clients
+from app.utils.log import get_logger
+
+logger = get_logger("sf-worker")
+
+RESTART_DELAY_S = 2.0
+
+
+async def serve(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await clients.startup([settings.HUBSPOT_BASE_URL] + [p.base_url for p in ENRICHERS + VERIFIERS])
+    runner = JobRunner(concurrency)
+    await runner.start()
+    logger.info("worker %s running %d jobs at a time", runner.owner, runner.concurrency)
+    try:
+        await stop.wait()
+        logger.info("worker %s draining %d jobs", runner.owner, runner.snapshot()["inflight"])
+    finally:
+        await runner.stop()
+        await clients.aclose()
+    logger.info("worker %s stopped (%s)", runner.owner, runner.snapshot())
+
+
+def _process_main(concurrency: int) -> None:
+    asyncio.run(serve(concurrency))
+
+
+def supervise(processes: int, concurrency: int) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def spawn() -> multiprocessing.Process:
+        proc = ctx.Process(target=_process_main, args=(concurrency,), name="sf-worker")
+        proc.start()
+        return proc
+
+    def on_signal(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    procs = [spawn() for _ in range(processes)]
+    logger.info("started %d worker processes, %d jobs each", processes, concurrency)
+    while not stopping:
+        for i, proc in enumerate(procs):
+            if not proc.is_alive() and not stopping:
+                logger.warning("worker pid %s exited with %s; restarting", proc.pid, proc.exitcode)
+                time.sleep(RESTART_DELAY_S)
+                procs[i] = spawn()
+        time.sleep(0.5)
+
+    for proc in procs:
+        if proc.is_alive():
+            proc.terminate()  # SIGTERM: the process drains its own jobs
+    deadline = time.monotonic() + settings.JOBS_DRAIN_TIMEOUT_S + 10
+    for proc in procs:
+        proc.join(max(0.0, deadline - time.monotonic()))
+        if proc.is_alive():
+            logger.warning("worker pid %s did not stop in time; killing it", proc.pid)
+            proc.kill()
+            proc.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run enrichment job workers against the shared job queue")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY or settings.JOBS_CONCURRENCY)
+    args = parser.parse_args()
+    if args.processes < 1 or args.concurrency < 1:
+        parser.error("--processes and --concurrency must be at least 1")
+
+    if args.processes == 1:
+        asyncio.run(serve(args.concurrency))
+    else:
+        supervise(args.processes, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,22 @@ async def main():
         raise SystemExit(1)
     company_id = sys.argv[1]
     base_url = sys.argv[2] if len(sys.argv) > 2 else "http://localhost:8099"
-    async with httpx.AsyncClient(timeout=120) as client:
+    async with httpx.AsyncClient(timeout=30) as client:
         r = await client.post(f"{base_url}/pipeline/enrich_hubspot_company", json={"hubspot_company_id": company_id})
         r.raise_for_status()
-        print(json.dumps(r.json(), indent=2))
+        job_id = r.json()["job_id"]
+        print(f"queued job {job_id}", file=sys.stderr)
+        while True:
+            r = await client.get(f"{base_url}/jobs/{job_id}")
+            r.raise_for_status()
+            job = r.json()
+            if job["status"] in ("success", "dead"):
+                break
+            await asyncio.sleep(2)
+        if job["status"] == "dead":
+            print(f"job failed: {job.get('last_error')}", file=sys.stderr)
+            raise SystemExit(1)
+        print(json.dumps(job["result"], indent=2))
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config.settings import settings  # noqa: E402
+
+
+@pytest.fixture
+def tmp_settings(tmp_path, monkeypatch):
+    """Point every on-disk store at a fresh temp directory."""
+    monkeypatch.setattr(settings, "EMAIL_EVENT_LOG_PATH", str(tmp_path / "email_events.jsonl"))
+    monkeypatch.setattr(settings, "EMAIL_ROLLUP_STATE_PATH", str(tmp_path / "email_rollups.db"))
+    monkeypatch.setattr(settings, "JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    return settings
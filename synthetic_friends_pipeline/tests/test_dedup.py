@@ -0,0 +1,27 @@
+import time
+
+import orjson
+
+from app.pipeline.dedup import DedupIndex
+
+
+def test_save_merges_other_workers_entries_oldest_first(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    other = DedupIndex(window_s=60, max_entries=10)
+    other.check("t1", "open", "old@x.com")
+    other.save(path)
+
+    time.sleep(0.01)
+    index = DedupIndex(window_s=60, max_entries=10)
+    index.check("t2", "open", "new@x.com")
+    index.save(path)
+
+    saved = orjson.loads(open(path, "rb").read())
+    keys = [DedupIndex._key("t1", "open", "old@x.com", ""), DedupIndex._key("t2", "open", "new@x.com", "")]
+    assert [k for k, _ in saved] == [k.hex() for k in keys]
+    assert not list(tmp_path.glob("*.tmp"))
+
+    # the entry loaded from disk is the oldest, so it is the one evicted past the cap
+    index.max_entries = 1
+    index.check("t3", "open", "third@x.com")
+    assert index.check("t1", "open", "old@x.com") is False
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from pathlib import Path
+
+import orjson
+import pytest
+
+from app.pipeline import email_rollups
+from app.pipeline.email_rollups import RollupAggregator, _CHECKPOINT_SCHEMA
+from app.utils.sqlite import connect
+
+
+def _write_segment(settings, worker, opened_ms, *payloads, seq=1):
+    """A segment as EventLogWriter names it for the process behind `worker` (host:pid:boot)."""
+    host, pid, _ = worker.split(":")
+    base = Path(settings.EMAIL_EVENT_LOG_PATH)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(opened_ms / 1000))
+    path = base.with_name(f"{base.stem}.{host}-{pid}.{stamp}-{seq:04d}{base.suffix}")
+    with path.open("wb") as fh:
+        for p in payloads:
+            fh.write(orjson.dumps(p) + b"\n")
+    return path
+
+
+DEAD = "h:41:aaaa"
+
+
+def _event(worker, ingested_ms, email="a@x.com", event_type="open"):
+    return {
+        "worker": worker,
+        "event_type": event_type,
+        "received_at_ms": ingested_ms,
+        "ingested_at_ms": ingested_ms,
+        "contact_emails": [email],
+    }
+
+
+def _aggregator(settings, worker):
+    agg = RollupAggregator()
+    agg.worker = worker
+    agg._conn = connect(settings.EMAIL_ROLLUP_STATE_PATH)
+    agg._conn.executescript(_CHECKPOINT_SCHEMA)
+    return agg
+
+
+def _checkpoint_row(agg, worker, pending_since_ms, heartbeat_ms):
+    agg._conn.execute(
+        "INSERT OR REPLACE INTO rollup_checkpoints (worker, pending_since_ms, heartbeat_ms) VALUES (?, ?, ?)",
+        (worker, pending_since_ms, heartbeat_ms),
+    )
+
+
+def test_recovery_reads_only_the_dead_workers_recent_segments(tmp_settings, monkeypatch):
+    old = _write_segment(tmp_settings, DEAD, 0, _event(DEAD, 500), seq=1)
+    _write_segment(tmp_settings, DEAD, 1_000_000, _event(DEAD, 1_200_000), seq=2)
+    _write_segment(tmp_settings, DEAD, 2_000_000, _event(DEAD, 2_100_000, "b@x.com"), seq=3)
+    _write_segment(tmp_settings, "h:42:bbbb", 1_000_000, _event("h:42:bbbb", 1_300_000), seq=1)
+    read = []
+    real = email_rollups.iter_log_records
+
+    def spy(base, segments=None):
+        read.extend(p.name for p in segments)
+        return real(base, segments)
+
+    monkeypatch.setattr(email_rollups, "iter_log_records", spy)
+    rollups = _aggregator(tmp_settings, "live")._fold({DEAD: (1_100_000, 10**13)})
+    assert sorted(rollups) == ["a@x.com", "b@x.com"]
+    assert old.name not in read and len(read) == 2  # neither the older segment nor the other pid's
+
+
+def test_stale_checkpoint_is_recovered_once_under_a_lease(tmp_settings, monkeypatch):
+    _write_segment(tmp_settings, DEAD, 1000, _event(DEAD, 1500), _event(DEAD, 1600))
+    applied = []
+
+    async def fake_apply(rollups, absolute=False):
+        applied.append({email: r.counts for email, r in rollups.items()})
+        return set()
+
+    monkeypatch.setattr(email_rollups, "apply_rollups", fake_apply)
+    live = _aggregator(tmp_settings, "live")
+    other = _aggregator(tmp_settings, "other")
+    _checkpoint_row(live, DEAD, pending_since_ms=1000, heartbeat_ms=0)
+
+    asyncio.run(live._recover())
+    asyncio.run(other._recover())
+
+    assert applied == [{"a@x.com": {"open": 2}}]
+    assert live._conn.execute("SELECT COUNT(*) FROM rollup_checkpoints").fetchone()[0] == 0
+
+
+def test_failed_recovery_keeps_the_row_leased_until_it_expires(tmp_settings, monkeypatch):
+    _write_segment(tmp_settings, DEAD, 1000, _event(DEAD, 1500))
+
+    async def failing_apply(rollups, absolute=False):
+        raise RuntimeError("HubSpot down")
+
+    monkeypatch.setattr(email_rollups, "apply_rollups", failing_apply)
+    live = _aggregator(tmp_settings, "live")
+    _checkpoint_row(live, DEAD, pending_since_ms=1000, heartbeat_ms=0)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(live._recover())
+    row = live._conn.execute("SELECT heartbeat_ms FROM rollup_checkpoints WHERE worker = ?", (DEAD,)).fetchone()
+    assert row is not None and row["heartbeat_ms"] > 0
+
+    monkeypatch.setattr(email_rollups, "RECOVERY_LEASE_MS", 0)
+    monkeypatch.setattr(email_rollups, "_now_ms", lambda: row["heartbeat_ms"] + 10**9)
+    applied = []
+
+    async def fake_apply(rollups, absolute=False):
+        applied.append(list(rollups))
+        return set()
+
+    monkeypatch.setattr(email_rollups, "apply_rollups", fake_apply)
+    asyncio.run(_aggregator(tmp_settings, "other")._recover())
+    assert applied == [["a@x.com"]]
+
+
+def test_worker_id_differs_per_boot(monkeypatch):
+    from app.utils import runtime
+
+    first = runtime.worker_id()
+    monkeypatch.setattr(runtime, "_boot", "restart")
+    assert runtime.worker_id() != first
+    assert runtime.worker_id().endswith(":restart")
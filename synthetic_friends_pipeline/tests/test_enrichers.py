@@ -0,0 +1,28 @@
+import asyncio
+
+from app.config.settings import settings
+from app.models.schemas import CompanyInput, ContactCandidate
+from app.pipeline import enrichment_cache, orchestrator
+from app.pipeline.enrichment_cache import EnrichmentCache
+
+
+def test_unconfigured_enrichers_are_neither_called_nor_cached(tmp_path, monkeypatch):
+    cache = EnrichmentCache(str(tmp_path / "enrich.db"))
+    monkeypatch.setattr(enrichment_cache, "_cache", cache)
+    monkeypatch.setattr(settings, "APOLLO_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "CLEARBIT_API_KEY", "")
+    called = []
+
+    async def find_contacts(self, company):
+        called.append(self.name)
+        return [ContactCandidate(email="cto@acme.com", source=self.name)]
+
+    for p in orchestrator.ENRICHERS:
+        monkeypatch.setattr(type(p), "find_contacts", find_contacts)
+    company = CompanyInput(company_name="Acme", domain="acme.com")
+    contacts, problems = asyncio.run(orchestrator._run_enrichers(company))
+
+    assert called == ["apollo"]
+    assert [c.source for c in contacts] == ["apollo"] and problems == []
+    clearbit = next(p for p in orchestrator.ENRICHERS if p.name == "clearbit")
+    assert cache.get(cache.key_for(clearbit, company)) is None
@@ -0,0 +1,32 @@
+import pytest
+
+from app.models.schemas import EmailEvent
+from app.pipeline import email_tracking
+from app.utils.event_log import EventLogWriter, iter_log_records, list_segments
+
+
+def test_append_raises_when_buffer_is_full(tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "EVENT_LOG_MAX_BUFFER", 0)
+    writer = EventLogWriter(tmp_settings.EMAIL_EVENT_LOG_PATH)
+    with pytest.raises(BufferError):
+        writer.append({"n": 1})
+    assert writer.dropped == 1
+
+
+def test_log_email_event_reports_a_rejected_log_write(tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "EVENT_LOG_MAX_BUFFER", 0)
+    monkeypatch.setattr(email_tracking, "get_event_log", lambda path: EventLogWriter(path))
+    result = email_tracking.log_email_event(EmailEvent(event_type="open", tid="t1", contact_email="a@x.com"))
+    assert result["logged"] is False
+    assert result["ok"] is False
+
+
+def test_close_compresses_the_open_segment(tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "EVENT_LOG_COMPRESSION", "gzip")
+    writer = EventLogWriter(tmp_settings.EMAIL_EVENT_LOG_PATH)
+    writer.append({"n": 1})
+    writer.append({"n": 2})
+    writer.close()
+    segments = list_segments(tmp_settings.EMAIL_EVENT_LOG_PATH)
+    assert [p.suffix for p in segments] == [".gz"]
+    assert [r["n"] for r in iter_log_records(tmp_settings.EMAIL_EVENT_LOG_PATH)] == [1, 2]
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.models.schemas import CompanyInput, EnrichmentResult
+from app.pipeline import hubspot_company
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"enrich": 0, "writes": [], "patches": []}
+
+    class FakeHubSpot:
+        async def update_company(self, company_id, props):
+            calls["patches"].append(props)
+
+    async def load(company_id, force_refresh):
+        return CompanyInput(company_name="Acme", domain="acme.com"), {}
+
+    async def enrich(company):
+        calls["enrich"] += 1
+        await asyncio.sleep(0.01)
+        return EnrichmentResult(company=company)
+
+    async def write(company_id, result, current=None):
+        calls["writes"].append(company_id)
+
+    monkeypatch.setattr(hubspot_company, "get_hubspot_client", FakeHubSpot)
+    monkeypatch.setattr(hubspot_company, "_load", load)
+    monkeypatch.setattr(hubspot_company, "enrich_company", enrich)
+    monkeypatch.setattr(hubspot_company, "write_result_to_hubspot", write)
+    return calls
+
+
+def _together(*kwargs_list):
+    async def run():
+        return await asyncio.gather(*(hubspot_company.enrich_hubspot_company_by_id("42", **kw) for kw in kwargs_list))
+    return asyncio.run(run())
+
+
+def test_job_and_bulk_row_share_one_run_and_one_write(calls):
+    _together({"mark_error": False}, {"mark_error": True})
+    assert calls["enrich"] == 1
+    assert calls["writes"] == ["42"]
+
+
+def test_joining_a_run_without_write_back_still_writes_once(calls):
+    _together({"write_back": False}, {"write_back": True})
+    assert calls["enrich"] == 1
+    assert calls["writes"] == ["42"]
@@ -0,0 +1,55 @@
+import asyncio
+
+from app.config.hubspot_properties import COMPANY_PROPS
+from app.models.schemas import CompanyInput, ContactCandidate, EnrichmentResult
+from app.pipeline import hubspot_writer
+
+
+class _FakeHubSpot:
+    def __init__(self, existing: dict[str, dict], linked: set[str]):
+        self.existing = existing
+        self.linked = linked
+        self.company_updates: list[dict] = []
+        self.associated: list[list[str]] = []
+
+    async def update_company(self, company_id, properties):
+        self.company_updates.append(properties)
+
+    async def batch_read_contacts(self, emails, properties=None):
+        return {"results": [self.existing[e] for e in emails if e in self.existing], "errors": []}
+
+    async def batch_upsert_contacts(self, items):
+        return {"results": [{"id": f"new-{email}"} for email, _ in items], "errors": []}
+
+    async def list_company_contact_ids(self, company_id):
+        return set(self.linked)
+
+    async def batch_associate_contacts_to_company(self, contact_ids, company_id):
+        self.associated.append(list(contact_ids))
+        return {"errors": []}
+
+
+def _result(emails: list[str]) -> EnrichmentResult:
+    contacts = [ContactCandidate(email=e, full_name="Ann Lee", title="CTO", source="apollo") for e in emails]
+    return EnrichmentResult(company=CompanyInput(company_name="Acme"), contacts=contacts, best_contact=None, notes="same")
+
+
+def test_company_patch_only_sends_changed_properties(monkeypatch):
+    hs = _FakeHubSpot({}, set())
+    monkeypatch.setattr(hubspot_writer, "get_hubspot_client", lambda: hs)
+    current = {COMPANY_PROPS["sf_enrichment_status"]: "success", COMPANY_PROPS["sf_enrichment_notes"]: "same"}
+    asyncio.run(hubspot_writer.write_result_to_hubspot("1", _result([]), current))
+    assert list(hs.company_updates[0]) == [COMPANY_PROPS["sf_last_enriched_at"]]
+
+
+def test_already_associated_contacts_are_not_reassociated(monkeypatch):
+    props = hubspot_writer._contact_props(_result(["a@x.com"]).contacts[0])
+    existing = {
+        "a@x.com": {"id": "11", "properties": {"email": "a@x.com", **props}},
+        "b@x.com": {"id": "12", "properties": {"email": "b@x.com", **props}},
+    }
+    hs = _FakeHubSpot(existing, linked={"11"})
+    monkeypatch.setattr(hubspot_writer, "get_hubspot_client", lambda: hs)
+    out = asyncio.run(hubspot_writer.write_result_to_hubspot("1", _result(["a@x.com", "b@x.com", "c@x.com"])))
+    assert hs.associated == [["12", "new-c@x.com"]]
+    assert out["associations_skipped"] == 1
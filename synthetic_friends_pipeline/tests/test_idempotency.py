@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.utils import idempotency
+from app.utils.idempotency import IdempotencyStore, KeyReuseError, derive_key
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path / "idempotency.db"))
+    monkeypatch.setattr(idempotency, "_store", store)
+    return store
+
+
+class _Request:
+    def __init__(self, key=None):
+        self.headers = {"Idempotency-Key": key} if key else {}
+
+
+def _call(body, key=None, scope="enrich_company"):
+    calls = []
+
+    async def handler():
+        calls.append(body)
+        return {"echo": body}
+
+    response = asyncio.run(main._idempotent(_Request(key), scope, body, 200, handler))
+    return response, calls
+
+
+def test_explicit_key_replays_same_body_and_rejects_a_different_one(store):
+    first, calls = _call({"domain": "a.com"}, key="k1")
+    again, replayed = _call({"domain": "a.com"}, key="k1")
+    assert calls and not replayed and again.headers["Idempotent-Replayed"] == "true"
+    with pytest.raises(HTTPException) as exc:
+        _call({"domain": "b.com"}, key="k1")
+    assert exc.value.status_code == 422 and store.snapshot()["conflicts"] == 1
+
+
+def test_derived_key_only_replays_inside_its_short_window(store, monkeypatch):
+    _call({"domain": "a.com"})
+    _, replayed = _call({"domain": "a.com"})
+    assert replayed == []
+    monkeypatch.setattr(main.settings, "IDEMPOTENCY_DERIVED_TTL_S", 0.0)
+    _, calls = _call({"domain": "a.com"})
+    assert calls == [{"domain": "a.com"}]
+
+
+def test_store_rejects_a_reused_key(store):
+    store.put("scope:k", 200, {"ok": True}, derive_key("scope", {"a": 1}))
+    assert store.get("scope:k", derive_key("scope", {"a": 1})) == (200, {"ok": True})
+    with pytest.raises(KeyReuseError):
+        store.get("scope:k", derive_key("scope", {"a": 2}))
+
+
+def test_store_migrates_a_table_without_body_hash(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, status_code INTEGER NOT NULL, body TEXT NOT NULL, created_at_ms INTEGER NOT NULL)")
+    conn.execute("INSERT INTO responses VALUES ('scope:k', 202, '{\"ok\":true}', strftime('%s','now') * 1000)")
+    conn.commit()
+    conn.close()
+    store = IdempotencyStore(str(path))
+    assert store.get("scope:k", "anything") == (202, {"ok": True})  # legacy rows cannot be checked, so they replay
+
+
+def test_in_flight_key_rejects_a_different_body(store):
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    async def fast():
+        return {"ok": False}
+
+    async def scenario():
+        first = asyncio.create_task(main._idempotent(_Request("k2"), "enrich_company", {"a": 1}, 200, slow))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await main._idempotent(_Request("k2"), "enrich_company", {"a": 2}, 200, fast)
+        release.set()
+        await first
+        return exc.value.status_code
+
+    assert asyncio.run(scenario()) == 422
@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import pytest
+
+from app.jobs import enrichment, runner as runner_module
+from app.jobs.queue import DEAD, QUEUED, RUNNING, SUCCESS, JobQueue
+from app.models.schemas import CompanyInput
+from app.pipeline import hubspot_company
+
+
+@pytest.fixture
+def queue(tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "JOBS_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(tmp_settings, "JOBS_RETRY_BASE_S", 0.0)
+    monkeypatch.setattr(tmp_settings, "JOBS_RETRY_MAX_S", 0.0)
+    return JobQueue(tmp_settings.JOBS_DB_PATH)
+
+
+def test_claim_leases_to_one_owner(queue):
+    job_id = queue.enqueue("k", {"n": 1})
+    [job] = queue.claim("a")
+    assert job["id"] == job_id and job["status"] == RUNNING and job["attempts"] == 1
+    assert queue.claim("b") == []
+    assert queue.extend_lease(job_id, "a")
+    assert not queue.extend_lease(job_id, "b")
+    assert not queue.complete(job_id, "b", {"ok": False})
+    assert queue.complete(job_id, "a", {"ok": True})
+    assert queue.get(job_id)["status"] == SUCCESS and queue.get(job_id)["result"] == {"ok": True}
+
+
+def test_fail_retries_then_dead_letters(queue):
+    job_id = queue.enqueue("k", {})
+    queue.claim("a")
+    assert queue.fail(job_id, "b", "not mine") is None
+    assert queue.fail(job_id, "a", "boom") == QUEUED
+    queue.claim("a")
+    assert queue.fail(job_id, "a", "boom again") == DEAD
+    assert queue.get(job_id)["last_error"] == "boom again"
+    assert queue.retry(job_id) and queue.get(job_id)["attempts"] == 0
+
+
+def test_permanent_failure_skips_retries(queue):
+    job_id = queue.enqueue("k", {})
+    queue.claim("a")
+    assert queue.fail(job_id, "a", "gone", permanent=True) == DEAD
+
+
+def test_release_returns_the_attempt(queue):
+    job_id = queue.enqueue("k", {})
+    queue.claim("a")
+    assert not queue.release(job_id, "b")
+    assert queue.release(job_id, "a")
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED and job["attempts"] == 0 and job["lease_owner"] is None
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_is_fenced(queue, tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "JOBS_LEASE_S", 0.05)
+    job_id = queue.enqueue("k", {})
+    queue.claim("a")
+    time.sleep(0.1)
+    [job] = queue.claim("b")
+    assert job["id"] == job_id and job["attempts"] == 2
+    assert not queue.extend_lease(job_id, "a")
+    assert not queue.complete(job_id, "a")
+    assert queue.fail(job_id, "a", "late") is None
+    assert queue.complete(job_id, "b")
+
+
+def test_enqueue_once_dedups_queued_and_running_jobs(queue):
+    first, created = queue.enqueue_once("k", {}, dedup_key="company:1")
+    assert created
+    assert queue.enqueue_once("k", {}, dedup_key="company:1") == (first, False)
+    queue.claim("a")
+    assert queue.enqueue_once("k", {}, dedup_key="company:1") == (first, False)
+    queue.complete(first, "a")
+    second, created = queue.enqueue_once("k", {}, dedup_key="company:1")
+    assert created and second != first
+    assert queue.snapshot()["coalesced"] == 2
+
+
+def test_enqueue_once_raises_a_queued_job_to_the_higher_priority(queue):
+    job_id, _ = queue.enqueue_once("k", {}, dedup_key="company:1", priority="bulk", tenant="backfill")
+    queue.enqueue_once("k", {}, dedup_key="company:1", priority="interactive", tenant="rep@x.com")
+    job = queue.get(job_id)
+    assert job["priority"] == "interactive" and job["tenant"] == "rep@x.com"
+    queue.enqueue_once("k", {}, dedup_key="company:1", priority="bulk", tenant="backfill")
+    assert queue.get(job_id)["priority"] == "interactive"  # never lowered
+
+
+def test_delayed_job_waits_for_make_ready(queue):
+    job_id = queue.enqueue("k", {}, delay_s=60)
+    assert queue.claim("a") == []
+    assert queue.make_ready(job_id)
+    assert [job["id"] for job in queue.claim("a")] == [job_id]
+    assert not queue.make_ready(job_id)
+
+
+def test_runner_cancels_a_job_whose_lease_was_lost(queue, tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "JOBS_LEASE_S", 0.06)
+    monkeypatch.setattr(runner_module, "get_job_queue", lambda: queue)
+    started = asyncio.Event()
+    failures = []
+
+    async def run(job):
+        started.set()
+        await asyncio.sleep(10)
+
+    async def on_failure(job, status, error):
+        failures.append(status)
+
+    monkeypatch.setitem(runner_module.HANDLERS, "slow", (run, on_failure))
+
+    async def scenario():
+        job_id = queue.enqueue("slow", {})
+        runner = runner_module.JobRunner(concurrency=1)
+        [job] = queue.claim(runner.owner)
+        task = asyncio.create_task(runner._execute(job))
+        await started.wait()
+        queue.conn.execute("UPDATE jobs SET lease_owner = 'other' WHERE id = ?", (job_id,))
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), timeout=1.0)
+        return runner, task, job_id
+
+    runner, task, job_id = asyncio.run(scenario())
+    assert task.cancelled()
+    assert runner.lost == 1 and runner.completed == 0 and failures == []
+    assert queue.get(job_id)["lease_owner"] == "other"
+
+
+
+def test_lost_lease_cancels_the_shared_hubspot_run_before_it_writes(queue, tmp_settings, monkeypatch):
+    monkeypatch.setattr(tmp_settings, "JOBS_LEASE_S", 0.06)
+    monkeypatch.setattr(runner_module, "get_job_queue", lambda: queue)
+    started = asyncio.Event()
+    writes = []
+
+    class FakeHubSpot:
+        async def update_company(self, company_id, props):
+            pass
+
+    async def load(company_id, force_refresh):
+        return CompanyInput(company_name="Acme", domain="acme.com"), {}
+
+    async def slow_enrich(company):
+        started.set()
+        await asyncio.sleep(0.3)
+
+    async def write(company_id, result, current=None):
+        writes.append(company_id)
+
+    monkeypatch.setattr(hubspot_company, "get_hubspot_client", FakeHubSpot)
+    monkeypatch.setattr(hubspot_company, "_load", load)
+    monkeypatch.setattr(hubspot_company, "enrich_company", slow_enrich)
+    monkeypatch.setattr(hubspot_company, "write_result_to_hubspot", write)
+
+    async def scenario():
+        job_id = queue.enqueue(enrichment.KIND, {"hubspot_company_id": "42"})
+        runner = runner_module.JobRunner(concurrency=1)
+        [job] = queue.claim(runner.owner)
+        task = asyncio.create_task(runner._execute(job))
+        await started.wait()
+        queue.conn.execute("UPDATE jobs SET lease_owner = 'other' WHERE id = ?", (job_id,))
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), timeout=1.0)
+        await asyncio.sleep(0.4)  # past when the enrichment would have finished and written back
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
+    assert writes == []
+    assert hubspot_company.hubspot_flights.snapshot()["in_flight"] == 0
+
+
+def test_enqueue_returns_before_the_queued_write(queue, monkeypatch):
+    monkeypatch.setattr(enrichment, "get_job_queue", lambda: queue)
+    release = asyncio.Event()
+    ready = []
+
+    async def set_status(company_id, status, notes):
+        await release.wait()
+
+    monkeypatch.setattr(enrichment, "_set_status", set_status)
+
+    async def scenario():
+        job_id = enrichment.enqueue_hubspot_enrichment("42", on_ready=lambda: ready.append(True))
+        await asyncio.sleep(0)
+        assert queue.claim("a") == [] and ready == []
+        release.set()
+        await asyncio.gather(*enrichment._status_writes)
+        return job_id
+
+    job_id = asyncio.run(scenario())
+    assert ready == [True]
+    assert [job["id"] for job in queue.claim("a")] == [job_id]
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+import pytest
+
+from app.hubspot.mirror import HubSpotMirror, SyncLeaseLost, sync_once
+
+
+class _Pages:
+    """Fake HubSpot client whose export has three pages; `on_page` runs before each one is returned."""
+
+    def __init__(self, on_page):
+        self.on_page = on_page
+        self.calls = 0
+
+    async def list_objects(self, object_type, properties, after=None):
+        self.calls += 1
+        self.on_page(self.calls)
+        nxt = None if self.calls % 3 == 0 else {"after": str(self.calls)}
+        return {"results": [], "paging": {"next": nxt} if nxt else {}}
+
+
+def test_bootstrap_renews_the_lease_on_every_page(tmp_path):
+    mirror = HubSpotMirror(str(tmp_path / "mirror.db"))
+    lease = ("worker-a", 0.05)
+    assert mirror.try_acquire_sync_lease(*lease)
+    expiries = []
+
+    def record(n):
+        expiries.append(mirror.get_state("sync_lease"))
+        time.sleep(0.005)
+
+    hs = _Pages(record)
+    asyncio.run(sync_once(hs, mirror, lease))
+    assert hs.calls == 6 and len(set(expiries)) == 6  # renewed between pages, not just once
+
+
+def test_bootstrap_stops_when_another_worker_holds_the_lease(tmp_path):
+    mirror = HubSpotMirror(str(tmp_path / "mirror.db"))
+    assert mirror.try_acquire_sync_lease("worker-a", 60)
+
+    def steal(n):
+        if n == 1:
+            mirror.set_state("sync_lease", "worker-b|99999999999999")
+
+    hs = _Pages(steal)
+    with pytest.raises(SyncLeaseLost):
+        asyncio.run(sync_once(hs, mirror, ("worker-a", 60)))
+    assert hs.calls == 1
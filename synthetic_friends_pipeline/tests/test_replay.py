@@ -0,0 +1,65 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app import replay
+from app.replay import Checkpoint
+
+
+def _write_log(settings, *emails):
+    with open(settings.EMAIL_EVENT_LOG_PATH, "wb") as fh:
+        for i, email in enumerate(emails):
+            payload = {"event_type": "open", "received_at_ms": 1_000 + i, "contact_emails": [email]}
+            fh.write(orjson.dumps(payload) + b"\n")
+
+
+def test_resume_skips_contacts_written_before_a_partial_failure(tmp_settings, tmp_path, monkeypatch):
+    _write_log(tmp_settings, "a@x.com", "b@x.com", "c@x.com")
+    checkpoint_path = tmp_path / "replay.db"
+    calls = []
+
+    async def no_sleep(_):
+        pass
+
+    async def c_fails(rollups, absolute=False):
+        calls.append(sorted(rollups))
+        return {"c@x.com"}
+
+    monkeypatch.setattr(replay.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(replay, "apply_rollups", c_fails)
+    with pytest.raises(RuntimeError):
+        asyncio.run(replay.replay(tmp_settings.EMAIL_EVENT_LOG_PATH, checkpoint_path))
+    assert calls[0] == ["a@x.com", "b@x.com", "c@x.com"]
+    assert calls[1:] == [["c@x.com"], ["c@x.com"]]
+
+    async def ok(rollups, absolute=False):
+        calls.append(sorted(rollups))
+        return set()
+
+    calls.clear()
+    monkeypatch.setattr(replay, "apply_rollups", ok)
+    stats = asyncio.run(replay.replay(tmp_settings.EMAIL_EVENT_LOG_PATH, checkpoint_path))
+    assert calls == [["c@x.com"]]
+    assert stats["contacts_written"] == 1
+    name = replay.segment_key(replay.list_segments(tmp_settings.EMAIL_EVENT_LOG_PATH)[0])
+    assert Checkpoint(checkpoint_path).in_progress(name) == (None, set())
+
+
+def test_unfinished_batch_is_refolded_to_where_it_ended(tmp_settings, tmp_path, monkeypatch):
+    _write_log(tmp_settings, "a@x.com", "b@x.com", "a@x.com")
+    checkpoint_path = tmp_path / "replay.db"
+    checkpoint = Checkpoint(checkpoint_path)
+    first_two = len(open(tmp_settings.EMAIL_EVENT_LOG_PATH, "rb").readline()) * 2
+    name = replay.segment_key(replay.list_segments(tmp_settings.EMAIL_EVENT_LOG_PATH)[0])
+    checkpoint.record_written(name, first_two, ["a@x.com"])
+    calls = []
+
+    async def ok(rollups, absolute=False):
+        calls.append(sorted(rollups))
+        return set()
+
+    monkeypatch.setattr(replay, "apply_rollups", ok)
+    asyncio.run(replay.replay(tmp_settings.EMAIL_EVENT_LOG_PATH, checkpoint_path))
+    # the unfinished batch covered the first two lines; the later open for a@ is a new batch
+    assert calls == [["b@x.com"], ["a@x.com"]]
@@ -0,0 +1,46 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.utils.streaming import StreamFormatError, iter_csv_records, iter_json_array, iter_ndjson
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _collect(gen) -> list:
+    async def run():
+        return [item async for item in gen]
+
+    return asyncio.run(run())
+
+
+RECORDS = [{"a": 1}, {"b": "x,]}\"\\\\"}, [1, [2, {"c": "]"}]], "s", 3, None]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+def test_json_array_elements_survive_any_chunking(size):
+    body = b" \n[ " + b" ,\n".join(orjson.dumps(r) for r in RECORDS) + b" ]\n"
+    items = _collect(iter_json_array(_chunks(body, size)))
+    assert [orjson.loads(i) for i in items] == RECORDS
+
+
+@pytest.mark.parametrize("body, message", [(b'{"a": 1}', "expected"), (b"[1, 2", "unterminated"), (b"[1] 2", "trailing")])
+def test_json_array_framing_errors(body, message):
+    with pytest.raises(StreamFormatError, match=message):
+        _collect(iter_json_array(_chunks(body, 2)))
+
+
+@pytest.mark.parametrize("size", [1, 5, 1024])
+def test_ndjson_lines(size):
+    body = b'{"a": 1}\n\n  \n{"b": 2}\n{"c": 3}'
+    assert [orjson.loads(i) for i in _collect(iter_ndjson(_chunks(body, size)))] == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+
+def test_csv_quoted_field_spans_lines():
+    body = b'name,notes\nAcme,"line one\nline, two"\nBeta,\n'
+    rows = _collect(iter_csv_records(_chunks(body, 3)))
+    assert rows == [{"name": "Acme", "notes": "line one\nline, two"}, {"name": "Beta"}]
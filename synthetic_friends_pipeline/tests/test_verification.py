@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.config.settings import settings
+from app.models.schemas import ContactCandidate
+from app.pipeline import orchestrator, verification_cache
+from app.pipeline.verification_cache import VerificationCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    store = VerificationCache(str(tmp_path / "verify.db"))
+    monkeypatch.setattr(verification_cache, "_cache", store)
+    for key in ("ZEROBOUNCE_API_KEY", "NEVERBOUNCE_API_KEY", "HUNTER_API_KEY"):
+        monkeypatch.setattr(settings, key, "")
+    return store
+
+
+def _contacts(n: int) -> list[ContactCandidate]:
+    return [ContactCandidate(email=f"person{i}@example{i}.com") for i in range(n)]
+
+
+@pytest.mark.parametrize("threshold", [1000, 1])  # per-contact waterfall, then the bulk path
+def test_unconfigured_verifiers_leave_nothing_cached(cache, monkeypatch, threshold):
+    monkeypatch.setattr(settings, "VERIFY_BATCH_THRESHOLD", threshold)
+    contacts = _contacts(3)
+    asyncio.run(orchestrator.verify_contacts(contacts))
+    assert all(c.email_verification == "unknown" for c in contacts)
+    assert all(cache.get(c.email) is None for c in contacts)
+
+
+@pytest.mark.parametrize("threshold", [1000, 1])
+def test_configured_verifier_answer_is_cached(cache, monkeypatch, threshold):
+    monkeypatch.setattr(settings, "VERIFY_BATCH_THRESHOLD", threshold)
+    monkeypatch.setattr(settings, "HUNTER_API_KEY", "test-key")
+    hunter = next(v for v in orchestrator.VERIFIERS if v.name == "hunter")
+
+    async def verify_details(email):
+        return "deliverable", None
+
+    monkeypatch.setattr(hunter, "verify_details", verify_details)
+    contacts = _contacts(3)
+    asyncio.run(orchestrator.verify_contacts(contacts))
+    assert all(c.email_verification == "deliverable" for c in contacts)
+    assert all(cache.get(c.email) == "deliverable" for c in contacts)
+
+
+def test_bulk_rows_pool_into_one_verify_many(cache, monkeypatch):
+    monkeypatch.setattr(settings, "VERIFY_BATCH_THRESHOLD", 6)
+    monkeypatch.setattr(settings, "VERIFY_BATCH_LINGER_S", 5.0)
+    monkeypatch.setattr(settings, "HUNTER_API_KEY", "test-key")
+    hunter = next(v for v in orchestrator.VERIFIERS if v.name == "hunter")
+    calls = []
+
+    async def verify_many(emails, concurrency=4):
+        calls.append(sorted(emails))
+        for email in emails:
+            yield email, "deliverable", None
+
+    monkeypatch.setattr(hunter, "verify_many", verify_many)
+
+    async def run():
+        batch = orchestrator.VerifyBatch(max_waiters=3)
+
+        async def row(contacts):
+            orchestrator.set_verify_batch(batch)
+            await orchestrator.verify_contacts(contacts)
+
+        rows = [_contacts(6)[i:i + 2] for i in range(0, 6, 2)]
+        await asyncio.wait_for(asyncio.gather(*(row(r) for r in rows)), timeout=1.0)
+        await batch.aclose()
+        return rows
+
+    rows = asyncio.run(run())
+    assert len(calls) == 1 and len(calls[0]) == 6
+    assert all(c.email_verification == "deliverable" for r in rows for c in r)
+
+
+def test_small_pool_falls_back_to_single_checks_after_linger(cache, monkeypatch):
+    monkeypatch.setattr(settings, "VERIFY_BATCH_THRESHOLD", 50)
+    monkeypatch.setattr(settings, "VERIFY_BATCH_LINGER_S", 0.05)
+    monkeypatch.setattr(settings, "HUNTER_API_KEY", "test-key")
+    hunter = next(v for v in orchestrator.VERIFIERS if v.name == "hunter")
+
+    async def verify_details(email):
+        return "risky", None
+
+    monkeypatch.setattr(hunter, "verify_details", verify_details)
+
+    async def run():
+        batch = orchestrator.VerifyBatch(max_waiters=8)
+        orchestrator.set_verify_batch(batch)
+        contacts = _contacts(2)
+        await asyncio.wait_for(orchestrator.verify_contacts(contacts), timeout=1.0)
+        await batch.aclose()
+        return contacts
+
+    assert all(c.email_verification == "risky" for c in asyncio.run(run()))